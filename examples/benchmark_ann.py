@@ -0,0 +1,90 @@
+"""Recall vs latency of the IVF-flat index against an exact scan.
+
+Usage:
+    python examples/benchmark_ann.py [--rows 1000000] [--dim 128] [--queries 200]
+
+Vectors are drawn from a Gaussian mixture (so there is cluster structure for
+the coarse quantiser to find) and unit-normalised, like the matrix in
+NumpyVectorDBStorage. Queries are perturbed copies of random rows. Recall is
+recall@k of the IVF candidates re-scored exactly, against a brute-force top-k.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from lightrag.ivf_index import IVFFlatIndex
+
+
+def synthetic_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    matrix = np.empty((rows, dim), dtype=np.float32)
+    block = 100000
+    for i in range(0, rows, block):
+        n = min(block, rows - i)
+        labels = rng.integers(0, clusters, n)
+        matrix[i : i + n] = centers[labels] + 0.6 * rng.standard_normal(
+            (n, dim), dtype=np.float32
+        )
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    matrix = synthetic_vectors(args.rows, args.dim, clusters=2000, seed=0)
+    print(
+        f"Generated {args.rows} x {args.dim} vectors in {time.perf_counter() - t0:.1f}s"
+    )
+
+    rng = np.random.default_rng(1)
+    queries = matrix[rng.integers(0, args.rows, args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    t0 = time.perf_counter()
+    truth = [top_k(matrix @ q, args.top_k) for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000 / args.queries
+    print(f"Exact scan: {exact_ms:.2f} ms/query")
+
+    index = IVFFlatIndex(nlist=args.nlist)
+    t0 = time.perf_counter()
+    index.train(matrix, args.rows)
+    print(
+        f"IVF train + assign: {time.perf_counter() - t0:.1f}s, "
+        f"{len(index.centroids)} lists"
+    )
+
+    print(
+        f"{'nprobe':>6} {'recall@' + str(args.top_k):>10} {'ms/query':>9} {'speedup':>8}"
+    )
+    for nprobe in args.nprobe:
+        hits = 0
+        t0 = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            rows = index.candidates(q, nprobe)
+            found = rows[top_k(matrix[rows] @ q, min(args.top_k, len(rows)))]
+            hits += len(np.intersect1d(found, expected))
+        ms = (time.perf_counter() - t0) * 1000 / args.queries
+        recall = hits / (args.queries * args.top_k)
+        print(f"{nprobe:>6} {recall:>10.3f} {ms:>9.2f} {exact_ms / ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare GraphML and binary snapshot load time / peak RSS.
+
+Usage:
+    python examples/benchmark_graph_snapshot.py [path/to/graph_chunk_entity_relation.graphml]
+
+Without an argument a synthetic entity graph is generated. Each load runs in a
+fresh subprocess so peak RSS is measured in isolation.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import networkx as nx
+
+from lightrag.graph_snapshot import write_graph_snapshot
+
+LOADERS = {
+    "graphml": "import networkx as nx; g = nx.read_graphml({path!r})",
+    "snapshot": "from lightrag.graph_snapshot import read_graph_snapshot; g = read_graph_snapshot({path!r})",
+}
+
+CHILD = """
+import resource, time
+t0 = time.perf_counter()
+{load}
+elapsed = time.perf_counter() - t0
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, rss, g.number_of_nodes(), g.number_of_edges())
+"""
+
+
+def synthetic_graph(num_nodes=50000, avg_degree=8, seed=0) -> nx.Graph:
+    rng = random.Random(seed)
+    types = ["organization", "product_line", "product_sku", "feature", "use_case"]
+    graph = nx.Graph()
+    for i in range(num_nodes):
+        graph.add_node(
+            f'"ENTITY {i}"',
+            entity_type=rng.choice(types),
+            description=f"Description of entity {i} " * rng.randint(1, 6),
+            source_id="<SEP>".join(
+                f"chunk-{rng.randint(0, num_nodes)}" for _ in range(rng.randint(1, 4))
+            ),
+            subgraphs=rng.choice(["ALL", "PK<SG>ALL"]),
+        )
+    for _ in range(num_nodes * avg_degree // 2):
+        u, v = rng.randrange(num_nodes), rng.randrange(num_nodes)
+        if u != v:
+            graph.add_edge(
+                f'"ENTITY {u}"',
+                f'"ENTITY {v}"',
+                weight=float(rng.randint(1, 10)),
+                description=f"relation {u}-{v}",
+                keywords="uses, integrates",
+                source_id=f"chunk-{rng.randint(0, num_nodes)}",
+                subgraphs="ALL",
+            )
+    return graph
+
+
+def measure(kind: str, path: str) -> tuple[float, int]:
+    code = CHILD.format(load=LOADERS[kind].format(path=path))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    ).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            graphml_file = sys.argv[1]
+            graph = nx.read_graphml(graphml_file)
+        else:
+            graph = synthetic_graph()
+            graphml_file = os.path.join(tmp, "graph.graphml")
+            nx.write_graphml(graph, graphml_file)
+        snapshot_file = os.path.join(tmp, "graph.snapshot")
+
+        t0 = time.perf_counter()
+        write_graph_snapshot(graph, snapshot_file)
+        write_time = time.perf_counter() - t0
+
+        print(
+            f"Graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges"
+        )
+        print(f"Snapshot write: {write_time:.2f}s")
+        for kind, path in [("graphml", graphml_file), ("snapshot", snapshot_file)]:
+            elapsed, rss = measure(kind, path)
+            size_mb = os.path.getsize(path) / 1e6
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            rss_mb = rss / (1e6 if sys.platform == "darwin" else 1e3)
+            print(
+                f"{kind:>9}: file {size_mb:8.1f} MB  load {elapsed:7.2f}s  peak RSS {rss_mb:8.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
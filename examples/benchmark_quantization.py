@@ -0,0 +1,123 @@
+"""Recall@k, memory and latency of the NumpyVectorDBStorage quantisation modes.
+
+Usage:
+    python examples/benchmark_quantization.py [--rows 100000] [--dim 768] [--queries 200]
+
+Each mode stores the same synthetic clustered vectors in a fresh store and
+answers the same queries. Recall is measured against an exact float32 top-k.
+"memory" counts what search keeps resident (matrix, int8 scales or PQ codes);
+pq additionally keeps the exact vectors on disk for re-ranking.
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+import numpy as np
+
+from lightrag.kg.numpy_impl import NumpyVectorDBStorage
+from lightrag.utils import EmbeddingFunc
+
+
+def synthetic_vectors(rows: int, dim: int, seed: int) -> np.ndarray:
+    # embeddings are anisotropic: clustered points in a low-rank subspace
+    # plus a little isotropic noise
+    rng = np.random.default_rng(seed)
+    rank = min(64, dim)
+    centers = rng.standard_normal((max(rows // 500, 1), rank)).astype(np.float32)
+    latent = centers[rng.integers(0, len(centers), rows)]
+    latent += 0.7 * rng.standard_normal((rows, rank), dtype=np.float32)
+    projection = rng.standard_normal((rank, dim)).astype(np.float32)
+    vectors = latent @ projection
+    vectors += (
+        0.1
+        * np.linalg.norm(vectors, axis=1, keepdims=True)
+        * rng.standard_normal((rows, dim), dtype=np.float32)
+        / np.sqrt(dim)
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def run_mode(name, quantization, vectors, queries, truth, top_k):
+    lookup = {f"row-{i}": i for i in range(len(vectors))}
+
+    async def embed(texts: list[str]) -> np.ndarray:
+        return np.stack(
+            [vectors[lookup[t]] if t in lookup else queries[int(t[6:])] for t in texts]
+        )
+
+    store = NumpyVectorDBStorage(
+        namespace="chunks",
+        global_config={
+            "working_dir": tempfile.mkdtemp(),
+            "embedding_batch_num": 8192,
+            "vector_db_storage_cls_kwargs": {
+                "quantization": quantization,
+                "cosine_better_than_threshold": -1.0,
+            },
+        },
+        embedding_func=EmbeddingFunc(vectors.shape[1], 8192, embed),
+    )
+    t0 = time.perf_counter()
+    await store.upsert({key: {"content": key} for key in lookup})
+    await store.index_done_callback()
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = []
+    for i in range(len(queries)):
+        results.extend(await store.query_batch([f"query-{i}"], top_k))
+    latency = (time.perf_counter() - t0) * 1000 / len(queries)
+
+    hits = sum(
+        len({lookup[r["id"]] for r in result} & set(expected.tolist()))
+        for result, expected in zip(results, truth)
+    )
+    stats = store.stats()
+    print(
+        f"{name:>16} {hits / truth.size:>9.3f} {stats['memory_bytes'] / 2**20:>10.1f} "
+        f"{stats['disk_only_bytes'] / 2**20:>9.1f} {latency:>9.2f} {build:>8.1f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.rows, args.dim, seed=0)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.rows, args.queries)]
+    queries = queries + 0.5 * rng.standard_normal(
+        queries.shape, dtype=np.float32
+    ) / np.sqrt(args.dim)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ vectors.T
+    truth = np.argpartition(-scores, args.top_k - 1, axis=1)[:, : args.top_k]
+    del scores
+
+    modes = {
+        "float32": "float32",
+        "float16": "float16",
+        "int8": "int8",
+        "pq rerank=8": {"type": "pq", "rerank": 8},
+        "pq": "pq",
+        "pq m=dim/16": {"type": "pq", "m": args.dim // 16},
+    }
+    print(
+        f"{args.rows} x {args.dim} vectors, {args.queries} queries, recall@{args.top_k}"
+    )
+    print(
+        f"{'mode':>16} {'recall':>9} {'memory MB':>10} {'disk MB':>9} "
+        f"{'ms/query':>9} {'build s':>8}"
+    )
+    for name, quantization in modes.items():
+        await run_mode(name, quantization, vectors, queries, truth, args.top_k)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+"""Drive a local fake OpenAI endpoint with RPM/TPM quotas through the rate governor.
+
+Usage:
+    python examples/benchmark_rate_governor.py [--rpm 600] [--tpm 60000] [--seconds 30]
+
+The fake server enforces per-minute request and token windows, answers with
+``x-ratelimit-*`` headers and returns 429 + ``retry-after`` when a quota is
+exhausted. The same workload is run once with plain retries (what the tenacity
+decorators used to do) and once through ``RateGovernor``; compare the 429
+counts and how close the achieved token rate gets to the quota.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, RateLimitError
+
+from lightrag.rate_governor import RateGovernor, estimate_chat_tokens
+
+
+class FakeQuota:
+    def __init__(self, rpm: int, tpm: int):
+        self.limits = {"requests": rpm, "tokens": tpm}
+        # start saturated so the run measures steady state, not the initial burst
+        self.used = {"requests": float(rpm), "tokens": float(tpm)}
+        self.updated = time.monotonic()
+        self.served_tokens = 0
+        self.rejected = 0
+
+    def _decay(self):
+        now = time.monotonic()
+        for kind, limit in self.limits.items():
+            self.used[kind] = max(
+                0.0, self.used[kind] - (now - self.updated) * limit / 60
+            )
+        self.updated = now
+
+    def headers(self) -> dict:
+        headers = {}
+        for kind, limit in self.limits.items():
+            remaining = max(0, int(limit - self.used[kind]))
+            headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+            headers[f"x-ratelimit-remaining-{kind}"] = str(remaining)
+            headers[f"x-ratelimit-reset-{kind}"] = (
+                f"{self.used[kind] * 60 / limit:.3f}s"
+            )
+        return headers
+
+    def admit(self, tokens: int) -> bool:
+        self._decay()
+        if (
+            self.used["requests"] + 1 > self.limits["requests"]
+            or self.used["tokens"] + tokens > self.limits["tokens"]
+        ):
+            self.rejected += 1
+            return False
+        self.used["requests"] += 1
+        self.used["tokens"] += tokens
+        self.served_tokens += tokens
+        return True
+
+
+def make_app(quota: FakeQuota) -> web.Application:
+    async def chat(request: web.Request):
+        body = await request.json()
+        prompt_tokens = sum(len(m["content"]) // 4 + 4 for m in body["messages"])
+        completion_tokens = body.get("max_tokens", 256)
+        if not quota.admit(prompt_tokens + completion_tokens):
+            headers = quota.headers()
+            headers["retry-after"] = "1"
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status=429,
+                headers=headers,
+            )
+        await asyncio.sleep(random.uniform(0.05, 0.2))
+        return web.json_response(
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "ok"},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+            headers=quota.headers(),
+        )
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat)
+    return app
+
+
+async def run_workload(base_url: str, governor, seconds: float, concurrency: int):
+    client = AsyncOpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    completed = 0
+
+    async def one_call(messages):
+        create = client.chat.completions.with_raw_response.create
+        if governor is None:
+            # plain exponential retry, as the tenacity decorators did
+            for attempt in range(6):
+                try:
+                    return await create(
+                        model="gpt-4o-mini", messages=messages, max_tokens=256
+                    )
+                except RateLimitError:
+                    await asyncio.sleep(min(10, 0.25 * 2**attempt))
+            return None
+
+        async def make_call():
+            raw = await create(model="gpt-4o-mini", messages=messages, max_tokens=256)
+            return raw.headers, raw.parse()
+
+        return await governor.call(
+            make_call,
+            estimate_chat_tokens("gpt-4o-mini", messages, 256),
+            rate_limit_errors=(RateLimitError,),
+            transient_errors=(APIConnectionError, APITimeoutError),
+            headers_of=governor.openai_headers,
+            usage_of=governor.openai_usage,
+        )
+
+    async def worker():
+        nonlocal completed
+        while True:
+            messages = [
+                {"role": "user", "content": "lorem ipsum " * random.randint(50, 400)}
+            ]
+            if await one_call(messages) is not None:
+                completed += 1
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    # stop at the deadline so only the measured window counts
+    await asyncio.wait(workers, timeout=seconds)
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    return completed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=60000)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for label in ["plain retries", "rate governor"]:
+        quota = FakeQuota(args.rpm, args.tpm)
+        runner = web.AppRunner(make_app(quota))
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", args.port).start()
+        governor = (
+            RateGovernor("fake/gpt-4o-mini") if label == "rate governor" else None
+        )
+        completed = await run_workload(
+            f"http://127.0.0.1:{args.port}/v1", governor, args.seconds, args.concurrency
+        )
+        await runner.cleanup()
+        tpm = quota.served_tokens * 60 / args.seconds
+        print(
+            f"{label:>14}: {completed} calls, {quota.rejected} x 429, "
+            f"{tpm:,.0f} tokens/min ({tpm / args.tpm:.0%} of quota)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
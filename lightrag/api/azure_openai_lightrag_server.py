@@ -330,6 +330,9 @@ def create_app(args):
             if os.path.exists(cachefile):
                 with open(cachefile, "w") as f:
                     f.write("{}")
+            journal = args.working_dir + "/kv_store_llm_response_cache.journal"
+            if os.path.exists(journal):
+                os.remove(journal)
             return {"status": "success"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
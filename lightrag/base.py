@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass, field
 from typing import TypedDict, Union, Literal, Generic, TypeVar, Optional, Dict, List, Any
 from enum import Enum
@@ -55,6 +56,14 @@ class BaseVectorStorage(StorageNameSpace):
     async def query(self, query: str, top_k: int) -> list[dict]:
         raise NotImplementedError
 
+    async def query_batch(self, queries: list[str], top_k: int) -> list[list[dict]]:
+        """Results of ``query`` for each of ``queries``, in order.
+
+        Backends override this to embed all queries in one call and search
+        them in one round trip.
+        """
+        return await asyncio.gather(*[self.query(q, top_k=top_k) for q in queries])
+
     async def upsert(self, data: dict[str, dict]):
         """Use 'content' field from value for embedding, use key as id.
         If embedding_func is None, use 'embedding' field from value
@@ -84,6 +93,9 @@ class BaseKVStorage(Generic[T], StorageNameSpace):
     async def upsert(self, data: dict[str, T]):
         raise NotImplementedError
 
+    async def delete(self, ids: list[str]):
+        raise NotImplementedError
+
     async def drop(self):
         raise NotImplementedError
 
@@ -131,6 +143,74 @@ class BaseGraphStorage(StorageNameSpace):
     async def embed_nodes(self, algorithm: str) -> tuple[np.ndarray, list[str]]:
         raise NotImplementedError("Node embedding is not used in lightrag.")
 
+    async def get_all_nodes(self) -> list[tuple[str, dict]]:
+        """Every node as (node id, properties)."""
+        raise NotImplementedError
+
+    async def get_all_edges(self) -> list[tuple[str, str, dict]]:
+        """Every edge as (source id, target id, properties)."""
+        raise NotImplementedError
+
+    # Batch operations. Results are aligned with the input order. The defaults
+    # fan out to the single-item methods; remote backends override them to
+    # answer a whole batch in one round trip.
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return await asyncio.gather(*[self.get_node(n) for n in node_ids])
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        return await asyncio.gather(*[self.node_degree(n) for n in node_ids])
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return await asyncio.gather(*[self.get_edge(s, t) for s, t in edge_pairs])
+
+    async def edge_degrees(self, edge_pairs: list[tuple[str, str]]) -> list[int]:
+        """Sum of endpoint degrees, resolved with one node_degrees call."""
+        names = list(dict.fromkeys(n for pair in edge_pairs for n in pair))
+        degrees = dict(zip(names, await self.node_degrees(names)))
+        return [(degrees[s] or 0) + (degrees[t] or 0) for s, t in edge_pairs]
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[Union[list[tuple[str, str]], None]]:
+        return await asyncio.gather(*[self.get_node_edges(n) for n in node_ids])
+
+    async def get_neighbourhood(self, node_ids: list[str]) -> dict:
+        """One-hop expansion of seed entities.
+
+        Returns a dict with:
+            edges: per seed (input order), the list of (seed, neighbour) tuples.
+            nodes: neighbour name -> node properties (None if missing).
+            edge_data: sorted (src, tgt) -> edge properties.
+            edge_degree: sorted (src, tgt) -> sum of endpoint degrees.
+        """
+        edges = [e or [] for e in await self.get_nodes_edges(node_ids)]
+        neighbours = list(
+            dict.fromkeys(e[1] for seed_edges in edges for e in seed_edges)
+        )
+        pairs = list(
+            dict.fromkeys(tuple(sorted(e)) for seed_edges in edges for e in seed_edges)
+        )
+        nodes, edge_data, edge_degree = await asyncio.gather(
+            self.get_nodes(neighbours), self.get_edges(pairs), self.edge_degrees(pairs)
+        )
+        return {
+            "edges": edges,
+            "nodes": dict(zip(neighbours, nodes)),
+            "edge_data": dict(zip(pairs, edge_data)),
+            "edge_degree": dict(zip(pairs, edge_degree)),
+        }
+
+    async def upsert_nodes(self, nodes: list[tuple[str, dict[str, str]]]):
+        for node_id, node_data in nodes:
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges(self, edges: list[tuple[str, str, dict[str, str]]]):
+        for source_node_id, target_node_id, edge_data in edges:
+            await self.upsert_edge(source_node_id, target_node_id, edge_data)
+
 
 class DocStatus(str, Enum):
     """Document processing status enum"""
@@ -1,15 +1,23 @@
+import asyncio
 import json
+import time
+import asyncpg
 import boto3
-import psycopg2
 from collections import Counter
 from functools import lru_cache
+from typing import AsyncIterator, Optional
 from .base import TextChunkSchema
-from .utils import encode_string_by_tiktoken, merge_content
+from .utils import encode_string_by_tiktoken, merge_content, logger
 from .prompt import AGG_CHUNK_SEP
 from .config import (
     config_file,
     chunks_table,
     subgraph_sources,
+    chunk_pool_min_size,
+    chunk_pool_max_size,
+    rds_token_ttl,
+    rds_token_refresh_margin,
+    chunk_cursor_prefetch,
 )
 
 
@@ -27,41 +35,127 @@ def read_config(file, env):
     file_content = content_object.get()["Body"].read().decode("utf-8")
     return file_content
 
-def db_connection(env):
-    creds = read_config(config_file, env)
-    creds = json.loads(creds)
-    rds_client = boto3.client("rds")
-    auth_token = rds_client.generate_db_auth_token(
-        DBHostname=creds["host"],
-        Port=creds["port"],
-        DBUsername=creds["user"],
-        Region=creds["region"],
-    )
-    return psycopg2.connect(
-        user=creds["user"],
-        password=auth_token,
-        host=creds["host"],
-        port=creds["port"],
-        database=creds["db"],
-        sslmode="require",
-    )
+
+class ChunkSource:
+    """Pooled async client for the chunk table of one env.
+
+    Connections come from an asyncpg pool. The RDS IAM token is cached and
+    re-minted shortly before it expires; asyncpg asks for it only when it
+    opens a new connection, so steady-state queries reuse warm TLS sessions.
+    """
+
+    def __init__(self, env: str):
+        self.env = env
+        self._creds: Optional[dict] = None
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_loop = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_creds(self) -> dict:
+        if self._creds is None:
+            content = await asyncio.to_thread(read_config, config_file, self.env)
+            self._creds = json.loads(content)
+        return self._creds
+
+    async def auth_token(self) -> str:
+        """Return a cached RDS IAM token, refreshing it before expiry."""
+        async with self._token_lock:
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            creds = await self._get_creds()
+
+            def _generate():
+                return boto3.client("rds").generate_db_auth_token(
+                    DBHostname=creds["host"],
+                    Port=creds["port"],
+                    DBUsername=creds["user"],
+                    Region=creds["region"],
+                )
+
+            self._token = await asyncio.to_thread(_generate)
+            self._token_expires_at = (
+                time.monotonic() + rds_token_ttl - rds_token_refresh_margin
+            )
+            logger.debug(f"Refreshed RDS auth token for env {self.env}")
+            return self._token
+
+    async def pool(self) -> asyncpg.Pool:
+        loop = asyncio.get_running_loop()
+        async with self._pool_lock:
+            if self._pool is not None and self._pool_loop is not loop:
+                # pools are bound to the loop that created them
+                self._pool.terminate()
+                self._pool = None
+            if self._pool is None:
+                creds = await self._get_creds()
+                self._pool = await asyncpg.create_pool(
+                    user=creds["user"],
+                    password=self.auth_token,
+                    host=creds["host"],
+                    port=creds["port"],
+                    database=creds["db"],
+                    ssl="require",
+                    min_size=chunk_pool_min_size,
+                    max_size=chunk_pool_max_size,
+                )
+                self._pool_loop = loop
+                logger.info(
+                    f"Created chunk source pool for env {self.env} "
+                    f"(max_size={chunk_pool_max_size})"
+                )
+        return self._pool
+
+    async def fetch(self, query: str, *args) -> list:
+        pool = await self.pool()
+        return await pool.fetch(query, *args)
+
+    async def stream(self, query: str, *args, prefetch: int = chunk_cursor_prefetch):
+        """Yield rows of `query` through a server-side cursor.
+
+        asyncpg cursors need a transaction; rows are pulled `prefetch` at a
+        time so memory stays flat regardless of result size.
+        """
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(query, *args, prefetch=prefetch):
+                    yield row
+
+    async def close(self):
+        async with self._pool_lock:
+            if self._pool is not None:
+                await self._pool.close()
+                self._pool = None
+                self._pool_loop = None
+
+
+_chunk_sources: dict[str, ChunkSource] = {}
+
+
+def get_chunk_source(env: str) -> ChunkSource:
+    if env not in _chunk_sources:
+        _chunk_sources[env] = ChunkSource(env)
+    return _chunk_sources[env]
+
+
+async def close_chunk_sources():
+    await asyncio.gather(*[source.close() for source in _chunk_sources.values()])
 
 
 async def get_docs(company_id: int, env: str):
-    connection = None
     docs = []
     try:
-        connection = db_connection(env)
-        cursor = connection.cursor()
-        docs_query = f"SELECT DISTINCT source_id FROM {chunks_table} WHERE company_id = {company_id}"
-        cursor.execute(docs_query)
-        docs = [doc[0] for doc in cursor.fetchall()]
-        print(f"Total {len(docs)} docs found")
+        rows = await get_chunk_source(env).fetch(
+            f"SELECT DISTINCT source_id FROM {chunks_table} WHERE company_id = $1",
+            company_id,
+        )
+        docs = [row[0] for row in rows]
+        logger.info(f"Total {len(docs)} docs found")
     except Exception as e:
-        print("Error occurred:", e)
-    finally:
-        if connection:
-            connection.close()
+        logger.error(f"Error fetching docs for company {company_id}: {e}")
     return docs
 
 
@@ -73,26 +167,81 @@ def get_unique_chunk_ids(chunk_ids):
 
 
 async def get_chunks(doc_id: int, min_tokens, company_id: int, env: str):
-    connection = None
     chunks = []
     try:
-        connection = db_connection(env)
-        cursor = connection.cursor()
-        docs_query = f"""
+        rows = await get_chunk_source(env).fetch(
+            f"""
             SELECT chunk_id, content, sequence, source
-            FROM {chunks_table} WHERE company_id = {company_id} AND source_id = {doc_id}
-            ORDER BY sequence"""
-        cursor.execute(docs_query)
-        rows = cursor.fetchall()
-        chunks = [rows[row_idx] for row_idx in get_unique_chunk_ids([row[0] for row in rows])]
+            FROM {chunks_table} WHERE company_id = $1 AND source_id = $2
+            ORDER BY sequence""",
+            company_id,
+            doc_id,
+        )
+        rows = [tuple(row) for row in rows]
+        if rows:
+            chunks = [rows[row_idx] for row_idx in get_unique_chunk_ids([row[0] for row in rows])]
     except Exception as e:
-        print("Error occurred:", e)
-    finally:
-        if connection:
-            connection.close()
+        logger.error(f"Error fetching chunks for doc {doc_id}: {e}")
     return get_chunks_helper(chunks, min_tokens, doc_id)
 
 
+def _build_doc_chunks(doc_id, rows, min_tokens: int):
+    if not rows:
+        return {}
+    rows = [rows[row_idx] for row_idx in get_unique_chunk_ids([row[0] for row in rows])]
+    return get_chunks_helper(rows, min_tokens, doc_id)
+
+
+async def iter_chunks_bulk(
+    doc_ids: list[int], min_tokens, company_id: int, env: str
+) -> AsyncIterator[tuple[int, dict]]:
+    """Stream chunks for many documents with a single query.
+
+    Rows are ordered by (source_id, sequence) so each document arrives as a
+    contiguous run; a document is yielded as `(doc_id, chunks)` as soon as
+    its last row has been read. Documents without rows are yielded with an
+    empty dict after the scan.
+    """
+    pending = set(doc_ids)
+    current_doc, current_rows = None, []
+    try:
+        async for row in get_chunk_source(env).stream(
+            f"""
+            SELECT source_id, chunk_id, content, sequence, source
+            FROM {chunks_table} WHERE company_id = $1 AND source_id = ANY($2::bigint[])
+            ORDER BY source_id, sequence""",
+            company_id,
+            list(doc_ids),
+        ):
+            doc_id = row[0]
+            if doc_id != current_doc:
+                if current_doc is not None:
+                    pending.discard(current_doc)
+                    yield current_doc, _build_doc_chunks(current_doc, current_rows, min_tokens)
+                current_doc, current_rows = doc_id, []
+            current_rows.append(tuple(row[1:]))
+        if current_doc is not None:
+            pending.discard(current_doc)
+            yield current_doc, _build_doc_chunks(current_doc, current_rows, min_tokens)
+    except Exception as e:
+        logger.error(f"Error streaming chunks for {len(doc_ids)} docs: {e}")
+    for doc_id in doc_ids:
+        if doc_id in pending:
+            yield doc_id, {}
+
+
+async def get_chunks_bulk(doc_ids: list[int], min_tokens, company_id: int, env: str):
+    """Fetch chunks for a batch of documents in one round trip.
+
+    Returns:
+        dict mapping doc_id to the chunks dict `get_chunks` would return.
+    """
+    return {
+        doc_id: chunks
+        async for doc_id, chunks in iter_chunks_bulk(doc_ids, min_tokens, company_id, env)
+    }
+
+
 def get_chunks_helper(rows, min_tokens: int, source_id: int):
     combined_chunks = []
 
@@ -144,15 +293,3 @@ def get_chunks_helper(rows, min_tokens: int, source_id: int):
         )
         for ch in combined_chunks
     }
-
-
-async def main():
-    await get_chunks(
-        min_tokens=1200,
-        batch_size=100,
-        company_id=18,
-    )
-
-if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""Shared, pooled API clients for the LLM and embedding providers.
+
+Provider functions in ``llm.py`` used to build a new OpenAI/Azure client,
+aiohttp session or aioboto3 client on every call, paying DNS + TLS setup each
+time and discarding keep-alive connections. The getters below return one
+client per (provider, endpoint, key, event loop) and keep it for reuse.
+
+Connection limits and timeouts come from ``ClientPoolConfig`` and apply to
+clients created after ``configure_client_pool`` is called. ``close_clients``
+closes everything (``LightRAG.aclose`` calls it).
+"""
+
+import asyncio
+import hashlib
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, replace
+from typing import Any, Optional
+
+from .utils import logger
+
+
+@dataclass(frozen=True)
+class ClientPoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 600.0
+
+
+_config = ClientPoolConfig()
+# (provider, endpoint, key id, loop id) -> (loop, client, close coroutine factory)
+_clients: dict[tuple, tuple] = {}
+
+
+def configure_client_pool(**kwargs) -> ClientPoolConfig:
+    """Update pool limits/timeouts for clients created from now on."""
+    global _config
+    _config = replace(_config, **kwargs)
+    return _config
+
+
+def _key_id(secret: Optional[str]) -> str:
+    return hashlib.sha256((secret or "").encode()).hexdigest()[:12]
+
+
+def _lookup(provider: str, endpoint: Optional[str], secret: Optional[str]):
+    # clients own connections bound to the loop that created them
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, _, _) in list(_clients.items()):
+        if client_loop.is_closed():
+            del _clients[key]
+    key = (provider, endpoint or "default", _key_id(secret), id(loop))
+    entry = _clients.get(key)
+    return key, loop, entry[1] if entry else None
+
+
+def _httpx_options(config: ClientPoolConfig) -> dict:
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+    }
+
+
+def get_openai_client(
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    max_retries: Optional[int] = None,
+):
+    """``max_retries=0`` for callers that retry themselves (the rate governor);
+    ``None`` keeps the SDK's own retries."""
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    provider = "openai" if max_retries is None else f"openai:retries={max_retries}"
+    key, loop, client = _lookup(provider, base_url, api_key)
+    if client is None:
+        retries = {} if max_retries is None else {"max_retries": max_retries}
+        client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(**_httpx_options(_config)),
+            **retries,
+        )
+        _clients[key] = (loop, client, client.close)
+    return client
+
+
+def get_azure_openai_client(
+    azure_endpoint: Optional[str], api_key: Optional[str], api_version: Optional[str]
+):
+    from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+
+    key, loop, client = _lookup(
+        "azure_openai", f"{azure_endpoint}@{api_version}", api_key
+    )
+    if client is None:
+        client = AsyncAzureOpenAI(
+            azure_endpoint=azure_endpoint,
+            api_key=api_key,
+            api_version=api_version,
+            http_client=DefaultAsyncHttpxClient(**_httpx_options(_config)),
+        )
+        _clients[key] = (loop, client, client.close)
+    return client
+
+
+def get_aiohttp_session(endpoint: Optional[str] = None):
+    """Shared aiohttp session; ``endpoint`` only separates connection pools."""
+    import aiohttp
+
+    key, loop, session = _lookup("aiohttp", endpoint, None)
+    if session is None:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=_config.max_connections,
+                keepalive_timeout=_config.keepalive_expiry,
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=_config.read_timeout, connect=_config.connect_timeout
+            ),
+        )
+        _clients[key] = (loop, session, session.close)
+    return session
+
+
+async def get_bedrock_client(
+    service: str = "bedrock-runtime",
+    aws_access_key_id: Optional[str] = None,
+    region_name: Optional[str] = None,
+) -> Any:
+    import aioboto3
+    from botocore.config import Config
+
+    key, loop, client = _lookup(
+        "bedrock", f"{service}@{region_name}", aws_access_key_id
+    )
+    if client is None:
+        stack = AsyncExitStack()
+        client = await stack.enter_async_context(
+            aioboto3.Session().client(
+                service,
+                region_name=region_name,
+                config=Config(
+                    max_pool_connections=_config.max_connections,
+                    connect_timeout=_config.connect_timeout,
+                    read_timeout=_config.read_timeout,
+                    tcp_keepalive=True,
+                ),
+            )
+        )
+        _clients[key] = (loop, client, stack.aclose)
+    return client
+
+
+async def close_clients():
+    """Close every pooled client created on the running event loop."""
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, _, close) in list(_clients.items()):
+        if client_loop is not loop:
+            continue
+        del _clients[key]
+        try:
+            await close()
+        except Exception as e:
+            logger.warning(f"Failed to close {key[0]} client: {e}")
@@ -8,4 +8,8 @@ subgraph_sources={
 insert_batch_size=10
 min_chunk_tokens=1200
 max_glean_steps=5
-    
\ No newline at end of file
+chunk_pool_min_size=1
+chunk_pool_max_size=10
+rds_token_ttl=15 * 60
+rds_token_refresh_margin=2 * 60
+chunk_cursor_prefetch=500
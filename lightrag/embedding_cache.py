@@ -0,0 +1,167 @@
+"""Persistent embedding cache keyed by (model, dimension, text hash).
+
+Vectors are stored as float16 blobs in a SQLite file (WAL mode), so a cached
+1536-d embedding costs ~3 KB on disk and survives restarts. Lookups are
+batched into one ``IN`` query per call; recency is tracked per row and the
+least recently used rows are evicted once ``max_entries`` is exceeded.
+"""
+
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+from hashlib import md5
+from typing import Optional
+
+import numpy as np
+
+from .utils import logger
+
+# SQLite caps host parameters per statement; stay well below the old default
+_MAX_PARAMS = 500
+# buffered recency updates written in one statement
+_TOUCH_FLUSH = 1000
+
+
+def embedding_model_name(func) -> Optional[str]:
+    """The ``model`` an embedding provider is bound to, if it can be read.
+
+    Looks through ``functools.partial`` and EmbeddingFunc wrappers for a bound
+    ``model`` keyword, then for the default of the provider's ``model``
+    parameter (e.g. ``openai_embedding`` passed unwrapped). Lambdas and other
+    closures hide their model and give None.
+    """
+    while True:
+        if isinstance(func, partial):
+            if func.keywords.get("model"):
+                return str(func.keywords["model"])
+            func = func.func
+        elif hasattr(func, "func") and hasattr(func, "embedding_dim"):
+            func = func.func
+        else:
+            break
+    try:
+        parameter = inspect.signature(func).parameters.get("model")
+    except (TypeError, ValueError):
+        return None
+    if parameter is None or parameter.default in (inspect.Parameter.empty, None):
+        return None
+    return str(parameter.default)
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        file_name: str,
+        model: str,
+        embedding_dim: int,
+        max_entries: Optional[int] = 1_000_000,
+    ):
+        self.file_name = file_name
+        self.model = model
+        self.embedding_dim = embedding_dim
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+        self._db = sqlite3.connect(file_name, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {}
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return md5(
+            f"{self.model}\0{self.embedding_dim}\0{text}".encode("utf-8")
+        ).hexdigest()
+
+    def get_many(self, texts: list[str]) -> list[Optional[np.ndarray]]:
+        """Cached float32 vectors for ``texts`` in order, None for misses."""
+        keys = [self._key(text) for text in texts]
+        found: dict[str, bytes] = {}
+        now = time.time()
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), _MAX_PARAMS):
+                chunk = unique[start : start + _MAX_PARAMS]
+                marks = ",".join("?" * len(chunk))
+                found.update(
+                    self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({marks})",
+                        chunk,
+                    ).fetchall()
+                )
+            # recency updates are buffered and written with the next insert
+            self._touched.update(dict.fromkeys(found, now))
+            if len(self._touched) >= _TOUCH_FLUSH:
+                self._flush_touched()
+                self._db.commit()
+        results = [
+            np.frombuffer(found[key], dtype=np.float16).astype(np.float32)
+            if key in found
+            else None
+            for key in keys
+        ]
+        hits = sum(r is not None for r in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, texts: list[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float16)
+        now = time.time()
+        rows = [
+            (self._key(text), vector.tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._count += self._db.total_changes - before
+            self._flush_touched()
+            self._evict()
+            self._db.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        if self.max_entries is None or self._count <= self.max_entries:
+            return
+        # trim to 90% so eviction does not run on every insert
+        excess = self._count - int(self.max_entries * 0.9)
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+        logger.debug(f"Evicted {excess} embeddings from {self.file_name}")
+
+    def stats(self) -> dict:
+        return {"entries": self._count, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
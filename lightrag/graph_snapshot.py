@@ -0,0 +1,290 @@
+"""Compact binary snapshot format for NetworkX graphs.
+
+A snapshot is an uncompressed ``.npz`` archive (no pickled objects) holding:
+
+- ``strings_blob`` / ``strings_offsets``: an interned UTF-8 string table.
+  Node ids, attribute names and string attribute values are stored once and
+  referenced everywhere else by int32 index.
+- ``node_ids``: string-table index of every node, in insertion order.
+- ``edge_src`` / ``edge_tgt``: node positions (not string indices) of every edge.
+- ``{node,edge}_col_<i>``: one columnar array per attribute name. String
+  columns hold string-table indices (-1 = missing); int columns hold int64
+  plus a presence mask; float columns hold float64 (NaN = missing); anything
+  else is JSON-encoded into the string table.
+- ``meta``: JSON describing the columns and whether the graph is directed.
+
+Loading is a handful of array reads plus one decode of the string blob, which
+is much cheaper than parsing GraphML XML.
+
+Usage as a converter:
+    python -m lightrag.graph_snapshot graph_chunk_entity_relation.graphml graph_chunk_entity_relation.snapshot
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+import networkx as nx
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+
+_MISSING = -1
+
+
+class _StringTable:
+    def __init__(self):
+        self._index: dict[str, int] = {}
+        self._strings: list[str] = []
+
+    def intern(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self._strings)
+            self._index[value] = idx
+            self._strings.append(value)
+        return idx
+
+    def to_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        encoded = [s.encode("utf-8") for s in self._strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return blob, offsets
+
+
+def _column_kind(values: list) -> str:
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    if all(
+        isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present
+    ):
+        return "int"
+    if all(
+        isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool)
+        for v in present
+    ):
+        return "float"
+    return "json"
+
+
+def _rows_to_columns(rows: list[dict]) -> dict[str, list]:
+    keys: dict[str, None] = {}
+    for row in rows:
+        for k in row:
+            keys.setdefault(k, None)
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def _encode_columns(columns: dict[str, list], strings: _StringTable, prefix: str):
+    arrays, meta = {}, []
+    for i, (key, values) in enumerate(columns.items()):
+        kind = _column_kind(values)
+        if kind == "int":
+            col = np.array([0 if v is None else int(v) for v in values], dtype=np.int64)
+            arrays[f"{prefix}_mask_{i}"] = np.array(
+                [v is not None for v in values], dtype=bool
+            )
+        elif kind == "float":
+            col = np.array(
+                [np.nan if v is None else float(v) for v in values], dtype=np.float64
+            )
+        elif kind == "str":
+            col = np.array(
+                [_MISSING if v is None else strings.intern(v) for v in values],
+                dtype=np.int32,
+            )
+        else:
+            col = np.array(
+                [
+                    _MISSING if v is None else strings.intern(json.dumps(v))
+                    for v in values
+                ],
+                dtype=np.int32,
+            )
+        arrays[f"{prefix}_col_{i}"] = col
+        meta.append({"name": strings.intern(key), "kind": kind})
+    return arrays, meta
+
+
+def _decode_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [
+        data[bounds[i] : bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)
+    ]
+
+
+def _decode_columns(
+    archive, meta: list[dict], strings: list[str], prefix: str, n: int
+) -> dict[str, list]:
+    columns = {}
+    for i, column in enumerate(meta):
+        col = archive[f"{prefix}_col_{i}"]
+        values = [None] * n
+        if column["kind"] == "int":
+            present = np.flatnonzero(archive[f"{prefix}_mask_{i}"])
+            decoded = col[present].tolist()
+        elif column["kind"] == "float":
+            present = np.flatnonzero(~np.isnan(col))
+            decoded = col[present].tolist()
+        else:
+            present = np.flatnonzero(col != _MISSING)
+            decoded = [strings[j] for j in col[present].tolist()]
+            if column["kind"] == "json":
+                decoded = [json.loads(v) for v in decoded]
+        for row_idx, value in zip(present.tolist(), decoded):
+            values[row_idx] = value
+        columns[strings[column["name"]]] = values
+    return columns
+
+
+@dataclass
+class GraphArrays:
+    """Array-level view of a snapshot; attribute columns use None for missing."""
+
+    node_names: list[str]
+    node_columns: dict[str, list]
+    edge_src: np.ndarray
+    edge_tgt: np.ndarray
+    edge_columns: dict[str, list]
+    directed: bool = False
+
+
+def write_graph_arrays(file_name: str, arrays: GraphArrays):
+    """Write ``arrays`` to ``file_name`` atomically."""
+    strings = _StringTable()
+    node_ids = np.array(
+        [strings.intern(str(n)) for n in arrays.node_names], dtype=np.int32
+    )
+    node_arrays, node_meta = _encode_columns(arrays.node_columns, strings, "node")
+    edge_arrays, edge_meta = _encode_columns(arrays.edge_columns, strings, "edge")
+
+    blob, offsets = strings.to_arrays()
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "directed": arrays.directed,
+        "node_columns": node_meta,
+        "edge_columns": edge_meta,
+    }
+    tmp_file = f"{file_name}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.savez(
+            f,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            strings_blob=blob,
+            strings_offsets=offsets,
+            node_ids=node_ids,
+            edge_src=np.asarray(arrays.edge_src, dtype=np.int32),
+            edge_tgt=np.asarray(arrays.edge_tgt, dtype=np.int32),
+            **node_arrays,
+            **edge_arrays,
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, file_name)
+
+
+def read_graph_arrays(file_name: str) -> GraphArrays:
+    with np.load(file_name, allow_pickle=False) as archive:
+        meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported graph snapshot version {meta.get('version')} in {file_name}"
+            )
+        strings = _decode_strings(archive["strings_blob"], archive["strings_offsets"])
+        node_names = [strings[i] for i in archive["node_ids"].tolist()]
+        edge_src = archive["edge_src"]
+        edge_tgt = archive["edge_tgt"]
+        return GraphArrays(
+            node_names=node_names,
+            node_columns=_decode_columns(
+                archive, meta["node_columns"], strings, "node", len(node_names)
+            ),
+            edge_src=edge_src,
+            edge_tgt=edge_tgt,
+            edge_columns=_decode_columns(
+                archive, meta["edge_columns"], strings, "edge", len(edge_src)
+            ),
+            directed=meta["directed"],
+        )
+
+
+def _columns_to_rows(columns: dict[str, list], n: int) -> list[dict]:
+    rows = [{} for _ in range(n)]
+    for name, values in columns.items():
+        for row, value in zip(rows, values):
+            if value is not None:
+                row[name] = value
+    return rows
+
+
+def write_graph_snapshot(graph: nx.Graph, file_name: str):
+    """Write ``graph`` to ``file_name`` atomically."""
+    nodes = list(graph.nodes(data=True))
+    node_pos = {node: i for i, (node, _) in enumerate(nodes)}
+    edges = list(graph.edges(data=True))
+    write_graph_arrays(
+        file_name,
+        GraphArrays(
+            node_names=[n for n, _ in nodes],
+            node_columns=_rows_to_columns([data for _, data in nodes]),
+            edge_src=np.array([node_pos[u] for u, _, _ in edges], dtype=np.int32),
+            edge_tgt=np.array([node_pos[v] for _, v, _ in edges], dtype=np.int32),
+            edge_columns=_rows_to_columns([data for _, _, data in edges]),
+            directed=graph.is_directed(),
+        ),
+    )
+
+
+def read_graph_snapshot(file_name: str) -> nx.Graph:
+    arrays = read_graph_arrays(file_name)
+    names = arrays.node_names
+    graph = nx.DiGraph() if arrays.directed else nx.Graph()
+    graph.add_nodes_from(zip(names, _columns_to_rows(arrays.node_columns, len(names))))
+    graph.add_edges_from(
+        (names[u], names[v], data)
+        for u, v, data in zip(
+            arrays.edge_src.tolist(),
+            arrays.edge_tgt.tolist(),
+            _columns_to_rows(arrays.edge_columns, len(arrays.edge_src)),
+        )
+    )
+    return graph
+
+
+def convert_graphml_to_snapshot(graphml_file: str, snapshot_file: str) -> nx.Graph:
+    graph = nx.read_graphml(graphml_file)
+    write_graph_snapshot(graph, snapshot_file)
+    return graph
+
+
+def export_snapshot_to_graphml(snapshot_file: str, graphml_file: str) -> nx.Graph:
+    graph = read_graph_snapshot(snapshot_file)
+    nx.write_graphml(graph, graphml_file)
+    return graph
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert between GraphML and binary graph snapshots"
+    )
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument(
+        "--to-graphml",
+        action="store_true",
+        help="export a snapshot back to GraphML instead",
+    )
+    args = parser.parse_args()
+    if args.to_graphml:
+        g = export_snapshot_to_graphml(args.source, args.target)
+    else:
+        g = convert_graphml_to_snapshot(args.source, args.target)
+    print(
+        f"Wrote {args.target}: {g.number_of_nodes()} nodes, {g.number_of_edges()} edges"
+    )
@@ -0,0 +1,166 @@
+"""IVF-flat approximate nearest-neighbour index over a row-addressed matrix.
+
+The index does not own vectors: it clusters the rows of an external matrix
+(NumpyVectorDBStorage's; rows may be scaled per row, like int8 codes) with
+spherical k-means and keeps, per cluster, the row numbers assigned to it. A query scores the
+``nlist`` centroids, visits the ``nprobe`` best clusters and returns their
+rows as candidates for exact re-scoring, so a search touches roughly
+``nprobe / nlist`` of the data.
+
+Rows added after the last (re)build are kept in a small pending set that is
+filtered by cluster at query time; the inverted lists are rebuilt once the
+pending set grows, and the centroids are retrained when the matrix has grown
+by ``retrain_growth`` since training.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# fraction of indexed rows that may sit in the pending set before a rebuild
+PENDING_REBUILD_RATIO = 0.05
+
+
+def default_nlist(num_rows: int) -> int:
+    return max(1, int(np.sqrt(num_rows)))
+
+
+class IVFFlatIndex:
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        train_iterations: int = 10,
+        max_train_samples: int = 64,
+        retrain_growth: float = 2.0,
+        seed: int = 0,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        # training sample size per centroid
+        self.max_train_samples = max_train_samples
+        self.retrain_growth = retrain_growth
+        self._rng = np.random.default_rng(seed)
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assignment = np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._order = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._pending: list[int] = []
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, num_rows: int) -> bool:
+        return not self.trained or num_rows >= self.retrain_growth * self.trained_rows
+
+    # -- training --------------------------------------------------------
+
+    def _assign(self, vectors: np.ndarray, block: int = 65536) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for i in range(0, len(vectors), block):
+            chunk = np.asarray(vectors[i : i + block], dtype=np.float32)
+            labels[i : i + block] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return labels
+
+    def train(self, matrix: np.ndarray, num_rows: int):
+        """(Re)train the centroids on ``matrix[:num_rows]`` and rebuild the lists."""
+        nlist = min(self.nlist or default_nlist(num_rows), num_rows)
+        sample_size = min(num_rows, nlist * self.max_train_samples)
+        sample_rows = np.sort(
+            self._rng.choice(num_rows, size=sample_size, replace=False)
+        )
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        # only directions matter, so int8 rows (scaled per row) work too
+        sample /= np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-12)
+        centroids = sample[self._rng.choice(sample_size, size=nlist, replace=False)]
+        for _ in range(self.train_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            starts = np.searchsorted(labels[order], np.arange(nlist))
+            counts = np.bincount(labels, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            sums[counts > 0] = np.add.reduceat(
+                sample[order], starts[counts > 0], axis=0
+            )
+            empty = counts == 0
+            if empty.any():
+                # re-seed empty clusters from random sample points
+                sums[empty] = sample[self._rng.choice(sample_size, size=empty.sum())]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1)
+        self.centroids = centroids.astype(np.float32)
+        self.assignment = self._assign(matrix[:num_rows])
+        self.trained_rows = num_rows
+        self._rebuild()
+
+    def _rebuild(self):
+        self._order = np.argsort(self.assignment, kind="stable")
+        self._offsets = np.searchsorted(
+            self.assignment[self._order], np.arange(len(self.centroids) + 1)
+        )
+        self._pending = []
+
+    # -- maintenance -----------------------------------------------------
+
+    def add(self, rows: list[int], vectors: np.ndarray):
+        """Assign new or re-embedded rows; they are searchable immediately."""
+        if not self.trained or not len(rows):
+            return
+        labels = self._assign(vectors)
+        size = max(rows) + 1
+        if size > len(self.assignment):
+            grown = np.full(max(size, 2 * len(self.assignment)), -1, dtype=np.int32)
+            grown[: len(self.assignment)] = self.assignment
+            self.assignment = grown
+        self.assignment[rows] = labels
+        self._pending.extend(rows)
+        if len(self._pending) > PENDING_REBUILD_RATIO * max(len(self._order), 1):
+            self._rebuild_from_assignment()
+
+    def _rebuild_from_assignment(self):
+        assigned = np.flatnonzero(self.assignment >= 0)
+        self._order = assigned[np.argsort(self.assignment[assigned], kind="stable")]
+        self._offsets = np.searchsorted(
+            self.assignment[self._order], np.arange(len(self.centroids) + 1)
+        )
+        self._pending = []
+
+    def remap(self, keep: np.ndarray):
+        """Follow a compaction that kept rows ``keep`` (old row numbers, in order)."""
+        if not self.trained:
+            return
+        self.assignment = self.assignment[keep[keep < len(self.assignment)]]
+        self._rebuild_from_assignment()
+
+    # -- search ----------------------------------------------------------
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Row numbers in the ``nprobe`` clusters closest to ``query``."""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        parts = [self._order[self._offsets[p] : self._offsets[p + 1]] for p in probes]
+        if self._pending:
+            pending = np.unique(np.asarray(self._pending, dtype=np.int64))
+            parts.append(pending[np.isin(self.assignment[pending], probes)])
+            return np.unique(np.concatenate(parts))
+        return np.concatenate(parts)
+
+    # -- persistence -----------------------------------------------------
+
+    def state(self) -> dict:
+        return {
+            "centroids": self.centroids,
+            "assignment": self.assignment,
+            "trained_rows": np.array(self.trained_rows),
+        }
+
+    def load_state(self, state, num_rows: int):
+        self.centroids = state["centroids"]
+        self.assignment = state["assignment"][:num_rows]
+        self.trained_rows = int(state["trained_rows"])
+        self._rebuild_from_assignment()
@@ -27,6 +27,10 @@ if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 
+# Max per-item branches combined into one UNION ALL query by the batch methods
+BATCH_QUERY_SIZE = 100
+
+
 class AGEQueryException(Exception):
     """Exception for the AGE queries."""
 
@@ -513,6 +517,89 @@ class AGEStorage(BaseGraphStorage):
 
         return edges
 
+    @staticmethod
+    def _encode_labels(node_ids: List[str]) -> List[str]:
+        return [
+            AGEStorage._encode_graph_label(node_id.strip('"')) for node_id in node_ids
+        ]
+
+    async def _query_union(self, branches: List[str]) -> List[Dict[str, Any]]:
+        """Run per-item cypher branches as UNION ALL queries, in chunks.
+
+        Each branch must return the same aliased columns, the first being
+        ``idx``; branches must not contain format placeholders.
+        """
+        results = []
+        for i in range(0, len(branches), BATCH_QUERY_SIZE):
+            query = "\nUNION ALL\n".join(branches[i : i + BATCH_QUERY_SIZE])
+            results.extend(await self._query(query))
+        return results
+
+    async def get_nodes(self, node_ids: List[str]) -> List[Union[dict, None]]:
+        if not node_ids:
+            return []
+        branches = [
+            f"MATCH (n:`{label}`) RETURN {i} AS idx, n LIMIT 1"
+            for i, label in enumerate(self._encode_labels(node_ids))
+        ]
+        nodes = [None] * len(node_ids)
+        for record in await self._query_union(branches):
+            nodes[int(record["idx"])] = record["n"]
+        return nodes
+
+    async def node_degrees(self, node_ids: List[str]) -> List[int]:
+        if not node_ids:
+            return []
+        branches = [
+            f"MATCH (n:`{label}`)-[]->(x) "
+            f"RETURN {i} AS idx, count(x) AS total_edge_count"
+            for i, label in enumerate(self._encode_labels(node_ids))
+        ]
+        degrees = [0] * len(node_ids)
+        for record in await self._query_union(branches):
+            degrees[int(record["idx"])] = int(record["total_edge_count"] or 0)
+        return degrees
+
+    async def get_edges(
+        self, edge_pairs: List[Tuple[str, str]]
+    ) -> List[Union[dict, None]]:
+        if not edge_pairs:
+            return []
+        branches = [
+            f"MATCH (a:`{src}`)-[r]->(b:`{tgt}`) "
+            f"RETURN {i} AS idx, properties(r) AS edge_properties LIMIT 1"
+            for i, (src, tgt) in enumerate(
+                zip(
+                    self._encode_labels([s for s, _ in edge_pairs]),
+                    self._encode_labels([t for _, t in edge_pairs]),
+                )
+            )
+        ]
+        edges = [None] * len(edge_pairs)
+        for record in await self._query_union(branches):
+            if record["edge_properties"]:
+                edges[int(record["idx"])] = record["edge_properties"]
+        return edges
+
+    async def get_nodes_edges(self, node_ids: List[str]) -> List[List[Tuple[str, str]]]:
+        if not node_ids:
+            return []
+        branches = [
+            f"MATCH (n:`{label}`) "
+            "OPTIONAL MATCH (n)-[r]-(connected) "
+            f"RETURN {i} AS idx, n, connected"
+            for i, label in enumerate(self._encode_labels(node_ids))
+        ]
+        edges = [[] for _ in node_ids]
+        for record in await self._query_union(branches):
+            source_node, connected_node = record["n"], record["connected"]
+            if source_node and connected_node:
+                if source_node.get("label") and connected_node.get("label"):
+                    edges[int(record["idx"])].append(
+                        (source_node["label"], connected_node["label"])
+                    )
+        return edges
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
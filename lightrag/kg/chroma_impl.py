@@ -138,11 +138,14 @@ class ChromaVectorDBStorage(BaseVectorStorage):
             raise
 
     async def query(self, query: str, top_k=5) -> Union[dict, list[dict]]:
+        return (await self.query_batch([query], top_k))[0]
+
+    async def query_batch(self, queries: list[str], top_k=5) -> list[list[dict]]:
         try:
-            embedding = await self.embedding_func([query])
+            embeddings = await self.embedding_func(queries)
 
             results = self._collection.query(
-                query_embeddings=embedding.tolist(),
+                query_embeddings=embeddings.tolist(),
                 n_results=top_k * 2,  # Request more results to allow for filtering
                 include=["metadatas", "distances", "documents"],
             )
@@ -152,16 +155,25 @@ class ChromaVectorDBStorage(BaseVectorStorage):
             # ChromaDB returns cosine similarity (1 = identical, 0 = orthogonal)
             # We convert to distance (0 = identical, 1 = orthogonal) via (1 - similarity)
             # Only keep results with distance below threshold, then take top k
+            # Each field holds one list per query embedding
             return [
-                {
-                    "id": results["ids"][0][i],
-                    "distance": 1 - results["distances"][0][i],
-                    "content": results["documents"][0][i],
-                    **results["metadatas"][0][i],
-                }
-                for i in range(len(results["ids"][0]))
-                if (1 - results["distances"][0][i]) >= self.cosine_better_than_threshold
-            ][:top_k]
+                [
+                    {
+                        "id": ids[i],
+                        "distance": 1 - distances[i],
+                        "content": documents[i],
+                        **metadatas[i],
+                    }
+                    for i in range(len(ids))
+                    if (1 - distances[i]) >= self.cosine_better_than_threshold
+                ][:top_k]
+                for ids, distances, documents, metadatas in zip(
+                    results["ids"],
+                    results["distances"],
+                    results["documents"],
+                    results["metadatas"],
+                )
+            ]
 
         except Exception as e:
             logger.error(f"Error during ChromaDB query: {str(e)}")
@@ -0,0 +1,565 @@
+import os
+from dataclasses import dataclass
+from typing import Union
+
+import networkx as nx
+import numpy as np
+
+from lightrag.base import BaseGraphStorage
+from lightrag.graph_snapshot import (
+    GraphArrays,
+    read_graph_arrays,
+    write_graph_arrays,
+)
+from lightrag.prompt import SUBGRAPH_SEP
+from lightrag.utils import logger, split_string_by_multi_markers
+
+_MISSING = -1
+
+
+def _grow(arr: np.ndarray, size: int) -> np.ndarray:
+    """Return ``arr`` with capacity for at least ``size`` items (amortised doubling)."""
+    if size <= len(arr):
+        return arr
+    new = np.zeros(max(size, 2 * len(arr), 1024), dtype=arr.dtype)
+    new[: len(arr)] = arr
+    return new
+
+
+class _AttributeColumns:
+    """Attributes of numbered rows, one typed column per attribute name.
+
+    String values are interned in a string table shared by the columns and
+    stored as int32 codes (-1 = missing); floats are stored as float64 (NaN =
+    missing). A column that receives any other value, or a value of a second
+    kind, falls back to a Python list. Strings that are no longer referenced
+    are dropped from the table by ``compact_strings``.
+    """
+
+    def __init__(self, size: int = 0):
+        self.size = size
+        self.columns: dict[str, Union[np.ndarray, list]] = {}
+        self.strings: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    @classmethod
+    def from_lists(cls, columns: dict[str, list], size: int) -> "_AttributeColumns":
+        attrs = cls(size)
+        for name, values in columns.items():
+            for idx, value in enumerate(values):
+                if value is not None:
+                    attrs._set(name, idx, value)
+        return attrs
+
+    def _intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def resize(self, size: int):
+        """Make room for rows up to ``size`` (new rows have no attributes)."""
+        self.size = size
+        for name, column in self.columns.items():
+            if isinstance(column, list):
+                column.extend([None] * (size - len(column)))
+            elif size > len(column):
+                grown = np.full(
+                    max(size, 2 * len(column), 1024),
+                    _MISSING if column.dtype == np.int32 else np.nan,
+                    dtype=column.dtype,
+                )
+                grown[: len(column)] = column
+                self.columns[name] = grown
+
+    def _new_column(self, name: str, value) -> Union[np.ndarray, list]:
+        if isinstance(value, str):
+            column = np.full(self.size, _MISSING, dtype=np.int32)
+        elif isinstance(value, float):
+            column = np.full(self.size, np.nan, dtype=np.float64)
+        else:
+            column = [None] * self.size
+        self.columns[name] = column
+        return column
+
+    def _as_list(self, name: str) -> list:
+        column = self.columns[name]
+        self.columns[name] = [self._decode(column, i) for i in range(self.size)]
+        return self.columns[name]
+
+    def _decode(self, column, idx: int):
+        if isinstance(column, list):
+            return column[idx]
+        value = column[idx]
+        if column.dtype == np.int32:
+            return None if value == _MISSING else self.strings[value]
+        return None if np.isnan(value) else float(value)
+
+    def _set(self, name: str, idx: int, value):
+        column = self.columns.get(name)
+        if column is None:
+            column = self._new_column(name, value)
+        if isinstance(column, np.ndarray):
+            if column.dtype == np.int32 and isinstance(value, str):
+                column[idx] = self._intern(value)
+                return
+            if column.dtype == np.float64 and isinstance(value, float):
+                column[idx] = value
+                return
+            column = self._as_list(name)
+        column[idx] = value
+
+    def set(self, idx: int, data: dict):
+        for name, value in data.items():
+            self._set(name, idx, value)
+
+    def get(self, idx: int) -> dict:
+        attrs = {}
+        for name, column in self.columns.items():
+            value = self._decode(column, idx)
+            if value is not None:
+                attrs[name] = value
+        return attrs
+
+    def clear(self, idx: int):
+        for name, column in self.columns.items():
+            if isinstance(column, list):
+                column[idx] = None
+            else:
+                column[idx] = _MISSING if column.dtype == np.int32 else np.nan
+
+    def take(self, rows: np.ndarray) -> dict[str, list]:
+        """Columns of ``rows`` as lists with None for missing values."""
+        taken = {}
+        for name, column in self.columns.items():
+            if isinstance(column, list):
+                taken[name] = [column[i] for i in rows.tolist()]
+            elif column.dtype == np.int32:
+                strings = self.strings
+                taken[name] = [
+                    None if code == _MISSING else strings[code]
+                    for code in column[rows].tolist()
+                ]
+            else:
+                taken[name] = [
+                    None if value != value else value for value in column[rows].tolist()
+                ]
+        return taken
+
+    def matching(self, name: str, rows: np.ndarray, predicate) -> np.ndarray:
+        """The ``rows`` whose attribute ``name`` is set and satisfies
+        ``predicate``; for string columns each distinct value is tested once."""
+        column = self.columns.get(name)
+        if column is None or not len(rows):
+            return rows[:0]
+        if isinstance(column, list) or column.dtype != np.int32:
+            values = [self._decode(column, i) for i in rows.tolist()]
+            keep = [value is not None and predicate(value) for value in values]
+            return rows[np.asarray(keep, dtype=bool)]
+        codes = column[rows]
+        present = np.unique(codes[codes != _MISSING])
+        accepted = [c for c in present.tolist() if predicate(self.strings[c])]
+        return rows[np.isin(codes, accepted)]
+
+    def compact_strings(self, live_rows: np.ndarray):
+        """Rebuild the string table from the strings ``live_rows`` still use,
+        once most of it is garbage (replaced or deleted values)."""
+        string_columns = [
+            name
+            for name, column in self.columns.items()
+            if isinstance(column, np.ndarray) and column.dtype == np.int32
+        ]
+        used = [self.columns[name][live_rows] for name in string_columns]
+        used = np.unique(np.concatenate(used)) if used else np.zeros(0, np.int32)
+        used = used[used != _MISSING]
+        if len(self.strings) <= max(2 * len(used), 1024):
+            return
+        remap = np.full(len(self.strings) + 1, _MISSING, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        self.strings = [self.strings[c] for c in used.tolist()]
+        self._codes = {value: code for code, value in enumerate(self.strings)}
+        for name in string_columns:
+            column = self.columns[name]
+            keep = np.full(len(column), _MISSING, dtype=np.int32)
+            keep[live_rows] = column[live_rows]
+            # _MISSING indexes the extra slot at the end, which maps to itself
+            self.columns[name] = remap[keep]
+
+
+@dataclass
+class CSRGraphStorage(BaseGraphStorage):
+    """Read-optimised undirected graph on integer node ids.
+
+    Nodes are interned to consecutive ints; their attributes live in typed
+    columns (``_AttributeColumns``: interned strings, floats). Edges are kept
+    as parallel src/tgt arrays with columnar attributes, and adjacency is a NumPy CSR (``indptr``/``nbr``/``eid``) with
+    each row sorted by neighbour id, so neighbourhood expansion is a slice and
+    edge lookup a binary search. Edges added since the last CSR build sit in a
+    small delta adjacency; deletions are tombstones. The CSR is rebuilt when
+    the delta grows past ``compact_ratio`` of the base or on flush.
+
+    Persists to ``graph_<namespace>.snapshot`` (the same format NetworkXStorage
+    writes), falling back to an existing GraphML file on first load, and
+    exports the ``PK`` subgraph to ``subgraph_<namespace>.graphml`` like
+    NetworkXStorage does.
+    """
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._snapshot_file = os.path.join(
+            working_dir, f"graph_{self.namespace}.snapshot"
+        )
+        self._graphml_xml_file = os.path.join(
+            working_dir, f"graph_{self.namespace}.graphml"
+        )
+        self._graphml_xml_sg_file = os.path.join(
+            working_dir, f"subgraph_{self.namespace}.graphml"
+        )
+        config = self.global_config.get("graph_storage_cls_kwargs", {})
+        self._compact_ratio = config.get("compact_ratio", 0.2)
+
+        self._names: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._node_alive = np.zeros(0, dtype=bool)
+        self._node_attrs = _AttributeColumns()
+        self._degree = np.zeros(0, dtype=np.int64)
+
+        self._num_edges = 0
+        self._edge_src = np.zeros(0, dtype=np.int32)
+        self._edge_tgt = np.zeros(0, dtype=np.int32)
+        self._edge_alive = np.zeros(0, dtype=bool)
+        self._edge_attrs = _AttributeColumns()
+
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._nbr = np.zeros(0, dtype=np.int32)
+        self._eid = np.zeros(0, dtype=np.int32)
+        self._delta: dict[int, dict[int, int]] = {}
+        self._delta_edges = 0
+        self._dirty = False
+
+        self._load()
+        self._rebuild_csr()
+        logger.info(
+            f"Loaded CSR graph {self.namespace} with {len(self._ids)} nodes, "
+            f"{self._num_edges} edges"
+        )
+
+    # ---------------------------------------------------------------- loading
+
+    def _load(self):
+        if os.path.exists(self._snapshot_file):
+            arrays = read_graph_arrays(self._snapshot_file)
+        elif os.path.exists(self._graphml_xml_file):
+            graph = nx.read_graphml(self._graphml_xml_file)
+            arrays = CSRGraphStorage._arrays_from_networkx(graph)
+        else:
+            return
+        n = len(arrays.node_names)
+        self._names = list(arrays.node_names)
+        self._ids = {name: i for i, name in enumerate(self._names)}
+        self._node_alive = np.ones(n, dtype=bool)
+        self._node_attrs = _AttributeColumns.from_lists(arrays.node_columns, n)
+        self._degree = np.zeros(n, dtype=np.int64)
+
+        m = len(arrays.edge_src)
+        self._num_edges = m
+        self._edge_src = np.asarray(arrays.edge_src, dtype=np.int32).copy()
+        self._edge_tgt = np.asarray(arrays.edge_tgt, dtype=np.int32).copy()
+        self._edge_alive = np.ones(m, dtype=bool)
+        self._edge_attrs = _AttributeColumns.from_lists(arrays.edge_columns, m)
+
+    @staticmethod
+    def _arrays_from_networkx(graph: nx.Graph) -> GraphArrays:
+        nodes = list(graph.nodes(data=True))
+        pos = {node: i for i, (node, _) in enumerate(nodes)}
+        edges = list(graph.edges(data=True))
+        node_keys = {k for _, data in nodes for k in data}
+        edge_keys = {k for _, _, data in edges for k in data}
+        return GraphArrays(
+            node_names=[str(n) for n, _ in nodes],
+            node_columns={k: [data.get(k) for _, data in nodes] for k in node_keys},
+            edge_src=np.array([pos[u] for u, _, _ in edges], dtype=np.int32),
+            edge_tgt=np.array([pos[v] for _, v, _ in edges], dtype=np.int32),
+            edge_columns={k: [data.get(k) for _, _, data in edges] for k in edge_keys},
+        )
+
+    # ------------------------------------------------------------ CSR upkeep
+
+    def _rebuild_csr(self):
+        n = len(self._names)
+        alive = np.flatnonzero(self._edge_alive[: self._num_edges]).astype(np.int32)
+        src = self._edge_src[alive]
+        tgt = self._edge_tgt[alive]
+        rows = np.concatenate([src, tgt])
+        cols = np.concatenate([tgt, src])
+        eids = np.concatenate([alive, alive])
+        order = np.lexsort((cols, rows))
+        counts = np.bincount(rows, minlength=n) if n else np.zeros(0, dtype=np.int64)
+        self._indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._indptr[1:])
+        self._nbr = cols[order].astype(np.int32)
+        self._eid = eids[order].astype(np.int32)
+        self._degree = _grow(self._degree, n)
+        self._degree[:n] = counts
+        self._delta = {}
+        self._delta_edges = 0
+
+    def _maybe_rebuild(self):
+        if self._delta_edges > self._compact_ratio * max(len(self._nbr) // 2, 1024):
+            self._rebuild_csr()
+
+    def _base_row(self, idx: int) -> tuple[np.ndarray, np.ndarray]:
+        if idx + 1 >= len(self._indptr):
+            return self._nbr[:0], self._eid[:0]
+        lo, hi = self._indptr[idx], self._indptr[idx + 1]
+        return self._nbr[lo:hi], self._eid[lo:hi]
+
+    def _node_index(self, name: str) -> Union[int, None]:
+        idx = self._ids.get(name)
+        if idx is None or not self._node_alive[idx]:
+            return None
+        return idx
+
+    def _find_edge(self, u: int, v: int) -> Union[int, None]:
+        eid = self._delta.get(u, {}).get(v)
+        if eid is not None and self._edge_alive[eid]:
+            return eid
+        nbr, eids = self._base_row(u)
+        pos = int(np.searchsorted(nbr, v))
+        while pos < len(nbr) and nbr[pos] == v:
+            eid = int(eids[pos])
+            if self._edge_alive[eid]:
+                return eid
+            pos += 1
+        return None
+
+    def _incident(self, u: int) -> dict[int, int]:
+        """Alive incident edges of ``u`` as {edge id: neighbour}."""
+        nbr, eids = self._base_row(u)
+        mask = self._edge_alive[eids]
+        # keyed by edge id so a self-loop (listed twice in its row) counts once
+        incident = dict(zip(eids[mask].tolist(), nbr[mask].tolist()))
+        for v, eid in self._delta.get(u, {}).items():
+            if self._edge_alive[eid]:
+                incident[eid] = v
+        return incident
+
+    def _ensure_node(self, name: str) -> int:
+        idx = self._ids.get(name)
+        if idx is None:
+            idx = len(self._names)
+            self._names.append(name)
+            self._ids[name] = idx
+            self._node_alive = _grow(self._node_alive, idx + 1)
+            self._degree = _grow(self._degree, idx + 1)
+            self._node_attrs.resize(idx + 1)
+        if not self._node_alive[idx]:
+            self._node_alive[idx] = True
+            self._degree[idx] = 0
+        return idx
+
+    # ------------------------------------------------------ BaseGraphStorage
+
+    async def index_done_callback(self):
+        if not self._dirty:
+            return
+        self._rebuild_csr()
+        nodes = np.flatnonzero(self._node_alive[: len(self._names)])
+        edges = np.flatnonzero(self._edge_alive[: self._num_edges])
+        self._node_attrs.compact_strings(nodes)
+        self._edge_attrs.compact_strings(edges)
+        write_graph_arrays(self._snapshot_file, self._to_arrays(nodes, edges))
+        self._write_subgraph(nodes, edges)
+        self._dirty = False
+
+    def _to_arrays(self, nodes: np.ndarray, edges: np.ndarray) -> GraphArrays:
+        remap = np.full(len(self._names), -1, dtype=np.int64)
+        remap[nodes] = np.arange(len(nodes))
+        return GraphArrays(
+            node_names=[self._names[i] for i in nodes.tolist()],
+            node_columns=self._node_attrs.take(nodes),
+            edge_src=remap[self._edge_src[edges]].astype(np.int32),
+            edge_tgt=remap[self._edge_tgt[edges]].astype(np.int32),
+            edge_columns=self._edge_attrs.take(edges),
+        )
+
+    def _write_subgraph(self, nodes: np.ndarray, edges: np.ndarray, subgraph="PK"):
+        """Export the nodes tagged with ``subgraph`` (and the edges between
+        them) as GraphML, without materialising the rest of the graph."""
+        members = self._node_attrs.matching(
+            "subgraphs",
+            nodes,
+            lambda value: (
+                subgraph in split_string_by_multi_markers(value, [SUBGRAPH_SEP])
+            ),
+        )
+        selected = np.zeros(len(self._names), dtype=bool)
+        selected[members] = True
+        edges = edges[selected[self._edge_src[edges]] & selected[self._edge_tgt[edges]]]
+        graph = nx.Graph()
+        graph.add_nodes_from(
+            (self._names[i], self._node_attrs.get(i)) for i in members.tolist()
+        )
+        graph.add_edges_from(
+            (
+                self._names[self._edge_src[eid]],
+                self._names[self._edge_tgt[eid]],
+                self._edge_attrs.get(eid),
+            )
+            for eid in edges.tolist()
+        )
+        nx.write_graphml(graph, self._graphml_xml_sg_file)
+
+    async def has_node(self, node_id: str) -> bool:
+        return self._node_index(node_id) is not None
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        u, v = self._node_index(source_node_id), self._node_index(target_node_id)
+        if u is None or v is None:
+            return False
+        return self._find_edge(u, v) is not None
+
+    async def get_node(self, node_id: str) -> Union[dict, None]:
+        idx = self._node_index(node_id)
+        if idx is None:
+            return None
+        return self._node_attrs.get(idx)
+
+    async def node_degree(self, node_id: str) -> int:
+        idx = self._node_index(node_id)
+        return 0 if idx is None else int(self._degree[idx])
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> Union[dict, None]:
+        u, v = self._node_index(source_node_id), self._node_index(target_node_id)
+        if u is None or v is None:
+            return None
+        eid = self._find_edge(u, v)
+        if eid is None:
+            return None
+        return self._edge_attrs.get(eid)
+
+    async def get_node_edges(self, source_node_id: str):
+        idx = self._node_index(source_node_id)
+        if idx is None:
+            return None
+        self._maybe_rebuild()
+        return [(source_node_id, self._names[v]) for v in self._incident(idx).values()]
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return [await self.get_node(n) for n in node_ids]
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        idx = [self._node_index(n) for n in node_ids]
+        return [0 if i is None else int(self._degree[i]) for i in idx]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return [await self.get_edge(s, t) for s, t in edge_pairs]
+
+    async def get_nodes_edges(self, node_ids: list[str]):
+        self._maybe_rebuild()
+        return [await self.get_node_edges(n) for n in node_ids]
+
+    async def get_all_nodes(self) -> list[tuple[str, dict]]:
+        nodes = np.flatnonzero(self._node_alive[: len(self._names)]).tolist()
+        return [(self._names[i], self._node_attrs.get(i)) for i in nodes]
+
+    async def get_all_edges(self) -> list[tuple[str, str, dict]]:
+        edges = np.flatnonzero(self._edge_alive[: self._num_edges]).tolist()
+        return [
+            (
+                self._names[self._edge_src[eid]],
+                self._names[self._edge_tgt[eid]],
+                self._edge_attrs.get(eid),
+            )
+            for eid in edges
+        ]
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
+        idx = self._ensure_node(node_id)
+        self._node_attrs.set(idx, node_data)
+        self._dirty = True
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        u = self._ensure_node(source_node_id)
+        v = self._ensure_node(target_node_id)
+        eid = self._find_edge(u, v)
+        if eid is None:
+            eid = self._num_edges
+            self._num_edges += 1
+            self._edge_src = _grow(self._edge_src, self._num_edges)
+            self._edge_tgt = _grow(self._edge_tgt, self._num_edges)
+            self._edge_alive = _grow(self._edge_alive, self._num_edges)
+            self._edge_src[eid], self._edge_tgt[eid] = u, v
+            self._edge_alive[eid] = True
+            self._edge_attrs.resize(self._num_edges)
+            self._delta.setdefault(u, {})[v] = eid
+            self._delta.setdefault(v, {})[u] = eid
+            self._delta_edges += 1
+            self._degree[u] += 1
+            self._degree[v] += 1
+        self._edge_attrs.set(eid, edge_data)
+        self._dirty = True
+
+    def _remove_edge_id(self, eid: int):
+        self._edge_alive[eid] = False
+        self._degree[self._edge_src[eid]] -= 1
+        self._degree[self._edge_tgt[eid]] -= 1
+        self._edge_attrs.clear(eid)
+
+    async def delete_node(self, node_id: str):
+        idx = self._node_index(node_id)
+        if idx is None:
+            logger.warning(f"Node {node_id} not found in the graph for deletion.")
+            return
+        self.remove_nodes([node_id])
+        logger.info(f"Node {node_id} deleted from the graph.")
+
+    def remove_nodes(self, nodes: list[str]):
+        """Delete multiple nodes and their incident edges"""
+        for name in nodes:
+            idx = self._node_index(name)
+            if idx is None:
+                continue
+            for eid in list(self._incident(idx)):
+                self._remove_edge_id(eid)
+            for v in self._delta.pop(idx, {}):
+                self._delta.get(v, {}).pop(idx, None)
+            self._node_alive[idx] = False
+            self._degree[idx] = 0
+            self._node_attrs.clear(idx)
+            self._dirty = True
+
+    def remove_edges(self, edges: list[tuple[str, str]]):
+        """Delete multiple edges given as (source, target) tuples"""
+        for source, target in edges:
+            u, v = self._node_index(source), self._node_index(target)
+            if u is None or v is None:
+                continue
+            eid = self._find_edge(u, v)
+            if eid is not None:
+                self._remove_edge_id(eid)
+                self._dirty = True
+
+    def to_networkx(self) -> nx.Graph:
+        """Materialise the graph as ``nx.Graph`` (e.g. for GraphML export)."""
+        graph = nx.Graph()
+        n = len(self._names)
+        for idx in np.flatnonzero(self._node_alive[:n]).tolist():
+            graph.add_node(self._names[idx], **self._node_attrs.get(idx))
+        for eid in np.flatnonzero(self._edge_alive[: self._num_edges]).tolist():
+            graph.add_edge(
+                self._names[self._edge_src[eid]],
+                self._names[self._edge_tgt[eid]],
+                **self._edge_attrs.get(eid),
+            )
+        return graph
@@ -309,6 +309,69 @@ class GremlinStorage(BaseGraphStorage):
 
         return edges
 
+    @staticmethod
+    def _fix_names(node_ids: List[str]) -> str:
+        return ", ".join(GremlinStorage._fix_name(n) for n in dict.fromkeys(node_ids))
+
+    async def get_nodes(self, node_ids: List[str]) -> List[Union[dict, None]]:
+        if not node_ids:
+            return []
+        query = f"""g
+                 .V().has('graph', {self.graph_name})
+                 .has('entity_name', within({GremlinStorage._fix_names(node_ids)}))
+                 .dedup().by('entity_name')
+                 .project('entity_name', 'properties')
+                    .by('entity_name')
+                    .by(elementMap())
+                 """
+        result = await self._query(query)
+        by_name = {res["entity_name"]: res["properties"] for res in result}
+        return [by_name.get(node_id.strip('"')) for node_id in node_ids]
+
+    async def node_degrees(self, node_ids: List[str]) -> List[int]:
+        if not node_ids:
+            return []
+        query = f"""g
+                 .V().has('graph', {self.graph_name})
+                 .has('entity_name', within({GremlinStorage._fix_names(node_ids)}))
+                 .project('entity_name', 'total_edge_count')
+                    .by('entity_name')
+                    .by(__.outE().inV().has('graph', {self.graph_name}).count())
+                 """
+        result = await self._query(query)
+        by_name = {}
+        for res in result:
+            by_name[res["entity_name"]] = (
+                by_name.get(res["entity_name"], 0) + res["total_edge_count"]
+            )
+        return [by_name.get(node_id.strip('"'), 0) for node_id in node_ids]
+
+    async def get_nodes_edges(self, node_ids: List[str]) -> List[List[Tuple[str, str]]]:
+        if not node_ids:
+            return []
+        names = GremlinStorage._fix_names(node_ids)
+        query = f"""g
+                 .E()
+                 .filter(
+                     __.or(
+                         __.outV().has('graph', {self.graph_name})
+                           .has('entity_name', within({names})),
+                         __.inV().has('graph', {self.graph_name})
+                           .has('entity_name', within({names}))
+                     )
+                 )
+                 .project('source_name', 'target_name')
+                 .by(__.outV().values('entity_name'))
+                 .by(__.inV().values('entity_name'))
+                 """
+        result = await self._query(query)
+        by_name = {}
+        for res in result:
+            edge = (res["source_name"], res["target_name"])
+            for name in dict.fromkeys(edge):
+                by_name.setdefault(name, []).append(edge)
+        return [list(by_name.get(node_id.strip('"'), [])) for node_id in node_ids]
+
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -75,16 +75,23 @@ class MilvusVectorDBStorge(BaseVectorStorage):
         return results
 
     async def query(self, query, top_k=5):
-        embedding = await self.embedding_func([query])
-        results = self._client.search(
+        return (await self.query_batch([query], top_k))[0]
+
+    async def query_batch(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        embeddings = await self.embedding_func(queries)
+        # one multi-vector search; Milvus returns a hit list per query vector
+        batch_results = self._client.search(
             collection_name=self.namespace,
-            data=embedding,
+            data=embeddings,
             limit=top_k,
             output_fields=list(self.meta_fields),
             search_params={"metric_type": "COSINE", "params": {"radius": 0.2}},
         )
-        print(results)
+        logger.debug(f"query result: {batch_results}")
         return [
-            {**dp["entity"], "id": dp["id"], "distance": dp["distance"]}
-            for dp in results[0]
+            [
+                {**dp["entity"], "id": dp["id"], "distance": dp["distance"]}
+                for dp in results
+            ]
+            for results in batch_results
         ]
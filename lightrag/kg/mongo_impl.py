@@ -46,6 +46,9 @@ class MongoKVStorage(BaseKVStorage):
             data[k]["_id"] = k
         return data
 
+    async def delete(self, ids: list[str]):
+        self._data.delete_many({"_id": {"$in": ids}})
+
     async def drop(self):
         """ """
         pass
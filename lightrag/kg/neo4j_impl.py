@@ -21,6 +21,20 @@ from tenacity import (
 from lightrag.utils import logger
 from ..base import BaseGraphStorage
 
+# Max per-item branches combined into one UNION ALL query by the batch methods
+BATCH_QUERY_SIZE = 200
+# Max rows per UNWIND statement / write transaction
+BATCH_WRITE_SIZE = 500
+
+# Node models:
+#   "label":  one label per entity, named after the entity (legacy layout)
+#   "entity": a single :Entity label with a uniquely constrained entity_id
+ENTITY_LABEL = "Entity"
+ENTITY_CONSTRAINT_QUERY = (
+    "CREATE CONSTRAINT entity_id_unique IF NOT EXISTS "
+    f"FOR (n:{ENTITY_LABEL}) REQUIRE n.entity_id IS UNIQUE"
+)
+
 
 @dataclass
 class Neo4JStorage(BaseGraphStorage):
@@ -43,6 +57,13 @@ class Neo4JStorage(BaseGraphStorage):
             "NEO4J_DATABASE"
         )  # If this param is None, the home database will be used. If it is not None, the specified database will be used.
         self._DATABASE = DATABASE
+        config = global_config.get("graph_storage_cls_kwargs", {})
+        node_model = config.get(
+            "node_model", os.environ.get("NEO4J_NODE_MODEL", "label")
+        )
+        if node_model not in ("label", "entity"):
+            raise ValueError(f"Unknown Neo4j node model: {node_model}")
+        self._entity_model = node_model == "entity"
         self._driver: AsyncDriver = AsyncGraphDatabase.driver(
             URI, auth=(USERNAME, PASSWORD)
         )
@@ -80,6 +101,10 @@ class Neo4JStorage(BaseGraphStorage):
                         )
                     logger.error(f"Failed to create {DATABASE} at {URI}")
                     raise e
+            if self._entity_model:
+                with _sync_driver.session(database=DATABASE) as session:
+                    session.run(ENTITY_CONSTRAINT_QUERY)
+                    logger.info("Ensured unique entity_id constraint on :Entity")
 
     def __post_init__(self):
         self._node_embed_algorithms = {
@@ -98,14 +123,31 @@ class Neo4JStorage(BaseGraphStorage):
     async def index_done_callback(self):
         print("KG successfully indexed.")
 
-    async def has_node(self, node_id: str) -> bool:
-        entity_name_label = node_id.strip('"')
+    @staticmethod
+    def _label(node_id: str) -> str:
+        return node_id.strip('"').replace("`", "``")
+
+    def _node_match(self, var: str, node_id: str, params: dict) -> str:
+        """Pattern matching one entity node, adding any needed query params."""
+        if self._entity_model:
+            params[f"{var}_id"] = node_id.strip('"')
+            return f"({var}:{ENTITY_LABEL} {{entity_id: ${var}_id}})"
+        return f"({var}:`{self._label(node_id)}`)"
+
+    def _node_name(self, var: str) -> str:
+        """Expression giving the entity name of a matched node."""
+        if self._entity_model:
+            return f"{var}.entity_id"
+        return f"labels({var})[0]"
 
+    async def has_node(self, node_id: str) -> bool:
+        params = {}
         async with self._driver.session(database=self._DATABASE) as session:
             query = (
-                f"MATCH (n:`{entity_name_label}`) RETURN count(n) > 0 AS node_exists"
+                f"MATCH {self._node_match('n', node_id, params)} "
+                "RETURN count(n) > 0 AS node_exists"
             )
-            result = await session.run(query)
+            result = await session.run(query, params)
             single_result = await result.single()
             logger.debug(
                 f'{inspect.currentframe().f_code.co_name}:query:{query}:result:{single_result["node_exists"]}'
@@ -113,15 +155,14 @@ class Neo4JStorage(BaseGraphStorage):
             return single_result["node_exists"]
 
     async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
-        entity_name_label_source = source_node_id.strip('"')
-        entity_name_label_target = target_node_id.strip('"')
-
+        params = {}
         async with self._driver.session(database=self._DATABASE) as session:
             query = (
-                f"MATCH (a:`{entity_name_label_source}`)-[r]-(b:`{entity_name_label_target}`) "
+                f"MATCH {self._node_match('a', source_node_id, params)}-[r]-"
+                f"{self._node_match('b', target_node_id, params)} "
                 "RETURN COUNT(r) > 0 AS edgeExists"
             )
-            result = await session.run(query)
+            result = await session.run(query, params)
             single_result = await result.single()
             logger.debug(
                 f'{inspect.currentframe().f_code.co_name}:query:{query}:result:{single_result["edgeExists"]}'
@@ -129,10 +170,10 @@ class Neo4JStorage(BaseGraphStorage):
             return single_result["edgeExists"]
 
     async def get_node(self, node_id: str) -> Union[dict, None]:
+        params = {}
         async with self._driver.session(database=self._DATABASE) as session:
-            entity_name_label = node_id.strip('"')
-            query = f"MATCH (n:`{entity_name_label}`) RETURN n"
-            result = await session.run(query)
+            query = f"MATCH {self._node_match('n', node_id, params)} RETURN n"
+            result = await session.run(query, params)
             record = await result.single()
             if record:
                 node = record["n"]
@@ -144,14 +185,13 @@ class Neo4JStorage(BaseGraphStorage):
             return None
 
     async def node_degree(self, node_id: str) -> int:
-        entity_name_label = node_id.strip('"')
-
+        params = {}
         async with self._driver.session(database=self._DATABASE) as session:
             query = f"""
-                MATCH (n:`{entity_name_label}`)
+                MATCH {self._node_match('n', node_id, params)}
                 RETURN COUNT{{ (n)--() }} AS totalEdgeCount
             """
-            result = await session.run(query)
+            result = await session.run(query, params)
             record = await result.single()
             if record:
                 edge_count = record["totalEdgeCount"]
@@ -163,10 +203,8 @@ class Neo4JStorage(BaseGraphStorage):
                 return None
 
     async def edge_degree(self, src_id: str, tgt_id: str) -> int:
-        entity_name_label_source = src_id.strip('"')
-        entity_name_label_target = tgt_id.strip('"')
-        src_degree = await self.node_degree(entity_name_label_source)
-        trg_degree = await self.node_degree(entity_name_label_target)
+        src_degree = await self.node_degree(src_id)
+        trg_degree = await self.node_degree(tgt_id)
 
         # Convert None to 0 for addition
         src_degree = 0 if src_degree is None else src_degree
@@ -181,29 +219,25 @@ class Neo4JStorage(BaseGraphStorage):
     async def get_edge(
         self, source_node_id: str, target_node_id: str
     ) -> Union[dict, None]:
-        entity_name_label_source = source_node_id.strip('"')
-        entity_name_label_target = target_node_id.strip('"')
         """
-        Find all edges between nodes of two given labels
+        Find the edge between two given entities
 
         Args:
-            source_node_label (str): Label of the source nodes
-            target_node_label (str): Label of the target nodes
+            source_node_id (str): Name of the source entity
+            target_node_id (str): Name of the target entity
 
         Returns:
-            list: List of all relationships/edges found
+            dict: Properties of the first matching edge, or None
         """
+        params = {}
         async with self._driver.session(database=self._DATABASE) as session:
             query = f"""
-            MATCH (start:`{entity_name_label_source}`)-[r]->(end:`{entity_name_label_target}`)
+            MATCH {self._node_match('start', source_node_id, params)}-[r]->{self._node_match('end', target_node_id, params)}
             RETURN properties(r) as edge_properties
             LIMIT 1
-            """.format(
-                entity_name_label_source=entity_name_label_source,
-                entity_name_label_target=entity_name_label_target,
-            )
+            """
 
-            result = await session.run(query)
+            result = await session.run(query, params)
             record = await result.single()
             if record:
                 result = dict(record["edge_properties"])
@@ -215,36 +249,190 @@ class Neo4JStorage(BaseGraphStorage):
                 return None
 
     async def get_node_edges(self, source_node_id: str) -> List[Tuple[str, str]]:
-        node_label = source_node_id.strip('"')
-
         """
-        Retrieves all edges (relationships) for a particular node identified by its label.
-        :return: List of dictionaries containing edge information
+        Retrieves all edges (relationships) for a particular entity.
+        :return: List of (source, target) entity name tuples
         """
-        query = f"""MATCH (n:`{node_label}`)
+        params = {}
+        query = f"""MATCH {self._node_match('n', source_node_id, params)}
                 OPTIONAL MATCH (n)-[r]-(connected)
-                RETURN n, r, connected"""
+                RETURN {self._node_name('n')} AS source_label,
+                       {self._node_name('connected')} AS target_label"""
         async with self._driver.session(database=self._DATABASE) as session:
-            results = await session.run(query)
+            results = await session.run(query, params)
             edges = []
             async for record in results:
-                source_node = record["n"]
-                connected_node = record["connected"]
-
-                source_label = (
-                    list(source_node.labels)[0] if source_node.labels else None
-                )
-                target_label = (
-                    list(connected_node.labels)[0]
-                    if connected_node and connected_node.labels
-                    else None
-                )
-
+                source_label = record["source_label"]
+                target_label = record["target_label"]
                 if source_label and target_label:
                     edges.append((source_label, target_label))
 
             return edges
 
+    async def _run_union(self, branches: list[str]) -> list:
+        """Run per-item query branches as UNION ALL queries, in chunks."""
+        records = []
+        async with self._driver.session(database=self._DATABASE) as session:
+            for i in range(0, len(branches), BATCH_QUERY_SIZE):
+                query = "\nUNION ALL\n".join(branches[i : i + BATCH_QUERY_SIZE])
+                result = await session.run(query)
+                records.extend([record async for record in result])
+        return records
+
+    async def _run_unwind(self, query: str, rows: list[dict]) -> list:
+        """Run ``UNWIND $rows AS row <query>`` over ``rows``, in chunks."""
+        records = []
+        async with self._driver.session(database=self._DATABASE) as session:
+            for i in range(0, len(rows), BATCH_WRITE_SIZE):
+                result = await session.run(
+                    f"UNWIND $rows AS row {query}", rows=rows[i : i + BATCH_WRITE_SIZE]
+                )
+                records.extend([record async for record in result])
+        return records
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        if not node_ids:
+            return []
+        if self._entity_model:
+            records = await self._run_unwind(
+                f"MATCH (n:{ENTITY_LABEL} {{entity_id: row.id}}) RETURN row.idx AS idx, n",
+                [{"idx": i, "id": n.strip('"')} for i, n in enumerate(node_ids)],
+            )
+        else:
+            records = await self._run_union(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) RETURN {i} AS idx, n LIMIT 1"
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+        nodes = [None] * len(node_ids)
+        for record in records:
+            nodes[record["idx"]] = dict(record["n"])
+        return nodes
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        if not node_ids:
+            return []
+        if self._entity_model:
+            records = await self._run_unwind(
+                f"MATCH (n:{ENTITY_LABEL} {{entity_id: row.id}}) "
+                "RETURN row.idx AS idx, COUNT { (n)--() } AS degree",
+                [{"idx": i, "id": n.strip('"')} for i, n in enumerate(node_ids)],
+            )
+        else:
+            records = await self._run_union(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) RETURN {i} AS idx, COUNT {{ (n)--() }} AS degree LIMIT 1"
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+        degrees = [0] * len(node_ids)
+        for record in records:
+            degrees[record["idx"]] = record["degree"]
+        return degrees
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        if not edge_pairs:
+            return []
+        if self._entity_model:
+            records = await self._run_unwind(
+                f"MATCH (start:{ENTITY_LABEL} {{entity_id: row.src}})"
+                f"-[r]->(end:{ENTITY_LABEL} {{entity_id: row.tgt}}) "
+                "WITH row.idx AS idx, collect(properties(r))[0] AS edge_properties "
+                "RETURN idx, edge_properties",
+                [
+                    {"idx": i, "src": src.strip('"'), "tgt": tgt.strip('"')}
+                    for i, (src, tgt) in enumerate(edge_pairs)
+                ],
+            )
+        else:
+            records = await self._run_union(
+                [
+                    f"MATCH (start:`{self._label(src)}`)-[r]->(end:`{self._label(tgt)}`) "
+                    f"RETURN {i} AS idx, properties(r) AS edge_properties LIMIT 1"
+                    for i, (src, tgt) in enumerate(edge_pairs)
+                ]
+            )
+        edges = [None] * len(edge_pairs)
+        for record in records:
+            edges[record["idx"]] = dict(record["edge_properties"])
+        return edges
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[List[Tuple[str, str]]]:
+        if not node_ids:
+            return []
+        if self._entity_model:
+            records = await self._run_unwind(
+                f"MATCH (n:{ENTITY_LABEL} {{entity_id: row.id}}) "
+                "OPTIONAL MATCH (n)-[r]-(connected) "
+                "RETURN row.idx AS idx, n.entity_id AS source_label, connected.entity_id AS target_label",
+                [{"idx": i, "id": n.strip('"')} for i, n in enumerate(node_ids)],
+            )
+        else:
+            records = await self._run_union(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) OPTIONAL MATCH (n)-[r]-(connected) "
+                    f"RETURN {i} AS idx, labels(n)[0] AS source_label, labels(connected)[0] AS target_label"
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+        edges = [[] for _ in node_ids]
+        for record in records:
+            if record["source_label"] and record["target_label"]:
+                edges[record["idx"]].append(
+                    (record["source_label"], record["target_label"])
+                )
+        return edges
+
+    async def get_neighbourhood(self, node_ids: list[str]) -> dict:
+        """One-hop expansion in a single query: edges, edge properties,
+        neighbour properties and endpoint degrees for all seeds at once."""
+        returns = (
+            "{source} AS source, {target} AS target, "
+            "properties(r) AS edge_properties, properties(m) AS neighbour, "
+            "COUNT {{ (n)--() }} AS source_degree, "
+            "CASE WHEN m IS NULL THEN 0 ELSE COUNT {{ (m)--() }} END AS target_degree"
+        )
+        if self._entity_model:
+            records = await self._run_unwind(
+                f"MATCH (n:{ENTITY_LABEL} {{entity_id: row.id}}) "
+                "OPTIONAL MATCH (n)-[r]-(m) "
+                "RETURN row.idx AS idx, "
+                + returns.format(source="n.entity_id", target="m.entity_id"),
+                [{"idx": i, "id": n.strip('"')} for i, n in enumerate(node_ids)],
+            )
+        else:
+            records = await self._run_union(
+                [
+                    f"MATCH (n:`{self._label(node_id)}`) OPTIONAL MATCH (n)-[r]-(m) "
+                    f"RETURN {i} AS idx, "
+                    + returns.format(source="labels(n)[0]", target="labels(m)[0]")
+                    for i, node_id in enumerate(node_ids)
+                ]
+            )
+
+        edges = [[] for _ in node_ids]
+        nodes, edge_data, edge_degree = {}, {}, {}
+        for record in records:
+            source, target = record["source"], record["target"]
+            if not (source and target):
+                continue
+            edges[record["idx"]].append((source, target))
+            nodes.setdefault(target, dict(record["neighbour"]))
+            pair = tuple(sorted((source, target)))
+            edge_data.setdefault(pair, dict(record["edge_properties"]))
+            edge_degree[pair] = record["source_degree"] + record["target_degree"]
+        return {
+            "edges": edges,
+            "nodes": nodes,
+            "edge_data": edge_data,
+            "edge_degree": edge_degree,
+        }
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -262,20 +450,20 @@ class Neo4JStorage(BaseGraphStorage):
         Upsert a node in the Neo4j database.
 
         Args:
-            node_id: The unique identifier for the node (used as label)
+            node_id: The unique identifier for the node (label or entity_id)
             node_data: Dictionary of node properties
         """
-        label = node_id.strip('"')
         properties = node_data
 
         async def _do_upsert(tx: AsyncManagedTransaction):
+            params = {"properties": properties}
             query = f"""
-            MERGE (n:`{label}`)
+            MERGE {self._node_match('n', node_id, params)}
             SET n += $properties
             """
-            await tx.run(query, properties=properties)
+            await tx.run(query, params)
             logger.debug(
-                f"Upserted node with label '{label}' and properties: {properties}"
+                f"Upserted node '{node_id}' with properties: {properties}"
             )
 
         try:
@@ -300,29 +488,28 @@ class Neo4JStorage(BaseGraphStorage):
         self, source_node_id: str, target_node_id: str, edge_data: Dict[str, Any]
     ):
         """
-        Upsert an edge and its properties between two nodes identified by their labels.
+        Upsert an edge and its properties between two entities.
 
         Args:
-            source_node_id (str): Label of the source node (used as identifier)
-            target_node_id (str): Label of the target node (used as identifier)
+            source_node_id (str): Name of the source entity
+            target_node_id (str): Name of the target entity
             edge_data (dict): Dictionary of properties to set on the edge
         """
-        source_node_label = source_node_id.strip('"')
-        target_node_label = target_node_id.strip('"')
         edge_properties = edge_data
 
         async def _do_upsert_edge(tx: AsyncManagedTransaction):
+            params = {"properties": edge_properties}
             query = f"""
-            MATCH (source:`{source_node_label}`)
+            MATCH {self._node_match('source', source_node_id, params)}
             WITH source
-            MATCH (target:`{target_node_label}`)
+            MATCH {self._node_match('target', target_node_id, params)}
             MERGE (source)-[r:DIRECTED]->(target)
             SET r += $properties
             RETURN r
             """
-            await tx.run(query, properties=edge_properties)
+            await tx.run(query, params)
             logger.debug(
-                f"Upserted edge from '{source_node_label}' to '{target_node_label}' with properties: {edge_properties}"
+                f"Upserted edge from '{source_node_id}' to '{target_node_id}' with properties: {edge_properties}"
             )
 
         try:
@@ -332,5 +519,139 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during edge upsert: {str(e)}")
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+            )
+        ),
+    )
+    async def upsert_nodes(self, nodes: list[tuple[str, Dict[str, Any]]]):
+        """Upsert many nodes, one write transaction per BATCH_WRITE_SIZE rows.
+
+        The entity model uses a single ``UNWIND ... MERGE`` per transaction;
+        the label model cannot parameterise labels, so it runs one MERGE per
+        node but still shares the transaction.
+        """
+        for i in range(0, len(nodes), BATCH_WRITE_SIZE):
+            batch = nodes[i : i + BATCH_WRITE_SIZE]
+
+            async def _do_upsert(tx: AsyncManagedTransaction):
+                if self._entity_model:
+                    await tx.run(
+                        f"""
+                        UNWIND $rows AS row
+                        MERGE (n:{ENTITY_LABEL} {{entity_id: row.entity_id}})
+                        SET n += row.properties
+                        """,
+                        rows=[
+                            {"entity_id": node_id.strip('"'), "properties": data}
+                            for node_id, data in batch
+                        ],
+                    )
+                    return
+                for node_id, data in batch:
+                    await tx.run(
+                        f"MERGE (n:`{self._label(node_id)}`) SET n += $properties",
+                        properties=data,
+                    )
+
+            async with self._driver.session(database=self._DATABASE) as session:
+                await session.execute_write(_do_upsert)
+            logger.debug(f"Upserted {len(batch)} nodes")
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+            )
+        ),
+    )
+    async def upsert_edges(self, edges: list[tuple[str, str, Dict[str, Any]]]):
+        """Upsert many edges, one write transaction per BATCH_WRITE_SIZE rows."""
+        for i in range(0, len(edges), BATCH_WRITE_SIZE):
+            batch = edges[i : i + BATCH_WRITE_SIZE]
+
+            async def _do_upsert_edges(tx: AsyncManagedTransaction):
+                if self._entity_model:
+                    await tx.run(
+                        f"""
+                        UNWIND $rows AS row
+                        MATCH (source:{ENTITY_LABEL} {{entity_id: row.src}})
+                        MATCH (target:{ENTITY_LABEL} {{entity_id: row.tgt}})
+                        MERGE (source)-[r:DIRECTED]->(target)
+                        SET r += row.properties
+                        """,
+                        rows=[
+                            {
+                                "src": src.strip('"'),
+                                "tgt": tgt.strip('"'),
+                                "properties": data,
+                            }
+                            for src, tgt, data in batch
+                        ],
+                    )
+                    return
+                for src, tgt, data in batch:
+                    await tx.run(
+                        f"MATCH (source:`{self._label(src)}`) "
+                        f"MATCH (target:`{self._label(tgt)}`) "
+                        "MERGE (source)-[r:DIRECTED]->(target) SET r += $properties",
+                        properties=data,
+                    )
+
+            async with self._driver.session(database=self._DATABASE) as session:
+                await session.execute_write(_do_upsert_edges)
+            logger.debug(f"Upserted {len(batch)} edges")
+
+    async def migrate_to_entity_model(self, batch_size: int = 1000) -> int:
+        """Convert label-per-entity nodes to the indexed ``:Entity`` model.
+
+        Nodes are relabelled in place, so relationships are preserved. Safe
+        to re-run: only nodes without the ``Entity`` label are touched.
+        Returns the number of migrated nodes.
+        """
+        migrated = 0
+        async with self._driver.session(database=self._DATABASE) as session:
+            await session.run(ENTITY_CONSTRAINT_QUERY)
+            while True:
+                result = await session.run(
+                    f"""
+                    MATCH (n) WHERE NOT n:{ENTITY_LABEL} AND size(labels(n)) > 0
+                    RETURN elementId(n) AS node_eid, labels(n)[0] AS label
+                    LIMIT $limit
+                    """,
+                    limit=batch_size,
+                )
+                rows = [(r["node_eid"], r["label"]) async for r in result]
+                if not rows:
+                    break
+
+                async def _do_migrate(tx: AsyncManagedTransaction):
+                    for node_eid, label in rows:
+                        escaped = label.replace("`", "``")
+                        await tx.run(
+                            f"""
+                            MATCH (n) WHERE elementId(n) = $node_eid
+                            SET n:{ENTITY_LABEL}, n.entity_id = $label
+                            REMOVE n:`{escaped}`
+                            """,
+                            node_eid=node_eid,
+                            label=label,
+                        )
+
+                await session.execute_write(_do_migrate)
+                migrated += len(rows)
+                logger.info(f"Migrated {migrated} nodes to the entity model")
+        return migrated
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
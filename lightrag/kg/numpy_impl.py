@@ -0,0 +1,865 @@
+import asyncio
+import glob
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import numpy as np
+from tqdm.asyncio import tqdm as tqdm_async
+
+from lightrag.base import BaseVectorStorage
+from lightrag.ivf_index import IVFFlatIndex
+from lightrag.quantization import (
+    ProductQuantizer,
+    ScalarQuantizer,
+    quantization_config,
+)
+from lightrag.utils import compute_mdhash_id, logger
+
+# rows scored (or copied) per block when the matrix is not plain float32
+SCORE_BLOCK_ROWS = 65536
+# the row logs are folded into the base files once they hold more rows than
+# the base (or than this, for small stores)
+ROW_LOG_MIN_ROWS = 4096
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+@dataclass
+class NumpyVectorDBStorage(BaseVectorStorage):
+    """Local vector store on one contiguous, unit-normalised matrix.
+
+    Row ``i`` of the matrix belongs to ``_ids[i]``; metadata fields are kept
+    as one list per field. Cosine search is a single matrix-vector product and
+    an ``argpartition`` top-k. Deletes tombstone rows, and once tombstones
+    pass ``compact_ratio`` of the rows the matrix is compacted in a worker
+    thread.
+
+    Persists to ``vdb_<namespace>.npy`` (the matrix, memory-mapped
+    copy-on-write at startup) plus a ``vdb_<namespace>.meta.json`` sidecar
+    with ids, tombstones and metadata columns. ``index_done_callback``
+    appends only the rows changed since the last flush: their vectors (and
+    per-row quantisation data) to the binary ``vdb_<namespace>.rows`` log and
+    their ids and metadata as one JSON line to ``vdb_<namespace>.meta.log``,
+    which commits the flush. The base files are rewritten atomically, and the
+    logs cleared, once the logs outgrow the base, after a compaction, or
+    after codebook training rewrote every row.
+
+    Options (``vector_db_storage_cls_kwargs``): ``quantization`` (see
+    ``lightrag.quantization``; "float32", "float16", "int8" or "pq", per
+    namespace), ``compact_ratio`` (default 0.25) and
+    ``cosine_better_than_threshold``. int8 keeps one scale per row in
+    ``vdb_<namespace>.quant.npz``. pq keeps only the codes in memory once
+    ``min_rows`` (default 10000) vectors are stored: the exact vectors stay
+    in the on-disk matrix (``exact_dtype``, default float16) and only the
+    best ``rerank * top_k`` PQ candidates are read back and re-scored.
+    ``search_dim`` (float32/float16 only) does the same with a renormalised
+    prefix of each vector, for Matryoshka embeddings whose leading
+    dimensions are usable on their own; the prefix width is recorded in the
+    sidecar and the prefixes are rebuilt from the full vectors if it changes.
+    ``index="ivf"`` adds an approximate
+    IVF-flat index once the store holds ``ivf_min_rows`` vectors (default
+    50000), tuned with ``nlist``, ``nprobe`` and ``retrain_growth``; it is
+    (re)trained on ``index_done_callback`` and saved as
+    ``vdb_<namespace>.ivf.npz``.
+    """
+
+    cosine_better_than_threshold: float = 0.2
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._matrix_file = os.path.join(working_dir, f"vdb_{self.namespace}.npy")
+        self._meta_file = os.path.join(working_dir, f"vdb_{self.namespace}.meta.json")
+        config = self.global_config.get("vector_db_storage_cls_kwargs", {})
+        quantization = quantization_config(config, self.namespace)
+        self._quantization = quantization["type"]
+        if self._quantization == "binary":
+            raise ValueError("binary quantization is only supported by Qdrant")
+        self._dtype = np.dtype(
+            {
+                "int8": "int8",
+                "pq": quantization.get("exact_dtype", "float16"),
+            }.get(self._quantization, self._quantization)
+        )
+        self._compact_ratio = config.get("compact_ratio", 0.25)
+        self.cosine_better_than_threshold = config.get(
+            "cosine_better_than_threshold",
+            self.global_config.get(
+                "cosine_better_than_threshold", self.cosine_better_than_threshold
+            ),
+        )
+        self._max_batch_size = self.global_config["embedding_batch_num"]
+        self._dim = self.embedding_func.embedding_dim
+
+        self._ivf_file = os.path.join(working_dir, f"vdb_{self.namespace}.ivf.npz")
+        self._ivf_options = {
+            key: config[key]
+            for key in ("nlist", "nprobe", "retrain_growth")
+            if key in config
+        }
+        self._ivf_min_rows = config.get("ivf_min_rows", 50000)
+        self._ivf = (
+            IVFFlatIndex(**self._ivf_options) if config.get("index") == "ivf" else None
+        )
+
+        self._quant_file = os.path.join(working_dir, f"vdb_{self.namespace}.quant.npz")
+        # per-row arrays kept alongside the matrix: int8 scales, PQ codes,
+        # search_dim prefixes
+        self._aux: dict[str, np.ndarray] = {}
+        self._pq = None
+        self._search_dim = quantization.get("search_dim")
+        if self._search_dim:
+            if self._quantization not in ("float32", "float16"):
+                raise ValueError("search_dim needs float32 or float16 quantization")
+            if not 0 < self._search_dim < self._dim:
+                raise ValueError(
+                    f"search_dim {self._search_dim} must be below dimension {self._dim}"
+                )
+            self._rerank_factor = quantization.get("rerank", 32)
+            self._aux["prefix"] = np.zeros((0, self._search_dim), dtype=self._dtype)
+        if self._quantization == "int8":
+            self._aux["scales"] = np.zeros(0, dtype=np.float32)
+        elif self._quantization == "pq":
+            self._pq_options = {
+                key: quantization[key]
+                for key in ("m", "train_iterations", "max_train_samples")
+                if key in quantization
+            }
+            self._pq = ProductQuantizer(self._dim, **self._pq_options)
+            self._pq_min_rows = max(quantization.get("min_rows", 10000), 256)
+            self._rerank_factor = quantization.get("rerank", 32)
+            self._aux["codes"] = np.zeros((0, self._pq.m), dtype=np.uint8)
+        # two-stage search reads the exact vectors only for re-ranking, so
+        # they can live on disk
+        self._exact_on_disk = self._pq is not None or bool(self._search_dim)
+        self._spill_ids = itertools.count()
+
+        self._matrix = np.zeros((0, self._dim), dtype=self._dtype)
+        self._size = 0
+        self._ids: list[Union[str, None]] = []
+        self._rows: dict[str, int] = {}
+        self._columns: dict[str, list] = {"__created_at__": []}
+        self._tombstones = 0
+        # bumped on every mutation so a background compaction can tell
+        # whether its snapshot is still current
+        self._version = 0
+        self._compacting = False
+        self._dirty = False
+
+        self._rows_log_file = os.path.join(working_dir, f"vdb_{self.namespace}.rows")
+        self._meta_log_file = os.path.join(
+            working_dir, f"vdb_{self.namespace}.meta.log"
+        )
+        # rows changed since the last flush
+        self._changed_rows: set[int] = set()
+        # rewrite the base files on the next flush (no base yet, rows renumbered
+        # or rewritten wholesale)
+        self._full_save = True
+        self._ivf_dirty = False
+        # base files written so far; log lines of another generation are stale
+        self._generation = 0
+        self._base_rows = 0
+        self._log_rows = 0
+        self._load()
+
+    # -- persistence -----------------------------------------------------
+
+    def _load(self):
+        if not (os.path.exists(self._matrix_file) and os.path.exists(self._meta_file)):
+            return
+        with open(self._meta_file, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dim"] != self._dim:
+            raise ValueError(
+                f"{self._matrix_file} has dimension {meta['dim']}, "
+                f"embedding_func has {self._dim}"
+            )
+        # matrices spilled to disk by a previous process (pq mode)
+        for spill in glob.glob(f"{self._matrix_file}.*.spill.npy"):
+            os.remove(spill)
+        # copy-on-write mapping: pages are read lazily, writes stay private
+        self._matrix = np.load(self._matrix_file, mmap_mode="c")
+        if (self._matrix.dtype == np.int8) != (self._quantization == "int8"):
+            raise ValueError(
+                f"{self._matrix_file} stores {self._matrix.dtype} vectors, "
+                f"quantization is {self._quantization}"
+            )
+        self._dtype = self._matrix.dtype
+        self._size = len(meta["ids"])
+        self._ids = meta["ids"]
+        self._rows = {id_: i for i, id_ in enumerate(self._ids) if id_ is not None}
+        self._columns = meta["columns"]
+        self._tombstones = self._size - len(self._rows)
+        self._generation = meta.get("generation", 0)
+        self._base_rows = self._size
+        self._full_save = False
+        self._load_quantization(meta.get("search_dim"))
+        replayed = self._replay_logs(meta.get("row_log_fields"))
+        if self._ivf is not None and os.path.exists(self._ivf_file):
+            with np.load(self._ivf_file) as state:
+                self._ivf.load_state(state, self._size)
+            if len(replayed):
+                self._ivf.add(
+                    replayed.tolist(),
+                    np.asarray(self._matrix[replayed], dtype=np.float32),
+                )
+        logger.info(
+            f"Load vector matrix {self.namespace}: {len(self._rows)} vectors, "
+            f"dim {self._dim}, {self._dtype}"
+        )
+
+    def _load_quantization(self, saved_search_dim: Optional[int]):
+        state = {}
+        if self._aux and os.path.exists(self._quant_file):
+            with np.load(self._quant_file) as npz:
+                state = dict(npz)
+        if "scales" in self._aux:
+            if len(state.get("scales", ())) != self._size:
+                raise ValueError(f"{self._quant_file} is missing the int8 scales")
+            self._aux["scales"] = state["scales"]
+        if self._pq is not None:
+            codebooks = state.get("codebooks")
+            codes = state.get("codes")
+            if (
+                codebooks is not None
+                and codebooks.shape[0] == self._pq.m
+                and len(codes) == self._size
+            ):
+                self._pq.load_state(state)
+                self._aux["codes"] = codes
+            else:
+                # retrained on the next index_done_callback
+                self._aux["codes"] = np.zeros((self._size, self._pq.m), dtype=np.uint8)
+        if self._search_dim:
+            prefix = state.get("prefix")
+            if (
+                saved_search_dim == self._search_dim
+                and prefix is not None
+                and len(prefix) == self._size
+            ):
+                self._aux["prefix"] = prefix
+                return
+            logger.warning(
+                f"search_dim of {self.namespace} changed from {saved_search_dim} "
+                f"to {self._search_dim}; rebuilding prefixes from the full vectors"
+            )
+            prefix = np.empty((self._size, self._search_dim), dtype=self._dtype)
+            for i in range(0, self._size, SCORE_BLOCK_ROWS):
+                prefix[i : i + SCORE_BLOCK_ROWS] = self._prefixes(
+                    self._matrix[i : min(i + SCORE_BLOCK_ROWS, self._size)]
+                )
+            self._aux["prefix"] = prefix
+            self._dirty = True
+            self._full_save = True
+
+    def _row_log_fields(self) -> list:
+        """Layout of one ``.rows`` record, as saved in the sidecar."""
+        fields = [["row", "<i8", []], ["vector", self._dtype.str, [self._dim]]]
+        for name in sorted(self._aux):
+            values = self._aux[name]
+            fields.append([name, values.dtype.str, list(values.shape[1:])])
+        return fields
+
+    @staticmethod
+    def _row_log_dtype(fields: list) -> np.dtype:
+        return np.dtype([(name, dtype, tuple(shape)) for name, dtype, shape in fields])
+
+    def _replay_logs(self, fields: Optional[list]) -> np.ndarray:
+        """Apply the flushes logged since the base files were written; return
+        the rows whose vectors were replayed."""
+        entries, good_offset = [], 0
+        if fields is not None and os.path.exists(self._meta_log_file):
+            with open(self._meta_log_file, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line.decode("utf-8"))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # torn final write from a crash; that flush never committed
+                        logger.warning(
+                            f"Dropping truncated log tail in {self._meta_log_file}"
+                        )
+                        break
+                    good_offset += len(line)
+                    if entry["generation"] == self._generation:
+                        entries.append(entry)
+        if not entries:
+            # logs left over from before the last base rewrite
+            self._clear_logs()
+            return np.zeros(0, dtype=np.int64)
+        with open(self._meta_log_file, "r+b") as f:
+            f.truncate(good_offset)
+        rows_end = entries[-1]["rows_end"]
+        record_dtype = NumpyVectorDBStorage._row_log_dtype(fields)
+        records = np.fromfile(
+            self._rows_log_file,
+            dtype=record_dtype,
+            count=rows_end // record_dtype.itemsize,
+        )
+        # drop records of a flush whose meta line was never written
+        with open(self._rows_log_file, "r+b") as f:
+            f.truncate(rows_end)
+
+        size = max([self._size] + [row + 1 for e in entries for row, _, _ in e["rows"]])
+        self._ensure_capacity(size)
+        self._ids.extend([None] * (size - self._size))
+        for column in self._columns.values():
+            column.extend([None] * (size - len(column)))
+        self._size = size
+        for entry in entries:
+            for row, id_, columns in entry["rows"]:
+                self._ids[row] = id_
+                for name, value in columns.items():
+                    self._column(name)[row] = value
+        # the last record of a row wins
+        _, last = np.unique(records["row"][::-1], return_index=True)
+        records = records[len(records) - 1 - last]
+        rows = records["row"]
+        self._matrix[rows] = records["vector"]
+        for name in record_dtype.names[2:]:
+            if name in self._aux:
+                self._aux[name][rows] = records[name]
+        self._rows = {id_: i for i, id_ in enumerate(self._ids) if id_ is not None}
+        self._tombstones = self._size - len(self._rows)
+        self._log_rows = sum(len(entry["rows"]) for entry in entries)
+        logger.info(
+            f"Replayed {len(entries)} logged flushes ({self._log_rows} rows) "
+            f"for {self.namespace}"
+        )
+        return rows
+
+    def _clear_logs(self):
+        for name in (self._meta_log_file, self._rows_log_file):
+            if os.path.exists(name):
+                os.remove(name)
+        self._log_rows = 0
+
+    def _append_logs(self):
+        """Log the rows changed since the last flush (O(changed rows))."""
+        changed = sorted(self._changed_rows)
+        live = [row for row in changed if self._ids[row] is not None]
+        records = np.zeros(
+            len(live),
+            dtype=NumpyVectorDBStorage._row_log_dtype(self._row_log_fields()),
+        )
+        records["row"] = live
+        records["vector"] = self._matrix[live]
+        for name, values in self._aux.items():
+            records[name] = values[live]
+        with open(self._rows_log_file, "ab") as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            rows_end = f.tell()
+        entry = {
+            "generation": self._generation,
+            "rows_end": rows_end,
+            "rows": [
+                [
+                    row,
+                    self._ids[row],
+                    {
+                        name: column[row]
+                        for name, column in self._columns.items()
+                        if column[row] is not None
+                    }
+                    if self._ids[row] is not None
+                    else {},
+                ]
+                for row in changed
+            ],
+        }
+        # the meta line commits the flush
+        with open(self._meta_log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_rows += len(changed)
+
+    def _save_ivf(self):
+        if self._ivf is not None and self._ivf.trained:
+            tmp_ivf = f"{self._ivf_file}.tmp.npz"
+            np.savez(tmp_ivf, **self._ivf.state())
+            os.replace(tmp_ivf, self._ivf_file)
+        self._ivf_dirty = False
+
+    def _save(self):
+        tmp_matrix = f"{self._matrix_file}.tmp.npy"
+        np.save(tmp_matrix, np.ascontiguousarray(self._matrix[: self._size]))
+        tmp_meta = f"{self._meta_file}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dim": self._dim,
+                    "search_dim": self._search_dim,
+                    "generation": self._generation + 1,
+                    "row_log_fields": self._row_log_fields(),
+                    "ids": self._ids[: self._size],
+                    "columns": {k: v[: self._size] for k, v in self._columns.items()},
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_matrix, self._matrix_file)
+        os.replace(tmp_meta, self._meta_file)
+        self._generation += 1
+        self._clear_logs()
+        self._base_rows = self._size
+        self._full_save = False
+        if self._aux:
+            state = {name: values[: self._size] for name, values in self._aux.items()}
+            if self._pq is not None and self._pq.trained:
+                state.update(self._pq.state())
+            tmp_quant = f"{self._quant_file}.tmp.npz"
+            np.savez(tmp_quant, **state)
+            os.replace(tmp_quant, self._quant_file)
+        if self._exact_on_disk:
+            # map the file just written instead of the spilled copy
+            self._set_matrix(np.load(self._matrix_file, mmap_mode="c"))
+        self._save_ivf()
+
+    async def _maybe_train_ivf(self):
+        if self._ivf is None or len(self._rows) < self._ivf_min_rows:
+            return
+        if not self._ivf.needs_training(self._size):
+            return
+        # train a fresh index off the event loop, then swap it in
+        size, matrix = self._size, self._matrix
+        index = IVFFlatIndex(**self._ivf_options)
+        await asyncio.to_thread(index.train, matrix, size)
+        if self._matrix is not matrix:
+            # compacted meanwhile: row numbers changed, retry on the next flush
+            return
+        if self._size > size:
+            index.add(list(range(size, self._size)), self._matrix[size : self._size])
+        self._ivf = index
+        self._ivf_dirty = True
+        self._dirty = True
+        logger.info(
+            f"Trained IVF index for {self.namespace}: {len(index.centroids)} lists "
+            f"over {size} vectors"
+        )
+
+    async def _maybe_train_pq(self):
+        if self._pq is None or self._pq.trained or len(self._rows) < self._pq_min_rows:
+            return
+        version, size, matrix = self._version, self._size, self._matrix
+        pq = ProductQuantizer(self._dim, **self._pq_options)
+
+        def train():
+            pq.train(matrix, size)
+            return pq.encode(matrix[:size])
+
+        codes = await asyncio.to_thread(train)
+        if version != self._version:
+            # mutated meanwhile; retry on the next flush
+            return
+        self._aux["codes"][:size] = codes
+        self._pq = pq
+        self._dirty = True
+        self._full_save = True
+        logger.info(
+            f"Trained PQ codebooks for {self.namespace}: {pq.m} bytes per vector"
+        )
+
+    async def index_done_callback(self):
+        await self._maybe_train_pq()
+        await self._maybe_train_ivf()
+        if not self._dirty:
+            return
+        if self._full_save or self._log_rows + len(self._changed_rows) > max(
+            self._base_rows, ROW_LOG_MIN_ROWS
+        ):
+            self._save()
+        else:
+            if self._changed_rows:
+                self._append_logs()
+            if self._ivf_dirty:
+                self._save_ivf()
+        self._changed_rows = set()
+        self._dirty = False
+
+    # -- writes ----------------------------------------------------------
+
+    def _new_matrix(self, rows: int) -> np.ndarray:
+        if not self._exact_on_disk:
+            return np.zeros((rows, self._dim), dtype=self._dtype)
+        return np.lib.format.open_memmap(
+            f"{self._matrix_file}.{next(self._spill_ids)}.spill.npy",
+            mode="w+",
+            dtype=self._dtype,
+            shape=(rows, self._dim),
+        )
+
+    @staticmethod
+    def _release(matrix: np.ndarray):
+        filename = getattr(matrix, "filename", None)
+        if filename and filename.endswith(".spill.npy"):
+            os.remove(filename)
+
+    def _set_matrix(self, matrix: np.ndarray):
+        previous, self._matrix = self._matrix, matrix
+        self._release(previous)
+
+    def _ensure_capacity(self, rows: int):
+        # a loaded memmap is exactly full, so the first append copies it
+        if rows <= self._matrix.shape[0]:
+            return
+        capacity = max(rows, 2 * self._matrix.shape[0], 1024)
+        grown = self._new_matrix(capacity)
+        grown[: self._size] = self._matrix[: self._size]
+        for name, values in self._aux.items():
+            grown_values = np.zeros((capacity,) + values.shape[1:], dtype=values.dtype)
+            grown_values[: self._size] = values[: self._size]
+            self._aux[name] = grown_values
+        self._set_matrix(grown)
+
+    def _column(self, name: str) -> list:
+        if name not in self._columns:
+            self._columns[name] = [None] * self._size
+        return self._columns[name]
+
+    async def upsert(self, data: dict[str, dict]):
+        logger.info(f"Inserting {len(data)} vectors to {self.namespace}")
+        if not len(data):
+            logger.warning("You insert an empty data to vector DB")
+            return []
+
+        contents = [v["content"] for v in data.values()]
+        batches = [
+            contents[i : i + self._max_batch_size]
+            for i in range(0, len(contents), self._max_batch_size)
+        ]
+
+        async def wrapped_task(batch):
+            result = await self.embedding_func(batch)
+            pbar.update(1)
+            return result
+
+        embedding_tasks = [wrapped_task(batch) for batch in batches]
+        pbar = tqdm_async(
+            total=len(embedding_tasks), desc="Generating embeddings", unit="batch"
+        )
+        embeddings = np.concatenate(await asyncio.gather(*embedding_tasks))
+        if embeddings.shape[1] != self._dim:
+            raise ValueError(
+                f"embedding_func returned {embeddings.shape[1]}-d vectors, "
+                f"{self.namespace} stores {self._dim}-d"
+            )
+        if len(embeddings) != len(data):
+            # sometimes the embedding is not returned correctly. just log it.
+            logger.error(
+                f"embedding is not 1-1 with data, {len(embeddings)} != {len(data)}"
+            )
+            return []
+
+        vectors = _normalise(embeddings)
+        stored = vectors
+        if self._quantization == "int8":
+            stored, scales = ScalarQuantizer.encode(vectors)
+        current_time = time.time()
+        new_ids = [k for k in data if k not in self._rows]
+        self._ensure_capacity(self._size + len(new_ids))
+        written = []
+        for id_, vector in zip(data, stored):
+            row = self._rows.get(id_)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._rows[id_] = row
+                self._ids.append(id_)
+                for column in self._columns.values():
+                    column.append(None)
+            self._matrix[row] = vector
+            written.append(row)
+            self._changed_rows.add(row)
+            self._columns["__created_at__"][row] = current_time
+            for field_name, value in data[id_].items():
+                if field_name in self.meta_fields:
+                    self._column(field_name)[row] = value
+        if self._quantization == "int8":
+            self._aux["scales"][written] = scales
+        if self._pq is not None and self._pq.trained:
+            self._aux["codes"][written] = self._pq.encode(vectors)
+        if self._search_dim:
+            self._aux["prefix"][written] = self._prefixes(vectors)
+        if self._ivf is not None and self._ivf.trained:
+            self._ivf.add(written, vectors)
+        self._version += 1
+        self._dirty = True
+        return list(data)
+
+    async def delete(self, ids: list[str]):
+        """Delete vectors with specified IDs
+
+        Args:
+            ids: List of vector IDs to be deleted
+        """
+        deleted = 0
+        for id_ in ids:
+            row = self._rows.pop(id_, None)
+            if row is None:
+                continue
+            self._ids[row] = None
+            self._changed_rows.add(row)
+            deleted += 1
+        if not deleted:
+            return
+        self._tombstones += deleted
+        self._version += 1
+        self._dirty = True
+        logger.info(f"Successfully deleted {deleted} vectors from {self.namespace}")
+        if self._tombstones > self._compact_ratio * max(self._size, 1):
+            self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        if self._compacting:
+            return
+        self._compacting = True
+        asyncio.get_running_loop().create_task(self._compact())
+
+    async def _compact(self):
+        try:
+            version, size, source = self._version, self._size, self._matrix
+            aux = dict(self._aux)
+            alive = np.fromiter(
+                (id_ is not None for id_ in self._ids[:size]), dtype=bool, count=size
+            )
+            keep = np.flatnonzero(alive)
+
+            def compact():
+                matrix = self._new_matrix(len(keep))
+                for i in range(0, len(keep), SCORE_BLOCK_ROWS):
+                    matrix[i : i + SCORE_BLOCK_ROWS] = source[
+                        keep[i : i + SCORE_BLOCK_ROWS]
+                    ]
+                return matrix, {name: values[keep] for name, values in aux.items()}
+
+            matrix, aux = await asyncio.to_thread(compact)
+            if version != self._version:
+                # mutated meanwhile; the next delete will try again
+                self._release(matrix)
+                return
+            if self._ivf is not None:
+                self._ivf.remap(keep)
+            keep = keep.tolist()
+            self._set_matrix(matrix)
+            self._aux = aux
+            self._ids = [self._ids[i] for i in keep]
+            self._columns = {
+                name: [column[i] for i in keep]
+                for name, column in self._columns.items()
+            }
+            self._size = len(keep)
+            self._rows = {id_: i for i, id_ in enumerate(self._ids)}
+            self._tombstones = 0
+            self._version += 1
+            self._dirty = True
+            # rows were renumbered: the logs cannot describe this
+            self._full_save = True
+            self._changed_rows = set()
+            logger.info(f"Compacted {self.namespace} to {self._size} vectors")
+        finally:
+            self._compacting = False
+
+    # -- reads -----------------------------------------------------------
+
+    def _pq_tables(self, queries: np.ndarray) -> Optional[np.ndarray]:
+        if self._pq is None or not self._pq.trained:
+            return None
+        return self._pq.lookup_tables(queries)
+
+    def _prefixes(self, vectors: np.ndarray) -> np.ndarray:
+        return _normalise(np.asarray(vectors, dtype=np.float32)[:, : self._search_dim])
+
+    def _block_scores(self, index, queries: np.ndarray, tables=None) -> np.ndarray:
+        """Scores (rows x queries) of the rows selected by ``index``; with
+        ``search_dim`` the queries are prefixes too."""
+        if tables is not None:
+            return self._pq.scores(self._aux["codes"][index], tables)
+        if self._search_dim:
+            return np.asarray(self._aux["prefix"][index], dtype=np.float32) @ queries.T
+        if self._quantization == "int8":
+            return ScalarQuantizer.scores(
+                self._matrix[index], self._aux["scales"][index], queries
+            )
+        return np.asarray(self._matrix[index], dtype=np.float32) @ queries.T
+
+    def _scores(self, queries: np.ndarray, tables=None) -> np.ndarray:
+        """Cosine scores (rows x queries) of every row against ``queries``."""
+        rows = self._aux["prefix"] if self._search_dim else self._matrix
+        if tables is None and rows.dtype == np.float32:
+            return rows[: self._size] @ queries.T
+        # other storage types are upcast one block at a time
+        scores = np.empty((self._size, len(queries)), dtype=np.float32)
+        for i in range(0, self._size, SCORE_BLOCK_ROWS):
+            block = slice(i, min(i + SCORE_BLOCK_ROWS, self._size))
+            scores[block] = self._block_scores(block, queries, tables)
+        return scores
+
+    def _record(self, row: int) -> dict:
+        record = {
+            name: column[row]
+            for name, column in self._columns.items()
+            if column[row] is not None
+        }
+        record["__id__"] = self._ids[row]
+        return record
+
+    def _top(
+        self, scores: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None
+    ) -> list[tuple[int, float]]:
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        hits = []
+        for i in best.tolist():
+            score = float(scores[i])
+            if score < self.cosine_better_than_threshold:
+                break
+            hits.append((int(rows[i]) if rows is not None else i, score))
+        return hits
+
+    def _rerank(
+        self, query: np.ndarray, rows, scores: np.ndarray, top_k: int
+    ) -> list[tuple[int, float]]:
+        """Exact scores for the best ``rerank * top_k`` first-stage candidates."""
+        shortlist = min(self._rerank_factor * top_k, len(scores))
+        if shortlist <= 0:
+            return []
+        best = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        best = best[np.isfinite(scores[best])]
+        # sorted row numbers read the on-disk matrix in file order
+        best = np.sort(best if rows is None else rows[best])
+        exact = np.asarray(self._matrix[best], dtype=np.float32) @ query
+        return self._top(exact, top_k, best)
+
+    def _search(self, queries: np.ndarray, top_k: int) -> list[list[tuple[int, float]]]:
+        """(row, cosine) of the best live rows above the threshold, per query."""
+        if not self._rows:
+            return [[] for _ in queries]
+        tables = self._pq_tables(queries)
+        # first stage: PQ codes or search_dim prefixes, if configured
+        two_stage = tables is not None or bool(self._search_dim)
+        stage_queries = self._prefixes(queries) if self._search_dim else queries
+        if (
+            self._ivf is not None
+            and self._ivf.trained
+            and len(self._rows) >= self._ivf_min_rows
+        ):
+            candidates = []
+            for i, query in enumerate(queries):
+                rows = self._ivf.candidates(query)
+                if self._tombstones:
+                    rows = rows[[self._ids[r] is not None for r in rows.tolist()]]
+                scores = self._block_scores(
+                    rows,
+                    stage_queries[i : i + 1],
+                    None if tables is None else tables[i : i + 1],
+                )
+                candidates.append((rows, scores[:, 0]))
+        else:
+            # one matrix product for all queries
+            scores = self._scores(stage_queries, tables)
+            if self._tombstones:
+                dead = [
+                    i for i, id_ in enumerate(self._ids[: self._size]) if id_ is None
+                ]
+                scores[dead] = -np.inf
+            candidates = [(None, column) for column in scores.T]
+        if not two_stage:
+            return [self._top(scores, top_k, rows) for rows, scores in candidates]
+        # first-stage scores are approximate; re-rank a shortlist exactly
+        return [
+            self._rerank(query, rows, scores, top_k)
+            for query, (rows, scores) in zip(queries, candidates)
+        ]
+
+    async def query(self, query: str, top_k=5):
+        return (await self.query_batch([query], top_k))[0]
+
+    async def query_batch(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        embeddings = await self.embedding_func(queries)
+        all_results = []
+        for hits in self._search(_normalise(embeddings), top_k):
+            results = []
+            for row, score in hits:
+                record = self._record(row)
+                results.append(
+                    {
+                        **record,
+                        "id": record["__id__"],
+                        "distance": score,
+                        "__metrics__": score,
+                        "created_at": record.get("__created_at__"),
+                    }
+                )
+            all_results.append(results)
+        return all_results
+
+    def stats(self) -> dict:
+        """Vector count and the bytes search keeps in memory vs. on disk only."""
+        matrix_bytes = self._size * self._dim * self._dtype.itemsize
+        aux_bytes = sum(values[: self._size].nbytes for values in self._aux.values())
+        on_disk = self._exact_on_disk and (self._pq is None or self._pq.trained)
+        return {
+            "vectors": len(self._rows),
+            "quantization": self._quantization,
+            "search_dim": self._search_dim,
+            "memory_bytes": aux_bytes + (0 if on_disk else matrix_bytes),
+            "disk_only_bytes": matrix_bytes if on_disk else 0,
+        }
+
+    def get(self, ids: list[str]) -> list[dict]:
+        """Metadata records of the ids that exist."""
+        return [self._record(self._rows[id_]) for id_ in ids if id_ in self._rows]
+
+    @property
+    def client_storage(self):
+        # same shape as NanoVectorDB's storage, for scans in lightrag.py
+        return {"data": [self._record(row) for row in self._rows.values()]}
+
+    async def delete_entity(self, entity_name: str):
+        try:
+            entity_id = compute_mdhash_id(entity_name, prefix="ent-")
+            logger.debug(
+                f"Attempting to delete entity {entity_name} with ID {entity_id}"
+            )
+            if entity_id in self._rows:
+                await self.delete([entity_id])
+                logger.debug(f"Successfully deleted entity {entity_name}")
+            else:
+                logger.debug(f"Entity {entity_name} not found in storage")
+        except Exception as e:
+            logger.error(f"Error deleting entity {entity_name}: {e}")
+
+    async def delete_entity_relation(self, entity_name: str):
+        try:
+            src = self._columns.get("src_id", [])
+            tgt = self._columns.get("tgt_id", [])
+            ids_to_delete = [
+                self._ids[row]
+                for row in self._rows.values()
+                if (row < len(src) and src[row] == entity_name)
+                or (row < len(tgt) and tgt[row] == entity_name)
+            ]
+            logger.debug(
+                f"Found {len(ids_to_delete)} relations for entity {entity_name}"
+            )
+            if ids_to_delete:
+                await self.delete(ids_to_delete)
+                logger.debug(
+                    f"Deleted {len(ids_to_delete)} relations for {entity_name}"
+                )
+            else:
+                logger.debug(f"No relations found for entity {entity_name}")
+        except Exception as e:
+            logger.error(f"Error deleting relations for {entity_name}: {e}")
@@ -173,6 +173,12 @@ class OracleKVStorage(BaseKVStorage):
 
     ################ QUERY METHODS ################
 
+    async def all_keys(self) -> list[str]:
+        SQL = SQL_TEMPLATES["all_keys"].format(table_name=N_T[self.namespace])
+        params = {"workspace": self.db.workspace}
+        res = await self.db.query(SQL, params, multirows=True)
+        return [row["id"] for row in res or []]
+
     async def get_by_id(self, id: str) -> Union[dict, None]:
         """根据 id 获取 doc_full 数据."""
         SQL = SQL_TEMPLATES["get_by_id_" + self.namespace]
@@ -280,6 +286,17 @@ class OracleKVStorage(BaseKVStorage):
                 await self.db.execute(merge_sql, data)
         return left_data
 
+    ################ DELETE METHODS ################
+    async def delete(self, ids: list[str]):
+        if not ids:
+            return
+        SQL = SQL_TEMPLATES["delete_keys"].format(
+            table_name=N_T[self.namespace], ids=",".join([f"'{id}'" for id in ids])
+        )
+        await self.db.execute(SQL, {"workspace": self.db.workspace})
+        for id in ids:
+            self._data.pop(id, None)
+
     async def index_done_callback(self):
         if self.namespace in ["full_docs", "text_chunks"]:
             logger.info("full doc and chunk data had been saved into oracle db!")
@@ -529,6 +546,40 @@ class OracleGraphStorage(BaseGraphStorage):
                 # print("Node Edge not exist!",self.db.workspace, source_node_id)
                 return []
 
+    @staticmethod
+    def _bind_list(prefix: str, values: list) -> tuple[str, dict]:
+        """生成IN列表的绑定变量占位符及参数"""
+        params = {f"{prefix}{i}": v for i, v in enumerate(values)}
+        return ",".join(f":{k}" for k in params), params
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        """根据节点id批量获取节点数据"""
+        if not node_ids:
+            return []
+        names, params = self._bind_list("node_id", list(dict.fromkeys(node_ids)))
+        SQL = SQL_TEMPLATES["get_nodes"].format(names=names)
+        params["workspace"] = self.db.workspace
+        res = await self.db.query(sql=SQL, params=params, multirows=True)
+        by_name = {}
+        for row in res or []:
+            by_name.setdefault(row["name"], row)
+        return [by_name.get(node_id) for node_id in node_ids]
+
+    async def get_nodes_edges(self, node_ids: list[str]) -> list[list[tuple[str, str]]]:
+        """根据节点id批量获取节点的所有边"""
+        if not node_ids:
+            return []
+        names, params = self._bind_list("node_id", list(dict.fromkeys(node_ids)))
+        SQL = SQL_TEMPLATES["get_nodes_edges"].format(names=names)
+        params["workspace"] = self.db.workspace
+        res = await self.db.query(sql=SQL, params=params, multirows=True)
+        by_source = {}
+        for row in res or []:
+            by_source.setdefault(row["source_name"], []).append(
+                (row["source_name"], row["target_name"])
+            )
+        return [list(by_source.get(node_id, [])) for node_id in node_ids]
+
     async def get_all_nodes(self, limit: int):
         """查询所有节点"""
         SQL = SQL_TEMPLATES["get_all_nodes"]
@@ -651,6 +702,8 @@ SQL_TEMPLATES = {
     "get_by_ids_full_docs": "select ID,NVL(content,'') as content from LIGHTRAG_DOC_FULL where workspace=:workspace and ID in ({ids})",
     "get_by_ids_text_chunks": "select ID,TOKENS,NVL(content,'') as content,CHUNK_ORDER_INDEX,FULL_DOC_ID  from LIGHTRAG_DOC_CHUNKS where workspace=:workspace and ID in ({ids})",
     "filter_keys": "select id from {table_name} where workspace=:workspace and id in ({ids})",
+    "all_keys": "select id from {table_name} where workspace=:workspace",
+    "delete_keys": "delete from {table_name} where workspace=:workspace and id in ({ids})",
     "merge_doc_full": """ MERGE INTO LIGHTRAG_DOC_FULL a
                     USING DUAL
                     ON (a.id = :check_id)
@@ -712,6 +765,19 @@ SQL_TEMPLATES = {
             WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
             AND a.name=:source_node_id
             COLUMNS (a.name as source_name,b.name as target_name))""",
+    "get_nodes": """SELECT t1.name,t2.entity_type,t2.source_chunk_id as source_id,NVL(t2.description,'') AS description
+        FROM GRAPH_TABLE (lightrag_graph
+        MATCH (a)
+        WHERE a.workspace=:workspace AND a.name IN ({names})
+        COLUMNS (a.name)
+        ) t1 JOIN LIGHTRAG_GRAPH_NODES t2 on t1.name=t2.name
+        WHERE t2.workspace=:workspace""",
+    "get_nodes_edges": """SELECT source_name,target_name
+            FROM GRAPH_TABLE (lightrag_graph
+            MATCH (a)-[e]->(b)
+            WHERE e.workspace=:workspace and a.workspace=:workspace and b.workspace=:workspace
+            AND a.name IN ({names})
+            COLUMNS (a.name as source_name,b.name as target_name))""",
     "merge_node": """MERGE INTO LIGHTRAG_GRAPH_NODES a
                     USING DUAL
                     ON (a.workspace = :workspace and a.name=:name and a.source_chunk_id=:source_chunk_id)
@@ -165,17 +165,19 @@ class PGKVStorage(BaseKVStorage):
 
     ################ QUERY METHODS ################
 
+    async def all_keys(self) -> list[str]:
+        sql = SQL_TEMPLATES["all_keys"].format(
+            table_name=NAMESPACE_TABLE_MAP[self.namespace]
+        )
+        params = {"workspace": self.db.workspace}
+        res = await self.db.query(sql, params, multirows=True)
+        return [row["id"] for row in res or []]
+
     async def get_by_id(self, id: str) -> Union[dict, None]:
         """Get doc_full data by id."""
         sql = SQL_TEMPLATES["get_by_id_" + self.namespace]
         params = {"workspace": self.db.workspace, "id": id}
-        if "llm_response_cache" == self.namespace:
-            array_res = await self.db.query(sql, params, multirows=True)
-            res = {}
-            for row in array_res:
-                res[row["id"]] = row
-        else:
-            res = await self.db.query(sql, params)
+        res = await self.db.query(sql, params)
         if res:
             return res
         else:
@@ -188,20 +190,11 @@ class PGKVStorage(BaseKVStorage):
             ids=",".join([f"'{id}'" for id in ids])
         )
         params = {"workspace": self.db.workspace}
-        if "llm_response_cache" == self.namespace:
-            array_res = await self.db.query(sql, params, multirows=True)
-            modes = set()
-            dict_res: dict[str, dict] = {}
-            for row in array_res:
-                modes.add(row["mode"])
-            for mode in modes:
-                if mode not in dict_res:
-                    dict_res[mode] = {}
-            for row in array_res:
-                dict_res[row["mode"]][row["id"]] = row
-            res = [{k: v} for k, v in dict_res.items()]
-        else:
-            res = await self.db.query(sql, params, multirows=True)
+        res = await self.db.query(sql, params, multirows=True)
+        if res and "llm_response_cache" == self.namespace:
+            # align rows with the requested ids, as the cache expects
+            by_id = {row["id"]: row for row in res}
+            res = [by_id.get(id) for id in ids]
         if res:
             return res
         else:
@@ -243,20 +236,32 @@ class PGKVStorage(BaseKVStorage):
                 }
                 await self.db.execute(upsert_sql, data)
         elif self.namespace == "llm_response_cache":
-            for mode, items in self._data.items():
-                for k, v in items.items():
-                    upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
-                    data = {
-                        "workspace": self.db.workspace,
-                        "id": k,
-                        "original_prompt": v["original_prompt"],
-                        "return": v["return"],
-                        "mode": mode,
-                    }
-                    await self.db.execute(upsert_sql, data)
+            # one row per (mode, args_hash) entry
+            for k, v in data.items():
+                upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
+                row = {
+                    "workspace": self.db.workspace,
+                    "id": k,
+                    "original_prompt": v["original_prompt"],
+                    "return": v["return"],
+                    "mode": v["mode"],
+                }
+                await self.db.execute(upsert_sql, row)
 
         return left_data
 
+    ################ DELETE METHODS ################
+    async def delete(self, ids: list[str]):
+        if not ids:
+            return
+        sql = SQL_TEMPLATES["delete_keys"].format(
+            table_name=NAMESPACE_TABLE_MAP[self.namespace],
+            ids=",".join([f"'{id}'" for id in ids]),
+        )
+        await self.db.execute(sql, {"workspace": self.db.workspace})
+        for id in ids:
+            self._data.pop(id, None)
+
     async def index_done_callback(self):
         if self.namespace in ["full_docs", "text_chunks"]:
             logger.info("full doc and chunk data had been saved into postgresql db!")
@@ -366,17 +371,26 @@ class PGVectorStorage(BaseVectorStorage):
     #################### query method ###############
     async def query(self, query: str, top_k=5) -> Union[dict, list[dict]]:
         """从向量数据库中查询数据"""
-        embeddings = await self.embedding_func([query])
-        embedding = embeddings[0]
-        embedding_string = ",".join(map(str, embedding))
+        return (await self.query_batch([query], top_k))[0]
 
-        sql = SQL_TEMPLATES[self.namespace].format(embedding_string=embedding_string)
+    async def query_batch(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        """One lateral-join search for all queries; rows come back tagged with
+        the 1-based ``query_index`` of the query they answer."""
+        embeddings = await self.embedding_func(queries)
         params = {
             "workspace": self.db.workspace,
+            "embeddings": [
+                "[" + ",".join(map(str, embedding)) + "]" for embedding in embeddings
+            ],
             "better_than_threshold": self.cosine_better_than_threshold,
             "top_k": top_k,
         }
-        results = await self.db.query(sql, params=params, multirows=True)
+        rows = await self.db.query(
+            SQL_TEMPLATES[self.namespace], params=params, multirows=True
+        )
+        results = [[] for _ in queries]
+        for row in rows:
+            results[row.pop("query_index") - 1].append(row)
         return results
 
 
@@ -476,6 +490,10 @@ class PGDocStatusStorage(DocStatusStorage):
         return data
 
 
+# Max per-item branches combined into one UNION ALL query by the batch methods
+BATCH_QUERY_SIZE = 100
+
+
 class PGGraphQueryException(Exception):
     """Exception for the AGE queries."""
 
@@ -925,6 +943,91 @@ class PGGraphStorage(BaseGraphStorage):
 
         return edges
 
+    @staticmethod
+    def _encode_labels(node_ids: List[str]) -> List[str]:
+        return [
+            PGGraphStorage._encode_graph_label(node_id.strip('"')) for node_id in node_ids
+        ]
+
+    async def _query_union(self, branches: List[str]) -> List[Dict[str, Any]]:
+        """Run per-item cypher branches as UNION ALL queries, in chunks.
+
+        Each branch must return the same aliased columns, the first being
+        ``idx``; branches must not contain format placeholders.
+        """
+        results = []
+        for i in range(0, len(branches), BATCH_QUERY_SIZE):
+            query = "\nUNION ALL\n".join(branches[i : i + BATCH_QUERY_SIZE])
+            results.extend(await self._query(query))
+        return results
+
+    async def get_nodes(self, node_ids: List[str]) -> List[Union[dict, None]]:
+        if not node_ids:
+            return []
+        branches = [
+            f"MATCH (n:`{label}`) RETURN {i} AS idx, n LIMIT 1"
+            for i, label in enumerate(self._encode_labels(node_ids))
+        ]
+        nodes = [None] * len(node_ids)
+        for record in await self._query_union(branches):
+            nodes[int(record["idx"])] = record["n"]
+        return nodes
+
+    async def node_degrees(self, node_ids: List[str]) -> List[int]:
+        if not node_ids:
+            return []
+        branches = [
+            f"MATCH (n:`{label}`)-[]->(x) "
+            f"RETURN {i} AS idx, count(x) AS total_edge_count"
+            for i, label in enumerate(self._encode_labels(node_ids))
+        ]
+        degrees = [0] * len(node_ids)
+        for record in await self._query_union(branches):
+            degrees[int(record["idx"])] = int(record["total_edge_count"] or 0)
+        return degrees
+
+    async def get_edges(
+        self, edge_pairs: List[Tuple[str, str]]
+    ) -> List[Union[dict, None]]:
+        if not edge_pairs:
+            return []
+        branches = [
+            f"MATCH (a:`{src}`)-[r]->(b:`{tgt}`) "
+            f"RETURN {i} AS idx, properties(r) AS edge_properties LIMIT 1"
+            for i, (src, tgt) in enumerate(
+                zip(
+                    self._encode_labels([s for s, _ in edge_pairs]),
+                    self._encode_labels([t for _, t in edge_pairs]),
+                )
+            )
+        ]
+        edges = [None] * len(edge_pairs)
+        for record in await self._query_union(branches):
+            if record["edge_properties"]:
+                edges[int(record["idx"])] = record["edge_properties"]
+        return edges
+
+    async def get_nodes_edges(
+        self, node_ids: List[str]
+    ) -> List[List[Tuple[str, str]]]:
+        if not node_ids:
+            return []
+        branches = [
+            f"MATCH (n:`{label}`) "
+            "OPTIONAL MATCH (n)-[r]-(connected) "
+            f"RETURN {i} AS idx, n, connected"
+            for i, label in enumerate(self._encode_labels(node_ids))
+        ]
+        edges = [[] for _ in node_ids]
+        for record in await self._query_union(branches):
+            source_node, connected_node = record["n"], record["connected"]
+            if source_node and connected_node:
+                if source_node.get("label") and connected_node.get("label"):
+                    edges[int(record["idx"])].append(
+                        (source_node["label"], connected_node["label"])
+                    )
+        return edges
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -1110,7 +1213,7 @@ SQL_TEMPLATES = {
                                 FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id=$2
                             """,
     "get_by_id_llm_response_cache": """SELECT id, original_prompt, COALESCE("return", '') as "return", mode
-                                FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode=$2
+                                FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND id=$2
                                """,
     "get_by_ids_full_docs": """SELECT id, COALESCE(content, '') as content
                                  FROM LIGHTRAG_DOC_FULL WHERE workspace=$1 AND id IN ({ids})
@@ -1120,9 +1223,11 @@ SQL_TEMPLATES = {
                                    FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id IN ({ids})
                                 """,
     "get_by_ids_llm_response_cache": """SELECT id, original_prompt, COALESCE("return", '') as "return", mode
-                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode= IN ({ids})
+                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND id IN ({ids})
                                 """,
     "filter_keys": "SELECT id FROM {table_name} WHERE workspace=$1 AND id IN ({ids})",
+    "all_keys": "SELECT id FROM {table_name} WHERE workspace=$1",
+    "delete_keys": "DELETE FROM {table_name} WHERE workspace=$1 AND id IN ({ids})",
     "upsert_doc_full": """INSERT INTO LIGHTRAG_DOC_FULL (id, content, workspace)
                         VALUES ($1, $2, $3)
                         ON CONFLICT (workspace,id) DO UPDATE
@@ -1165,19 +1270,29 @@ SQL_TEMPLATES = {
                       content_vector=EXCLUDED.content_vector, updatetime = CURRENT_TIMESTAMP
                      """,
     # SQL for VectorStorage
-    "entities": """SELECT entity_name FROM
-        (SELECT id, entity_name, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
-        FROM LIGHTRAG_VDB_ENTITY where workspace=$1)
-        WHERE distance>$2 ORDER BY distance DESC  LIMIT $3
+    "entities": """SELECT q.query_index, r.entity_name, r.distance
+        FROM unnest($2::text[]) WITH ORDINALITY AS q(embedding, query_index)
+        CROSS JOIN LATERAL
+        (SELECT entity_name, 1 - (content_vector <=> q.embedding::vector) as distance
+        FROM LIGHTRAG_VDB_ENTITY where workspace=$1
+        ORDER BY content_vector <=> q.embedding::vector LIMIT $4) r
+        WHERE r.distance>$3 ORDER BY q.query_index, r.distance DESC
        """,
-    "relationships": """SELECT source_id as src_id, target_id as tgt_id FROM
-        (SELECT id, source_id,target_id, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
-        FROM LIGHTRAG_VDB_RELATION where workspace=$1)
-        WHERE distance>$2 ORDER BY distance DESC  LIMIT $3
+    "relationships": """SELECT q.query_index, r.src_id, r.tgt_id, r.distance
+        FROM unnest($2::text[]) WITH ORDINALITY AS q(embedding, query_index)
+        CROSS JOIN LATERAL
+        (SELECT source_id as src_id, target_id as tgt_id,
+        1 - (content_vector <=> q.embedding::vector) as distance
+        FROM LIGHTRAG_VDB_RELATION where workspace=$1
+        ORDER BY content_vector <=> q.embedding::vector LIMIT $4) r
+        WHERE r.distance>$3 ORDER BY q.query_index, r.distance DESC
        """,
-    "chunks": """SELECT id FROM
-        (SELECT id, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
-        FROM LIGHTRAG_DOC_CHUNKS where workspace=$1)
-        WHERE distance>$2 ORDER BY distance DESC  LIMIT $3
+    "chunks": """SELECT q.query_index, r.id, r.distance
+        FROM unnest($2::text[]) WITH ORDINALITY AS q(embedding, query_index)
+        CROSS JOIN LATERAL
+        (SELECT id, 1 - (content_vector <=> q.embedding::vector) as distance
+        FROM LIGHTRAG_DOC_CHUNKS where workspace=$1
+        ORDER BY content_vector <=> q.embedding::vector LIMIT $4) r
+        WHERE r.distance>$3 ORDER BY q.query_index, r.distance DESC
        """,
 }
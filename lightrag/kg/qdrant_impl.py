@@ -9,6 +9,7 @@ import uuid
 
 from ..utils import logger
 from ..base import BaseVectorStorage
+from ..quantization import quantization_config
 
 
 def compute_mdhash_id_for_qdrant(
@@ -55,12 +56,61 @@ class QdrantVectorDBStorage(BaseVectorStorage):
             api_key=os.environ.get("QDRANT_API_KEY", None),
         )
         self._max_batch_size = self.global_config["embedding_batch_num"]
+        quantization = quantization_config(
+            self.global_config.get("vector_db_storage_cls_kwargs", {}), self.namespace
+        )
+        quantized = quantization["type"] not in ("float32", "float16")
+        self._search_params = None
+        quantization_settings = None
+        if quantized:
+            quantization_settings = self._quantization_settings(quantization)
+            # search the quantised vectors in RAM, re-score the oversampled
+            # shortlist with the originals
+            self._search_params = models.SearchParams(
+                quantization=models.QuantizationSearchParams(
+                    rescore=True, oversampling=quantization.get("rerank", 2.0)
+                )
+            )
         QdrantVectorDBStorage.create_collection_if_not_exist(
             self._client,
             self.namespace,
             vectors_config=models.VectorParams(
-                size=self.embedding_func.embedding_dim, distance=models.Distance.COSINE
+                size=self.embedding_func.embedding_dim,
+                distance=models.Distance.COSINE,
+                datatype=models.Datatype.FLOAT16
+                if quantization["type"] == "float16"
+                else None,
+                on_disk=quantization.get("on_disk", True) if quantized else None,
             ),
+            quantization_config=quantization_settings,
+        )
+        if quantization_settings is not None:
+            # applies the setting to collections created before it was set
+            self._client.update_collection(
+                self.namespace, quantization_config=quantization_settings
+            )
+
+    @staticmethod
+    def _quantization_settings(quantization: dict):
+        if quantization["type"] == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=quantization.get("quantile", 0.99),
+                    always_ram=True,
+                )
+            )
+        if quantization["type"] == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True)
+            )
+        return models.ProductQuantization(
+            product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio(
+                    f"x{quantization.get('compression', 16)}"
+                ),
+                always_ram=True,
+            )
         )
 
     async def upsert(self, data: dict[str, dict]):
@@ -110,12 +160,24 @@ class QdrantVectorDBStorage(BaseVectorStorage):
         return results
 
     async def query(self, query, top_k=5):
-        embedding = await self.embedding_func([query])
-        results = self._client.search(
+        return (await self.query_batch([query], top_k))[0]
+
+    async def query_batch(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        embeddings = await self.embedding_func(queries)
+        batch_results = self._client.search_batch(
             collection_name=self.namespace,
-            query_vector=embedding[0],
-            limit=top_k,
-            with_payload=True,
+            requests=[
+                models.SearchRequest(
+                    vector=embedding,
+                    limit=top_k,
+                    with_payload=True,
+                    params=self._search_params,
+                )
+                for embedding in embeddings.tolist()
+            ],
         )
-        logger.debug(f"query result: {results}")
-        return [{**dp.payload, "id": dp.id, "distance": dp.score} for dp in results]
\ No newline at end of file
+        logger.debug(f"query result: {batch_results}")
+        return [
+            [{**dp.payload, "id": dp.id, "distance": dp.score} for dp in results]
+            for results in batch_results
+        ]
\ No newline at end of file
@@ -100,6 +100,13 @@ class TiDBKVStorage(BaseKVStorage):
 
     ################ QUERY METHODS ################
 
+    async def all_keys(self) -> list[str]:
+        SQL = SQL_TEMPLATES["all_keys"].format(
+            table_name=N_T[self.namespace], id_field=N_ID[self.namespace]
+        )
+        res = await self.db.query(SQL, multirows=True)
+        return [row["id"] for row in res or []]
+
     async def get_by_id(self, id: str) -> Union[dict, None]:
         """根据 id 获取 doc_full 数据."""
         SQL = SQL_TEMPLATES["get_by_id_" + self.namespace]
@@ -203,6 +210,19 @@ class TiDBKVStorage(BaseKVStorage):
             await self.db.execute(merge_sql, data)
         return left_data
 
+    ################ DELETE full_doc AND chunks ################
+    async def delete(self, ids: list[str]):
+        if not ids:
+            return
+        SQL = SQL_TEMPLATES["delete_keys"].format(
+            table_name=N_T[self.namespace],
+            id_field=N_ID[self.namespace],
+            ids=",".join([f"'{id}'" for id in ids]),
+        )
+        await self.db.execute(SQL, {"workspace": self.db.workspace})
+        for id in ids:
+            self._data.pop(id, None)
+
     async def index_done_callback(self):
         if self.namespace in ["full_docs", "text_chunks"]:
             logger.info("full doc and chunk data had been saved into TiDB db!")
@@ -223,24 +243,34 @@ class TiDBVectorDBStorage(BaseVectorStorage):
 
     async def query(self, query: str, top_k: int) -> list[dict]:
         """search from tidb vector"""
+        return (await self.query_batch([query], top_k))[0]
 
-        embeddings = await self.embedding_func([query])
-        embedding = embeddings[0]
-
-        embedding_string = "[" + ", ".join(map(str, embedding.tolist())) + "]"
+    async def query_batch(self, queries: list[str], top_k: int) -> list[list[dict]]:
+        """Search all queries in one statement.
 
+        TiDB has no LATERAL joins, so each query is a ``LIMIT``ed branch of a
+        ``UNION ALL`` (which keeps the vector index usable per branch).
+        """
+        embeddings = await self.embedding_func(queries)
         params = {
-            "embedding_string": embedding_string,
-            "top_k": top_k,
-            "better_than_threshold": self.cosine_better_than_threshold,
+            f"embedding_{i}": "[" + ", ".join(map(str, embedding.tolist())) + "]"
+            for i, embedding in enumerate(embeddings)
         }
-
-        results = await self.db.query(
-            SQL_TEMPLATES[self.namespace], params=params, multirows=True
+        params.update(
+            {"top_k": top_k, "better_than_threshold": self.cosine_better_than_threshold}
         )
-        print("vector search result:", results)
-        if not results:
-            return []
+        branches = " UNION ALL ".join(
+            SQL_TEMPLATES[self.namespace].format(query_index=i)
+            for i in range(len(queries))
+        )
+        rows = await self.db.query(
+            SQL_TEMPLATES["vector_search"].format(branches=branches),
+            params=params,
+            multirows=True,
+        )
+        results = [[] for _ in queries]
+        for row in rows:
+            results[row.pop("query_index")].append(row)
         return results
 
     ###### INSERT entities And relationships ######
@@ -458,6 +488,64 @@ class TiDBGraphStorage(BaseGraphStorage):
             return []
 
 
+    @staticmethod
+    def _bind_list(prefix: str, values: list) -> tuple[str, dict]:
+        """Build ``:p0, :p1, ...`` placeholders and their bind params for IN lists."""
+        params = {f"{prefix}{i}": v for i, v in enumerate(values)}
+        return ", ".join(f":{k}" for k in params), params
+
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        if not node_ids:
+            return []
+        names, params = self._bind_list("name", list(dict.fromkeys(node_ids)))
+        sql = SQL_TEMPLATES["get_nodes"].format(names=names)
+        res = await self.db.query(sql, params, multirows=True)
+        by_name = {row["name"]: row for row in res or []}
+        return [by_name.get(node_id) for node_id in node_ids]
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        if not node_ids:
+            return []
+        names, params = self._bind_list("name", list(dict.fromkeys(node_ids)))
+        sql = SQL_TEMPLATES["node_degrees"].format(names=names)
+        res = await self.db.query(sql, params, multirows=True)
+        by_name = {row["name"]: row["cnt"] for row in res or []}
+        return [by_name.get(node_id, 0) for node_id in node_ids]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        if not edge_pairs:
+            return []
+        unique_pairs = list(dict.fromkeys(edge_pairs))
+        params = {}
+        pairs = []
+        for i, (src, tgt) in enumerate(unique_pairs):
+            params[f"src{i}"], params[f"tgt{i}"] = src, tgt
+            pairs.append(f"(:src{i}, :tgt{i})")
+        sql = SQL_TEMPLATES["get_edges"].format(pairs=", ".join(pairs))
+        res = await self.db.query(sql, params, multirows=True)
+        by_pair = {}
+        for row in res or []:
+            by_pair.setdefault((row["source_name"], row["target_name"]), row)
+        return [by_pair.get(pair) for pair in edge_pairs]
+
+    async def get_nodes_edges(
+        self, node_ids: list[str]
+    ) -> list[list[tuple[str, str]]]:
+        if not node_ids:
+            return []
+        names, params = self._bind_list("name", list(dict.fromkeys(node_ids)))
+        sql = SQL_TEMPLATES["get_nodes_edges"].format(names=names)
+        res = await self.db.query(sql, params, multirows=True)
+        by_source = {}
+        for row in res or []:
+            by_source.setdefault(row["source_name"], []).append(
+                (row["source_name"], row["target_name"])
+            )
+        return [list(by_source.get(node_id, [])) for node_id in node_ids]
+
+
 N_T = {
     "full_docs": "LIGHTRAG_DOC_FULL",
     "text_chunks": "LIGHTRAG_DOC_CHUNKS",
@@ -565,6 +653,8 @@ SQL_TEMPLATES = {
     "get_by_ids_full_docs": "SELECT doc_id as id, IFNULL(content, '') AS content FROM LIGHTRAG_DOC_FULL WHERE doc_id IN ({ids}) AND workspace = :workspace",
     "get_by_ids_text_chunks": "SELECT chunk_id as id, tokens, IFNULL(content, '') AS content, chunk_order_index, full_doc_id FROM LIGHTRAG_DOC_CHUNKS WHERE chunk_id IN ({ids}) AND workspace = :workspace",
     "filter_keys": "SELECT {id_field} AS id FROM {table_name} WHERE {id_field} IN ({ids}) AND workspace = :workspace",
+    "all_keys": "SELECT {id_field} AS id FROM {table_name} WHERE workspace = :workspace",
+    "delete_keys": "DELETE FROM {table_name} WHERE {id_field} IN ({ids}) AND workspace = :workspace",
     # SQL for Merge operations (TiDB version with INSERT ... ON DUPLICATE KEY UPDATE)
     "upsert_doc_full": """
         INSERT INTO LIGHTRAG_DOC_FULL (doc_id, content, workspace)
@@ -579,20 +669,24 @@ SQL_TEMPLATES = {
         full_doc_id = VALUES(full_doc_id), content_vector = VALUES(content_vector), workspace = VALUES(workspace), updatetime = CURRENT_TIMESTAMP
     """,
     # SQL for VectorStorage
-    "entities": """SELECT n.name as entity_name FROM
-        (SELECT entity_id as id, name, VEC_COSINE_DISTANCE(content_vector,:embedding_string) as distance
-        FROM LIGHTRAG_GRAPH_NODES WHERE workspace = :workspace) n
-        WHERE n.distance>:better_than_threshold ORDER BY n.distance DESC LIMIT :top_k
+    "vector_search": """SELECT * FROM ({branches}) r
+        WHERE r.distance > :better_than_threshold ORDER BY r.query_index, r.distance DESC
     """,
-    "relationships": """SELECT e.source_name as src_id, e.target_name as tgt_id FROM
-        (SELECT source_name, target_name, VEC_COSINE_DISTANCE(content_vector, :embedding_string) as distance
-        FROM LIGHTRAG_GRAPH_EDGES WHERE workspace = :workspace) e
-        WHERE e.distance>:better_than_threshold ORDER BY e.distance DESC LIMIT :top_k
+    "entities": """(SELECT {query_index} AS query_index, name AS entity_name,
+        1 - VEC_COSINE_DISTANCE(content_vector, :embedding_{query_index}) AS distance
+        FROM LIGHTRAG_GRAPH_NODES WHERE workspace = :workspace
+        ORDER BY VEC_COSINE_DISTANCE(content_vector, :embedding_{query_index}) LIMIT :top_k)
     """,
-    "chunks": """SELECT c.id FROM
-        (SELECT chunk_id as id,VEC_COSINE_DISTANCE(content_vector, :embedding_string) as distance
-        FROM LIGHTRAG_DOC_CHUNKS WHERE workspace = :workspace) c
-        WHERE c.distance>:better_than_threshold ORDER BY c.distance DESC LIMIT :top_k
+    "relationships": """(SELECT {query_index} AS query_index,
+        source_name AS src_id, target_name AS tgt_id,
+        1 - VEC_COSINE_DISTANCE(content_vector, :embedding_{query_index}) AS distance
+        FROM LIGHTRAG_GRAPH_EDGES WHERE workspace = :workspace
+        ORDER BY VEC_COSINE_DISTANCE(content_vector, :embedding_{query_index}) LIMIT :top_k)
+    """,
+    "chunks": """(SELECT {query_index} AS query_index, chunk_id AS id,
+        1 - VEC_COSINE_DISTANCE(content_vector, :embedding_{query_index}) AS distance
+        FROM LIGHTRAG_DOC_CHUNKS WHERE workspace = :workspace
+        ORDER BY VEC_COSINE_DISTANCE(content_vector, :embedding_{query_index}) LIMIT :top_k)
     """,
     "has_entity": """
         SELECT COUNT(id) AS cnt FROM LIGHTRAG_GRAPH_NODES WHERE name = :name AND workspace = :workspace
@@ -634,6 +728,27 @@ SQL_TEMPLATES = {
     "node_degree": """
         SELECT COUNT(id) AS cnt FROM LIGHTRAG_GRAPH_EDGES WHERE workspace = :workspace AND :name IN (source_name, target_name)
     """,
+    "get_nodes": """
+        SELECT entity_id AS id, workspace, name, entity_type, description, source_chunk_id AS source_id, content, content_vector
+        FROM LIGHTRAG_GRAPH_NODES WHERE name IN ({names}) AND workspace = :workspace
+    """,
+    "get_edges": """
+        SELECT relation_id AS id, workspace, source_name, target_name, weight, keywords, description, source_chunk_id AS source_id, content, content_vector
+        FROM LIGHTRAG_GRAPH_EDGES WHERE (source_name, target_name) IN ({pairs}) AND workspace = :workspace
+    """,
+    "get_nodes_edges": """
+        SELECT source_name, target_name
+        FROM LIGHTRAG_GRAPH_EDGES WHERE source_name IN ({names}) AND workspace = :workspace
+    """,
+    "node_degrees": """
+        SELECT name, COUNT(*) AS cnt FROM (
+            SELECT source_name AS name FROM LIGHTRAG_GRAPH_EDGES
+            WHERE workspace = :workspace AND source_name IN ({names})
+            UNION ALL
+            SELECT target_name AS name FROM LIGHTRAG_GRAPH_EDGES
+            WHERE workspace = :workspace AND target_name IN ({names}) AND target_name <> source_name
+        ) AS endpoints GROUP BY name
+    """,
     "upsert_node": """
         INSERT INTO LIGHTRAG_GRAPH_NODES(name, content, content_vector, workspace, source_chunk_id, entity_type, description)
         VALUES(:name, :content, :content_vector, :workspace, :source_chunk_id, :entity_type, :description)
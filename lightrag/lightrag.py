@@ -1,11 +1,14 @@
 import asyncio
 import os
-from tqdm.asyncio import tqdm as tqdm_async
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
 from functools import partial
 from typing import Type, cast, Dict
-from .chunks import get_docs, get_chunks
+from .chunks import get_docs, close_chunk_sources
+from .clients import close_clients
+from .embedding_cache import EmbeddingCache, embedding_model_name
+from .pipeline import IngestionPipeline
+from .llm_cache import LLMResponseCache
 
 from .llm import (
     gpt_4o_mini_complete,
@@ -13,7 +16,6 @@ from .llm import (
 )
 from .operate import (
     chunking_by_token_size,
-    extract_entities,
     # local_query,global_query,hybrid_query,
     kg_query,
     naive_query,
@@ -24,6 +26,9 @@ from .utils import (
     EmbeddingFunc,
     compute_mdhash_id,
     limit_async_func_call,
+    call_lane,
+    DEFAULT_CALL_LANES,
+    wrap_llm_func_with_cache,
     convert_response_to_json,
     logger,
     set_logger,
@@ -93,6 +98,8 @@ PGGraphStorage = lazy_external_import(".kg.postgres_impl", "PGGraphStorage")
 GremlinStorage = lazy_external_import(".kg.gremlin_impl", "GremlinStorage")
 PGDocStatusStorage = lazy_external_import(".kg.postgres_impl", "PGDocStatusStorage")
 QdrantVectorDBStorage = lazy_external_import(".kg.qdrant_impl", "QdrantVectorDBStorage")
+CSRGraphStorage = lazy_external_import(".kg.csr_impl", "CSRGraphStorage")
+NumpyVectorDBStorage = lazy_external_import(".kg.numpy_impl", "NumpyVectorDBStorage")
 
 
 def always_get_an_event_loop() -> asyncio.AbstractEventLoop:
@@ -166,6 +173,17 @@ class LightRAG:
     embedding_func: EmbeddingFunc = field(default_factory=lambda: openai_embedding)
     embedding_batch_num: int = 32
     embedding_func_max_async: int = 16
+    # > 0 coalesces concurrent embedding calls arriving within this many ms
+    # into batches of up to embedding_batch_num texts
+    embedding_batch_window_ms: float = 0.0
+    # persistent fp16 embedding cache keyed by (model, dim, text):
+    # enabled, max_entries, model (required unless the embedding function
+    # binds one, e.g. via functools.partial), optional file
+    embedding_vector_cache_config: dict = field(
+        default_factory=lambda: {"enabled": False, "max_entries": 1_000_000}
+    )
+    # priority lanes of embedding calls: {lane: {"weight", "reserved"}}
+    embedding_call_lanes: dict = field(default_factory=lambda: dict(DEFAULT_CALL_LANES))
 
     # LLM
     llm_model_func: callable = gpt_4o_mini_complete  # hf_model_complete#
@@ -173,11 +191,19 @@ class LightRAG:
     llm_model_max_token_size: int = 32768
     llm_model_max_async: int = 16
     llm_model_kwargs: dict = field(default_factory=dict)
+    # priority lanes of LLM calls, see utils.DEFAULT_CALL_LANES
+    llm_call_lanes: dict = field(default_factory=lambda: dict(DEFAULT_CALL_LANES))
 
     # storage
     vector_db_storage_cls_kwargs: dict = field(default_factory=dict)
+    graph_storage_cls_kwargs: dict = field(default_factory=dict)
 
     enable_llm_cache: bool = True
+    # per-entry query answer cache bounds: max_entries, max_bytes, ttl_seconds
+    llm_response_cache_config: dict = field(default_factory=dict)
+    # content-addressed cache of raw LLM calls (extraction, gleaning,
+    # summaries): "off", "read_write" or "replay_only"
+    llm_call_cache_mode: str = "read_write"
 
     # extension
     addon_params: dict = field(default_factory=dict)
@@ -212,15 +238,56 @@ class LightRAG:
             logger.info(f"Creating working directory {self.working_dir}")
             os.makedirs(self.working_dir)
 
-        self.llm_response_cache = self.key_string_value_json_storage_cls(
-            namespace="llm_response_cache",
-            global_config=asdict(self),
-            embedding_func=None,
+        self.llm_response_cache = LLMResponseCache(
+            self.key_string_value_json_storage_cls(
+                namespace="llm_response_cache",
+                global_config=asdict(self),
+                embedding_func=None,
+            ),
+            **self.llm_response_cache_config,
         )
 
-        self.embedding_func = limit_async_func_call(self.embedding_func_max_async)(
-            self.embedding_func
-        )
+        if isinstance(self.embedding_func, EmbeddingFunc):
+            embedding_provider = self.embedding_func.func
+            # limit the provider calls, so micro-batching collects callers
+            # before they take a concurrency slot
+            limited_embedding_func = limit_async_func_call(
+                self.embedding_func_max_async, lanes=self.embedding_call_lanes
+            )(self.embedding_func.func)
+            self.embedding_func = replace(
+                self.embedding_func,
+                func=limited_embedding_func,
+                batch_window_ms=self.embedding_batch_window_ms
+                or self.embedding_func.batch_window_ms,
+                max_batch_size=self.embedding_batch_num,
+            )
+            self.embedding_limiter = limited_embedding_func.limiter
+            if self.embedding_vector_cache_config.get("enabled"):
+                model = self.embedding_vector_cache_config.get(
+                    "model"
+                ) or embedding_model_name(embedding_provider)
+                if not model:
+                    raise ValueError(
+                        "embedding_vector_cache_config needs a 'model' id: it "
+                        "cannot be read from the embedding function, and "
+                        "vectors of different models must not share cache keys"
+                    )
+                self.embedding_func.attach_cache(
+                    EmbeddingCache(
+                        self.embedding_vector_cache_config.get("file")
+                        or os.path.join(self.working_dir, "embedding_cache.sqlite"),
+                        model=model,
+                        embedding_dim=self.embedding_func.embedding_dim,
+                        max_entries=self.embedding_vector_cache_config.get(
+                            "max_entries", 1_000_000
+                        ),
+                    )
+                )
+        else:
+            self.embedding_func = limit_async_func_call(
+                self.embedding_func_max_async, lanes=self.embedding_call_lanes
+            )(self.embedding_func)
+            self.embedding_limiter = self.embedding_func.limiter
 
         ####
         # add embedding func by walter
@@ -262,7 +329,22 @@ class LightRAG:
             embedding_func=self.embedding_func,
         )
 
-        self.llm_model_func = limit_async_func_call(self.llm_model_max_async)(
+        self.llm_call_cache = (
+            self.key_string_value_json_storage_cls(
+                namespace="llm_call_cache",
+                global_config=asdict(self),
+                embedding_func=None,
+            )
+            if self.llm_call_cache_mode != "off"
+            else None
+        )
+        llm_func_name = getattr(self.llm_model_func, "__name__", None) or getattr(
+            getattr(self.llm_model_func, "func", None), "__name__", ""
+        )
+        # cache hits are served before taking an LLM concurrency slot
+        limited_llm_func = limit_async_func_call(
+            self.llm_model_max_async, lanes=self.llm_call_lanes
+        )(
             partial(
                 self.llm_model_func,
                 hashing_kv=self.llm_response_cache
@@ -276,6 +358,19 @@ class LightRAG:
                 **self.llm_model_kwargs,
             )
         )
+        self.llm_limiter = limited_llm_func.limiter
+        self.llm_model_func = wrap_llm_func_with_cache(
+            limited_llm_func,
+            self.llm_call_cache,
+            mode=self.llm_call_cache_mode,
+            key_params={
+                "func": llm_func_name,
+                "model": self.llm_model_name,
+                "model_kwargs": self.llm_model_kwargs,
+            },
+            # query answers stay with llm_response_cache and enable_llm_cache
+            lanes=("extraction", "gleaning", "summary"),
+        )
 
         # Initialize document status storage
         self.doc_status_storage_cls = self._get_storage_class()[self.doc_status_storage]
@@ -294,6 +389,7 @@ class LightRAG:
             "TiDBKVStorage": TiDBKVStorage,
             # vector storage
             "NanoVectorDBStorage": NanoVectorDBStorage,
+            "NumpyVectorDBStorage": NumpyVectorDBStorage,
             "OracleVectorDBStorage": OracleVectorDBStorage,
             "MilvusVectorDBStorge": MilvusVectorDBStorge,
             "ChromaVectorDBStorage": ChromaVectorDBStorage,
@@ -310,6 +406,7 @@ class LightRAG:
             "PGVectorStorage": PGVectorStorage,
             "TiDBGraphStorage": TiDBGraphStorage,
             "GremlinStorage": GremlinStorage,
+            "CSRGraphStorage": CSRGraphStorage,
             # "ArangoDBStorage": ArangoDBStorage
             "JsonDocStatusStorage": JsonDocStatusStorage,
         }
@@ -324,6 +421,14 @@ class LightRAG:
         Args:
             company_id: company id
         """
+        try:
+            with call_lane("extraction"):
+                await self._ainsert_company_docs()
+        finally:
+            # Release pooled chunk-source connections once ingestion is over
+            await close_chunk_sources()
+
+    async def _ainsert_company_docs(self):
         docs = await get_docs(self.addon_params.get("company_id"), self.addon_params.get("env"))
 
         new_docs = {
@@ -344,92 +449,27 @@ class LightRAG:
 
         logger.info(f"Processing {len(new_docs)} new unique documents")
 
-        # Process documents in batches
-        batch_size = self.addon_params.get("insert_batch_size", 10)
-        for i in range(0, len(new_docs), batch_size):
-            batch_docs = dict(list(new_docs.items())[i : i + batch_size])
-            tasks = []
-            for doc_id, doc in tqdm_async(
-                batch_docs.items(), desc=f"Processing batch {i//batch_size + 1}"
-            ):
-                tasks.append(self._ainsert_doc(doc_id, doc))
-            await asyncio.gather(*tasks)
-
-    async def _ainsert_doc(self, doc_id, doc):
-        try:
-            # Update status to processing
-            print(f"processing doc {doc_id}")
-            doc_status = {
-                "status": DocStatus.PROCESSING,
-                "created_at": doc["created_at"],
-                "updated_at": datetime.now().isoformat(),
-            }
-            await self.doc_status.upsert({doc_id: doc_status})
-
-            # Generate chunks from document
-            chunks = await get_chunks(doc_id, self.addon_params.get("min_chunk_tokens", 1200), self.addon_params.get("company_id"), self.addon_params.get("env"))
-
-            # Update status with chunks information
-            doc_status.update(
-                {
-                    "chunks_count": len(chunks),
-                    "updated_at": datetime.now().isoformat(),
-                }
-            )
-            await self.doc_status.upsert({doc_id: doc_status})
-
-            try:
-                # Store chunks in vector database
-                await self.chunks_vdb.upsert(chunks)
-
-                # Extract and store entities and relationships
-                maybe_new_kg = await extract_entities(
-                    chunks,
-                    knowledge_graph_inst=self.chunk_entity_relation_graph,
-                    entity_vdb=self.entities_vdb,
-                    relationships_vdb=self.relationships_vdb,
-                    global_config=asdict(self),
-                )
-
-                if maybe_new_kg is None:
-                    raise Exception(
-                        "Failed to extract entities and relationships"
-                    )
+        # Stream documents through the staged ingestion pipeline
+        await IngestionPipeline(self).run(new_docs)
 
-                self.chunk_entity_relation_graph = maybe_new_kg
-
-                await self.text_chunks.upsert(chunks)
-
-                # Update status to processed
-                doc_status.update(
-                    {
-                        "status": DocStatus.PROCESSED,
-                        "updated_at": datetime.now().isoformat(),
-                    }
-                )
-                await self.doc_status.upsert({doc_id: doc_status})
-
-            except Exception as e:
-                # Mark as failed if any step fails
-                doc_status.update(
-                    {
-                        "status": DocStatus.FAILED,
-                        "error": str(e),
-                        "updated_at": datetime.now().isoformat(),
-                    }
-                )
-                await self.doc_status.upsert({doc_id: doc_status})
-                raise e
+    def checkpoint(self):
+        loop = always_get_an_event_loop()
+        return loop.run_until_complete(self.acheckpoint())
 
-        except Exception as e:
-            import traceback
+    async def acheckpoint(self):
+        """Persist every storage with unflushed changes."""
+        await self._insert_done()
 
-            error_msg = f"Failed to process document {doc_id}: {str(e)}\n{traceback.format_exc()}"
-            logger.error(error_msg)
+    def close(self):
+        loop = always_get_an_event_loop()
+        return loop.run_until_complete(self.aclose())
 
-        finally:
-            # Ensure all indexes are updated after each document
-            await self._insert_done()
+    async def aclose(self):
+        """Close the pooled LLM / embedding provider clients and caches."""
+        await close_clients()
+        cache = getattr(self.embedding_func, "_cache", None)
+        if cache is not None:
+            cache.close()
 
     async def _insert_done(self):
         tasks = []
@@ -438,6 +478,7 @@ class LightRAG:
             self.doc_status,
             self.text_chunks,
             self.llm_response_cache,
+            self.llm_call_cache,
             self.entities_vdb,
             self.relationships_vdb,
             self.chunks_vdb,
@@ -590,6 +631,11 @@ class LightRAG:
         return loop.run_until_complete(self.aquery(query, param))
 
     async def aquery(self, query: str, param: QueryParam = QueryParam()):
+        # interactive calls are scheduled ahead of background ingestion
+        with call_lane("query"):
+            return await self._aquery(query, param)
+
+    async def _aquery(self, query: str, param: QueryParam):
         if param.mode in ["local", "global", "hybrid"]:
             response = await kg_query(
                 query,
@@ -656,6 +702,13 @@ class LightRAG:
             tasks.append(cast(StorageNameSpace, storage_inst).index_done_callback())
         await asyncio.gather(*tasks)
 
+    def concurrency_metrics(self) -> dict:
+        """In-flight, queued and wait-time figures of the LLM/embedding limiters."""
+        return {
+            "llm": self.llm_limiter.metrics(),
+            "embedding": self.embedding_limiter.metrics(),
+        }
+
     def delete_by_entity(self, entity_name: str):
         loop = always_get_an_event_loop()
         return loop.run_until_complete(self.adelete_by_entity(entity_name))
@@ -759,8 +812,8 @@ class LightRAG:
 
             # 5. Find and process entities and relationships that have these chunks as source
             # Get all nodes in the graph
-            nodes = self.chunk_entity_relation_graph._graph.nodes(data=True)
-            edges = self.chunk_entity_relation_graph._graph.edges(data=True)
+            nodes = await self.chunk_entity_relation_graph.get_all_nodes()
+            edges = await self.chunk_entity_relation_graph.get_all_edges()
 
             # Track which entities and relationships need to be deleted or updated
             entities_to_delete = set()
@@ -814,7 +867,7 @@ class LightRAG:
 
             # Update entities
             for entity, new_source_id in entities_to_update.items():
-                node_data = self.chunk_entity_relation_graph._graph.nodes[entity]
+                node_data = await self.chunk_entity_relation_graph.get_node(entity)
                 node_data["source_id"] = new_source_id
                 await self.chunk_entity_relation_graph.upsert_node(entity, node_data)
                 logger.debug(
@@ -837,7 +890,7 @@ class LightRAG:
 
             # Update relationships
             for (src, tgt), new_source_id in relationships_to_update.items():
-                edge_data = self.chunk_entity_relation_graph._graph.edges[src, tgt]
+                edge_data = await self.chunk_entity_relation_graph.get_edge(src, tgt)
                 edge_data["source_id"] = new_source_id
                 await self.chunk_entity_relation_graph.upsert_edge(src, tgt, edge_data)
                 logger.debug(
@@ -936,7 +989,7 @@ class LightRAG:
         # Optional: Get vector database information
         if include_vector_data:
             entity_id = compute_mdhash_id(entity_name, prefix="ent-")
-            vector_data = self.entities_vdb._client.get([entity_id])
+            vector_data = self.entities_vdb.get([entity_id])
             result["vector_data"] = vector_data[0] if vector_data else None
 
         return result
@@ -993,7 +1046,7 @@ class LightRAG:
         # Optional: Get vector database information
         if include_vector_data:
             rel_id = compute_mdhash_id(src_entity + tgt_entity, prefix="rel-")
-            vector_data = self.relationships_vdb._client.get([rel_id])
+            vector_data = self.relationships_vdb.get([rel_id])
             result["vector_data"] = vector_data[0] if vector_data else None
 
         return result
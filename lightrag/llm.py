@@ -2,21 +2,21 @@ import base64
 import copy
 import json
 import os
+import random
 import re
 import struct
+import time
 from functools import lru_cache
 from typing import List, Dict, Callable, Any, Union, Optional
-import aioboto3
 import aiohttp
 import numpy as np
 import ollama
 import torch
 from openai import (
-    AsyncOpenAI,
     APIConnectionError,
+    APIStatusError,
     RateLimitError,
     APITimeoutError,
-    AsyncAzureOpenAI,
 )
 from pydantic import BaseModel, Field
 from tenacity import (
@@ -27,6 +27,19 @@ from tenacity import (
 )
 from transformers import AutoTokenizer, AutoModelForCausalLM
 
+from .clients import (
+    get_aiohttp_session,
+    get_azure_openai_client,
+    get_bedrock_client,
+    get_openai_client,
+)
+from .rate_governor import (
+    CircuitOpenError,
+    estimate_chat_tokens,
+    estimate_tokens,
+    get_rate_governor,
+)
+
 from .utils import (
     wrap_embedding_func_with_attrs,
     locate_json_string_body_from_string,
@@ -44,13 +57,6 @@ else:
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type(
-        (RateLimitError, APIConnectionError, APITimeoutError)
-    ),
-)
 async def openai_complete_if_cache(
     model,
     prompt,
@@ -63,11 +69,18 @@ async def openai_complete_if_cache(
     if api_key:
         os.environ["OPENAI_API_KEY"] = api_key
 
-    openai_async_client = (
-        AsyncOpenAI() if base_url is None else AsyncOpenAI(base_url=base_url)
+    # retries go through the governor, not the SDK
+    openai_async_client = get_openai_client(
+        base_url, api_key or os.environ.get("OPENAI_API_KEY"), max_retries=0
     )
     kwargs.pop("hashing_kv", None)
     kwargs.pop("keyword_extraction", None)
+    governor = get_rate_governor(
+        model,
+        api_key or os.environ.get("OPENAI_API_KEY"),
+        base_url,
+        **(kwargs.pop("rate_limit", None) or {}),
+    )
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
@@ -80,13 +93,22 @@ async def openai_complete_if_cache(
     logger.debug(f"System prompt: {system_prompt}")
     logger.debug("Full context:")
     if "response_format" in kwargs:
-        response = await openai_async_client.beta.chat.completions.parse(
-            model=model, messages=messages, **kwargs
-        )
+        create = openai_async_client.beta.chat.completions.with_raw_response.parse
     else:
-        response = await openai_async_client.chat.completions.create(
-            model=model, messages=messages, **kwargs
-        )
+        create = openai_async_client.chat.completions.with_raw_response.create
+
+    async def make_call():
+        raw = await create(model=model, messages=messages, **kwargs)
+        return raw.headers, raw.parse()
+
+    _, response = await governor.call(
+        make_call,
+        estimate_chat_tokens(model, messages, kwargs.get("max_tokens")),
+        rate_limit_errors=(RateLimitError,),
+        transient_errors=(APIConnectionError, APITimeoutError),
+        headers_of=governor.openai_headers,
+        usage_of=governor.openai_usage,
+    )
 
     if hasattr(response, "__aiter__"):
 
@@ -131,7 +153,7 @@ async def azure_openai_complete_if_cache(
     if api_version:
         os.environ["AZURE_OPENAI_API_VERSION"] = api_version
 
-    openai_async_client = AsyncAzureOpenAI(
+    openai_async_client = get_azure_openai_client(
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
@@ -236,12 +258,13 @@ async def bedrock_complete_if_cache(
             )
 
     # Call model via Converse API
-    session = aioboto3.Session()
-    async with session.client("bedrock-runtime") as bedrock_async_client:
-        try:
-            response = await bedrock_async_client.converse(**args, **kwargs)
-        except Exception as e:
-            raise BedrockError(e)
+    bedrock_async_client = await get_bedrock_client(
+        "bedrock-runtime", os.environ.get("AWS_ACCESS_KEY_ID")
+    )
+    try:
+        response = await bedrock_async_client.converse(**args, **kwargs)
+    except Exception as e:
+        raise BedrockError(e)
 
     return response["output"]["message"]["content"][0]["text"]
 
@@ -881,37 +904,52 @@ async def zhipu_embedding(
 
 
 @wrap_embedding_func_with_attrs(embedding_dim=1536, max_token_size=8192)
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=60),
-    retry=retry_if_exception_type(
-        (RateLimitError, APIConnectionError, APITimeoutError)
-    ),
-)
 async def openai_embedding(
     texts: list[str],
     model: str = "text-embedding-3-small",
     base_url: str = None,
     api_key: str = None,
+    rate_limit: dict = None,
+    dimensions: int = None,
 ) -> np.ndarray:
+    """``dimensions`` asks text-embedding-3 models for shortened vectors."""
     if api_key:
         os.environ["OPENAI_API_KEY"] = api_key
 
-    openai_async_client = (
-        AsyncOpenAI() if base_url is None else AsyncOpenAI(base_url=base_url)
+    openai_async_client = get_openai_client(
+        base_url, api_key or os.environ.get("OPENAI_API_KEY"), max_retries=0
     )
-    response = await openai_async_client.embeddings.create(
-        model=model, input=texts, encoding_format="float"
+    governor = get_rate_governor(
+        model,
+        api_key or os.environ.get("OPENAI_API_KEY"),
+        base_url,
+        **(rate_limit or {}),
+    )
+    extra = {"dimensions": dimensions} if dimensions else {}
+
+    async def make_call():
+        raw = await openai_async_client.embeddings.with_raw_response.create(
+            model=model, input=texts, encoding_format="float", **extra
+        )
+        return raw.headers, raw.parse()
+
+    _, response = await governor.call(
+        make_call,
+        estimate_tokens(model, texts),
+        rate_limit_errors=(RateLimitError,),
+        transient_errors=(APIConnectionError, APITimeoutError),
+        headers_of=governor.openai_headers,
+        usage_of=governor.openai_usage,
     )
     return np.array([dp.embedding for dp in response.data])
 
 
 async def fetch_data(url, headers, data):
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=data) as response:
-            response_json = await response.json()
-            data_list = response_json.get("data", [])
-            return data_list
+    session = get_aiohttp_session(url)
+    async with session.post(url, headers=headers, json=data) as response:
+        response_json = await response.json()
+        data_list = response_json.get("data", [])
+        return data_list
 
 
 async def jina_embedding(
@@ -961,8 +999,8 @@ async def nvidia_openai_embedding(
     if api_key:
         os.environ["OPENAI_API_KEY"] = api_key
 
-    openai_async_client = (
-        AsyncOpenAI() if base_url is None else AsyncOpenAI(base_url=base_url)
+    openai_async_client = get_openai_client(
+        base_url, api_key or os.environ.get("OPENAI_API_KEY")
     )
     response = await openai_async_client.embeddings.create(
         model=model,
@@ -995,7 +1033,7 @@ async def azure_openai_embedding(
     if api_version:
         os.environ["AZURE_OPENAI_API_VERSION"] = api_version
 
-    openai_async_client = AsyncAzureOpenAI(
+    openai_async_client = get_azure_openai_client(
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
@@ -1031,12 +1069,12 @@ async def siliconcloud_embedding(
     payload = {"model": model, "input": truncate_texts, "encoding_format": "base64"}
 
     base64_strings = []
-    async with aiohttp.ClientSession() as session:
-        async with session.post(base_url, headers=headers, json=payload) as response:
-            content = await response.json()
-            if "code" in content:
-                raise ValueError(content)
-            base64_strings = [item["embedding"] for item in content["data"]]
+    session = get_aiohttp_session(base_url)
+    async with session.post(base_url, headers=headers, json=payload) as response:
+        content = await response.json()
+        if "code" in content:
+            raise ValueError(content)
+        base64_strings = [item["embedding"] for item in content["data"]]
 
     embeddings = []
     for string in base64_strings:
@@ -1070,53 +1108,54 @@ async def bedrock_embedding(
         "AWS_SESSION_TOKEN", aws_session_token
     )
 
-    session = aioboto3.Session()
-    async with session.client("bedrock-runtime") as bedrock_async_client:
-        if (model_provider := model.split(".")[0]) == "amazon":
-            embed_texts = []
-            for text in texts:
-                if "v2" in model:
-                    body = json.dumps(
-                        {
-                            "inputText": text,
-                            # 'dimensions': embedding_dim,
-                            "embeddingTypes": ["float"],
-                        }
-                    )
-                elif "v1" in model:
-                    body = json.dumps({"inputText": text})
-                else:
-                    raise ValueError(f"Model {model} is not supported!")
-
-                response = await bedrock_async_client.invoke_model(
-                    modelId=model,
-                    body=body,
-                    accept="application/json",
-                    contentType="application/json",
+    bedrock_async_client = await get_bedrock_client(
+        "bedrock-runtime", os.environ.get("AWS_ACCESS_KEY_ID")
+    )
+    if (model_provider := model.split(".")[0]) == "amazon":
+        embed_texts = []
+        for text in texts:
+            if "v2" in model:
+                body = json.dumps(
+                    {
+                        "inputText": text,
+                        # 'dimensions': embedding_dim,
+                        "embeddingTypes": ["float"],
+                    }
                 )
-
-                response_body = await response.get("body").json()
-
-                embed_texts.append(response_body["embedding"])
-        elif model_provider == "cohere":
-            body = json.dumps(
-                {"texts": texts, "input_type": "search_document", "truncate": "NONE"}
-            )
+            elif "v1" in model:
+                body = json.dumps({"inputText": text})
+            else:
+                raise ValueError(f"Model {model} is not supported!")
 
             response = await bedrock_async_client.invoke_model(
-                model=model,
+                modelId=model,
                 body=body,
                 accept="application/json",
                 contentType="application/json",
             )
 
-            response_body = json.loads(response.get("body").read())
+            response_body = await response.get("body").json()
 
-            embed_texts = response_body["embeddings"]
-        else:
-            raise ValueError(f"Model provider '{model_provider}' is not supported!")
+            embed_texts.append(response_body["embedding"])
+    elif model_provider == "cohere":
+        body = json.dumps(
+            {"texts": texts, "input_type": "search_document", "truncate": "NONE"}
+        )
+
+        response = await bedrock_async_client.invoke_model(
+            model=model,
+            body=body,
+            accept="application/json",
+            contentType="application/json",
+        )
+
+        response_body = json.loads(response.get("body").read())
 
-        return np.array(embed_texts)
+        embed_texts = response_body["embeddings"]
+    else:
+        raise ValueError(f"Model provider '{model_provider}' is not supported!")
+
+    return np.array(embed_texts)
 
 
 async def hf_embedding(texts: list[str], tokenizer, embed_model) -> np.ndarray:
@@ -1211,6 +1250,17 @@ class Model(BaseModel):
         arbitrary_types_allowed = True
 
 
+class _ModelHealth:
+    def __init__(self):
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+
 class MultiModel:
     """
     Distributes the load across multiple language models. Useful for circumventing low rate limits with certain api providers especially if you are on the free tier.
@@ -1234,32 +1284,191 @@ class MultiModel:
             / ..other args
             )
         ```
+
+    Routing strategies:
+        round_robin: rotate through healthy models.
+        least_outstanding: the model with the fewest in-flight calls.
+        ewma_latency: random pick weighted by 1 / (EWMA latency * (in-flight + 1)).
+        quota_aware: the model whose rate governor has the most token quota left.
+
+    A model that fails ``eject_after`` times in a row with a rate-limit, 5xx,
+    connection or timeout error is ejected for ``eject_seconds`` (doubling on
+    repeated ejections) and the call fails over to the next healthy model.
+    Under every strategy, a model whose rate governor is paused by a 429 is
+    skipped while any other model is usable (a soft ejection that ends with
+    the pause), since its governor retries 429s itself and would otherwise
+    hold each routed call until the pause is over.
     """
 
-    def __init__(self, models: List[Model]):
+    STRATEGIES = ("round_robin", "least_outstanding", "ewma_latency", "quota_aware")
+
+    def __init__(
+        self,
+        models: List[Model],
+        strategy: str = "round_robin",
+        ewma_alpha: float = 0.3,
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 600.0,
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown MultiModel strategy {strategy}")
         self._models = models
         self._current_model = 0
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._health = [_ModelHealth() for _ in models]
 
     def _next_model(self):
         self._current_model = (self._current_model + 1) % len(self._models)
         return self._models[self._current_model]
 
+    def _governor(self, model: Model):
+        return get_rate_governor(
+            model.kwargs.get("model"),
+            model.kwargs.get("api_key") or os.environ.get("OPENAI_API_KEY"),
+            model.kwargs.get("base_url"),
+            **(model.kwargs.get("rate_limit") or {}),
+        )
+
+    def _quota_left(self, model: Model) -> float:
+        return self._governor(model).quota_left()
+
+    def _pick(self, exclude: set) -> int:
+        now = time.monotonic()
+        candidates = [
+            i
+            for i in range(len(self._models))
+            if i not in exclude and self._health[i].ejected_until <= now
+        ]
+        if not candidates:
+            # every model is ejected: use the one that comes back first
+            candidates = [
+                min(
+                    (i for i in range(len(self._models)) if i not in exclude),
+                    key=lambda i: self._health[i].ejected_until,
+                )
+            ]
+        unpaused = [i for i in candidates if self._quota_left(self._models[i]) >= 0]
+        if unpaused:
+            candidates = unpaused
+        if self.strategy == "round_robin":
+            for _ in range(len(self._models)):
+                self._next_model()
+                if self._current_model in candidates:
+                    return self._current_model
+            return candidates[0]
+        if self.strategy == "least_outstanding":
+            return min(candidates, key=lambda i: self._health[i].outstanding)
+        if self.strategy == "ewma_latency":
+            # models without samples get the best observed latency so they are tried
+            known = [h.ewma_latency for h in self._health if h.ewma_latency]
+            default = min(known) if known else 1.0
+            weights = [
+                1.0
+                / (
+                    (self._health[i].ewma_latency or default)
+                    * (self._health[i].outstanding + 1)
+                )
+                for i in candidates
+            ]
+            return random.choices(candidates, weights=weights)[0]
+        return max(
+            candidates,
+            key=lambda i: (
+                self._quota_left(self._models[i]),
+                -self._health[i].outstanding,
+            ),
+        )
+
+    @staticmethod
+    def _is_backend_failure(error: Exception) -> bool:
+        if isinstance(
+            error,
+            (RateLimitError, APIConnectionError, APITimeoutError, CircuitOpenError),
+        ):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code >= 500
+
+    def _record(self, index: int, started: float, error: Exception = None):
+        health = self._health[index]
+        if error is None:
+            latency = time.monotonic() - started
+            health.ewma_latency = (
+                latency
+                if health.ewma_latency is None
+                else self.ewma_alpha * latency
+                + (1 - self.ewma_alpha) * health.ewma_latency
+            )
+            health.consecutive_failures = 0
+            health.ejections = 0
+            health.calls += 1
+            return
+        health.failures += 1
+        health.consecutive_failures += 1
+        if health.consecutive_failures >= self.eject_after:
+            duration = min(
+                self.max_eject_seconds, self.eject_seconds * 2**health.ejections
+            )
+            health.ejected_until = time.monotonic() + duration
+            health.ejections += 1
+            health.consecutive_failures = 0
+            logger.warning(
+                f"MultiModel: ejecting {self._models[index].kwargs.get('model')} "
+                f"#{index} for {duration:.0f}s after repeated {type(error).__name__}"
+            )
+
     async def llm_model_func(
         self, prompt, system_prompt=None, history_messages=[], **kwargs
     ) -> str:
         kwargs.pop("model", None)  # stop from overwriting the custom model name
         kwargs.pop("keyword_extraction", None)
         kwargs.pop("mode", None)
-        next_model = self._next_model()
-        args = dict(
-            prompt=prompt,
-            system_prompt=system_prompt,
-            history_messages=history_messages,
-            **kwargs,
-            **next_model.kwargs,
-        )
-
-        return await next_model.gen_func(**args)
+        tried = set()
+        while True:
+            index = self._pick(tried)
+            tried.add(index)
+            next_model = self._models[index]
+            args = dict(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+                **kwargs,
+                **next_model.kwargs,
+            )
+            self._health[index].outstanding += 1
+            started = time.monotonic()
+            try:
+                result = await next_model.gen_func(**args)
+            except Exception as e:
+                if not self._is_backend_failure(e):
+                    raise
+                self._record(index, started, e)
+                if len(tried) == len(self._models):
+                    raise
+                continue
+            finally:
+                # also on cancellation, which is not an Exception
+                self._health[index].outstanding -= 1
+            self._record(index, started)
+            return result
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "model": model.kwargs.get("model"),
+                "outstanding": health.outstanding,
+                "ewma_latency": health.ewma_latency,
+                "calls": health.calls,
+                "failures": health.failures,
+                "ejected_for": max(0.0, health.ejected_until - now),
+            }
+            for model, health in zip(self._models, self._health)
+        ]
 
 
 if __name__ == "__main__":
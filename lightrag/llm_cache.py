@@ -0,0 +1,394 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+import numpy as np
+
+from .base import BaseKVStorage
+from .utils import dequantize_embedding, logger
+
+
+class SemanticCacheIndex:
+    """Cached question embeddings of one mode, kept as their stored uint8 codes.
+
+    Each row keeps the record's 8-bit codes with its min/scale and the norm
+    of the decoded vector, so memory is a quarter of a float32 matrix and
+    nothing is decoded up front. A lookup scores every row by exact cosine
+    similarity straight from the codes in one matrix-vector product. Rows
+    grow in amortised O(1) (capacity doubles); deleted rows are reused by
+    appends.
+
+    ``projection_dim`` opts into an approximate prefilter: every row is
+    first scored on a random projection of that many dimensions and only
+    the ``shortlist`` best are ranked exactly. Real question embeddings are
+    far from isotropic, so this can miss the true best match; measure its
+    recall on your own embeddings before turning it on.
+    """
+
+    block_rows = 2048
+
+    def __init__(
+        self,
+        projection_dim: Optional[int] = None,
+        shortlist: int = 64,
+        seed: int = 0,
+    ):
+        self.projection_dim = projection_dim
+        self.shortlist = shortlist
+        self._rng = np.random.default_rng(seed)
+        self._projection: np.ndarray = None
+        self._codes: np.ndarray = None
+        self._min = np.zeros(0, dtype=np.float32)
+        self._scale = np.zeros(0, dtype=np.float32)
+        self._norm = np.zeros(0, dtype=np.float32)
+        self._coarse: np.ndarray = None
+        self._keys: list = []
+        self._rows: dict[str, int] = {}
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _allocate(self, dim: int):
+        self._codes = np.zeros((16, dim), dtype=np.uint8)
+        if self.projection_dim:
+            self._projection = (
+                self._rng.standard_normal((dim, self.projection_dim))
+                / np.sqrt(self.projection_dim)
+            ).astype(np.float32)
+            self._coarse = np.zeros((16, self.projection_dim), dtype=np.float32)
+        self._min = np.zeros(16, dtype=np.float32)
+        self._scale = np.zeros(16, dtype=np.float32)
+        self._norm = np.zeros(16, dtype=np.float32)
+
+    def _grow(self):
+        size = 2 * len(self._min)
+        for name in ("_codes", "_coarse", "_min", "_scale", "_norm"):
+            old = getattr(self, name)
+            if old is None:
+                continue
+            new = np.zeros((size,) + old.shape[1:], dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, key: str, codes: np.ndarray, min_val: float, max_val: float):
+        """Index a record's 8-bit codes (as written by ``quantize_embedding``)."""
+        codes = np.asarray(codes, dtype=np.uint8).ravel()
+        if self._codes is None:
+            self._allocate(codes.shape[0])
+        if key in self._rows:
+            row = self._rows[key]
+        elif self._free:
+            row = self._free.pop()
+            self._keys[row] = key
+        else:
+            row = len(self._keys)
+            if row == len(self._min):
+                self._grow()
+            self._keys.append(key)
+        scale = (max_val - min_val) / 255
+        vector = dequantize_embedding(codes, min_val, max_val)
+        norm = np.linalg.norm(vector)
+        self._codes[row] = codes
+        self._min[row] = min_val
+        self._scale[row] = scale
+        self._norm[row] = norm if norm > 0 else 1.0
+        if self._coarse is not None:
+            self._coarse[row] = (vector / self._norm[row]) @ self._projection
+        self._rows[key] = row
+
+    def remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        if self._coarse is not None:
+            self._coarse[row] = 0
+        self._keys[row] = None
+        self._free.append(row)
+
+    def search(self, embedding: np.ndarray) -> tuple[Union[str, None], float]:
+        """Return (key, cosine similarity) of the closest cached question."""
+        if not self._rows:
+            return None, -1.0
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        n = len(self._keys)
+        if self._coarse is not None and len(self._rows) > self.shortlist:
+            coarse = self._coarse[:n] @ (query @ self._projection)
+            if self._free:
+                coarse[self._free] = -np.inf
+            candidates = np.argpartition(-coarse, self.shortlist)[: self.shortlist]
+            dots = self._codes[candidates] @ query
+        else:
+            candidates = np.arange(n)
+            dots = np.empty(n, dtype=np.float32)
+            # widen the codes a block at a time instead of all n rows at once
+            for start in range(0, n, self.block_rows):
+                block = self._codes[start : min(start + self.block_rows, n)]
+                dots[start : start + len(block)] = block.astype(np.float32) @ query
+        # x = codes * scale + min, so x.q = scale * (codes.q) + min * sum(q)
+        similarities = (
+            self._scale[candidates] * dots + self._min[candidates] * query.sum()
+        ) / self._norm[candidates]
+        if self._free and len(candidates) == n:
+            similarities[self._free] = -np.inf
+        best = int(np.argmax(similarities))
+        row = int(candidates[best])
+        return self._keys[row], float(similarities[best])
+
+
+class LLMResponseCache:
+    """Query-answer cache with one record per (mode, args_hash).
+
+    Each cached response is its own record in the backing KV storage, keyed
+    ``{mode}:{args_hash}``, so a lookup or insert touches one record instead
+    of reading and rewriting the whole per-mode dict. Recency order and
+    record sizes are tracked in memory and rebuilt from the backing store on
+    first use; legacy per-mode records are split into entries at that point.
+
+    Eviction (all optional, None = unbounded):
+        max_entries: keep at most this many entries, least recently used first out.
+        max_bytes: keep the JSON-encoded size of all entries under this.
+        ttl_seconds: entries older than this are treated as misses and dropped.
+
+    The backing storage must implement ``delete``.
+    """
+
+    def __init__(
+        self,
+        kv: BaseKVStorage,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        if type(kv).delete is BaseKVStorage.delete:
+            raise ValueError(
+                f"{type(kv).__name__} does not implement delete, which the LLM "
+                "response cache needs to replace and evict entries"
+            )
+        self.kv = kv
+        self.namespace = kv.namespace
+        self.global_config = kv.global_config
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (mode, size in bytes, created_at), least recently used first
+        self._index: OrderedDict[str, tuple] = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        # True when the index lists every stored key, so misses skip the backend
+        self._complete = False
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # mode -> semantic index, built on the first similarity lookup
+        self._semantic: dict[str, SemanticCacheIndex] = {}
+
+    @staticmethod
+    def make_key(mode: str, args_hash: str) -> str:
+        return f"{mode}:{args_hash}"
+
+    def _expired(self, created_at: Optional[float], now: float = None) -> bool:
+        # backends that do not keep created_at never expire entries
+        if not self.ttl_seconds or created_at is None:
+            return False
+        return (now or time.time()) - created_at > self.ttl_seconds
+
+    def _track(self, key: str, record: dict):
+        if key in self._index:
+            self._index.move_to_end(key)
+            return
+        size = len(json.dumps(record, default=str))
+        self._index[key] = (record["mode"], size, record.get("created_at"))
+        self._bytes += size
+
+    async def _drop(self, keys: list[str], evicted: bool = True):
+        for key in keys:
+            meta = self._index.pop(key, None)
+            if meta is not None:
+                self._bytes -= meta[1]
+                self._forget_semantic(key, meta[0])
+        if evicted:
+            self.evictions += len(keys)
+        if keys:
+            await self.kv.delete(keys)
+
+    async def _ensure_index(self):
+        if self._loaded:
+            return
+        async with self._lock:
+            if self._loaded:
+                return
+            try:
+                keys = await self.kv.all_keys()
+                self._complete = True
+            except NotImplementedError:
+                # backend cannot list keys; the index fills in as entries are used
+                keys = []
+            records = await self.kv.get_by_ids(keys) if keys else []
+            entries, legacy = [], []
+            for key, record in zip(keys, records or []):
+                if not record:
+                    continue
+                if "return" in record:
+                    entries.append((key, record))
+                else:
+                    legacy.append(key)
+                    now = time.time()
+                    entries.extend(
+                        (
+                            self.make_key(key, args_hash),
+                            {**entry, "mode": key, "created_at": now},
+                        )
+                        for args_hash, entry in record.items()
+                        if isinstance(entry, dict) and "return" in entry
+                    )
+            if legacy:
+                await self.kv.upsert(
+                    {k: r for k, r in entries if k.split(":", 1)[0] in legacy}
+                )
+                await self.kv.delete(legacy)
+                logger.info(
+                    f"Split legacy {self.namespace} modes {legacy} into per-entry records"
+                )
+            entries.sort(key=lambda e: e[1].get("created_at") or 0)
+            for key, record in entries:
+                record.setdefault("mode", key.split(":", 1)[0])
+                self._track(key, record)
+            self._loaded = True
+        await self._evict()
+
+    async def _evict(self):
+        victims = []
+        if self.ttl_seconds:
+            now = time.time()
+            victims = [
+                key for key, meta in self._index.items() if self._expired(meta[2], now)
+            ]
+            for key in victims:
+                meta = self._index.pop(key)
+                self._bytes -= meta[1]
+                self._forget_semantic(key, meta[0])
+        while self._index and (
+            (self.max_entries is not None and len(self._index) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key, meta = self._index.popitem(last=False)
+            self._bytes -= meta[1]
+            self._forget_semantic(key, meta[0])
+            victims.append(key)
+        if victims:
+            self.evictions += len(victims)
+            await self.kv.delete(victims)
+
+    async def get(self, mode: str, args_hash: str) -> Union[dict, None]:
+        await self._ensure_index()
+        key = self.make_key(mode, args_hash)
+        meta = self._index.get(key)
+        # answer misses and expired entries from the index alone
+        if meta is None and self._complete:
+            self.note_lookup(False)
+            return None
+        if meta is not None and self._expired(meta[2]):
+            await self._drop([key])
+            self.note_lookup(False)
+            return None
+        record = await self.kv.get_by_id(key)
+        if record is not None and self._expired(record.get("created_at")):
+            await self._drop([key])
+            record = None
+        self.note_lookup(record is not None)
+        if record is None:
+            return None
+        self._track(key, record)
+        return record
+
+    async def put(self, mode: str, args_hash: str, record: dict):
+        await self._ensure_index()
+        key = self.make_key(mode, args_hash)
+        record = {**record, "mode": mode, "created_at": time.time()}
+        if key in self._index:
+            # replace rather than let upsert keep the stale value
+            await self._drop([key], evicted=False)
+        await self.kv.upsert({key: record})
+        self._track(key, record)
+        if mode in self._semantic and record.get("embedding") is not None:
+            self._semantic[mode].add(key, *self._embedding_codes(record))
+        await self._evict()
+
+    async def entries(self, mode: str) -> list[tuple[str, dict]]:
+        """All live entries of one mode (used by the similarity cache)."""
+        await self._ensure_index()
+        keys = [key for key, meta in self._index.items() if meta[0] == mode]
+        if not keys:
+            return []
+        records = await self.kv.get_by_ids(keys)
+        return [
+            (key, record)
+            for key, record in zip(keys, records or [])
+            if record is not None and not self._expired(record.get("created_at"))
+        ]
+
+    @staticmethod
+    def _embedding_codes(record: dict) -> tuple[np.ndarray, float, float]:
+        quantized = np.frombuffer(
+            bytes.fromhex(record["embedding"]), dtype=np.uint8
+        ).reshape(record["embedding_shape"])
+        return quantized, record["embedding_min"], record["embedding_max"]
+
+    def _forget_semantic(self, key: str, mode: str):
+        if mode in self._semantic:
+            self._semantic[mode].remove(key)
+
+    async def best_match(
+        self, mode: str, embedding: np.ndarray
+    ) -> tuple[Union[str, None], float, Union[dict, None]]:
+        """Closest cached question of ``mode`` as (key, similarity, record)."""
+        if mode not in self._semantic:
+            index = SemanticCacheIndex()
+            for key, record in await self.entries(mode):
+                if record.get("embedding") is not None:
+                    index.add(key, *self._embedding_codes(record))
+            self._semantic[mode] = index
+        key, similarity = self._semantic[mode].search(embedding)
+        if key is None:
+            return None, similarity, None
+        record = await self.kv.get_by_id(key)
+        if record is None or self._expired(record.get("created_at")):
+            return None, similarity, None
+        self._track(key, record)
+        return key, similarity, record
+
+    def note_lookup(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._index),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    async def drop(self):
+        await self.kv.drop()
+        self._index.clear()
+        self._semantic.clear()
+        self._bytes = 0
+
+    async def index_done_callback(self):
+        if self._loaded:
+            await self._evict()
+        await self.kv.index_done_callback()
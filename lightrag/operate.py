@@ -22,6 +22,7 @@ from .utils import (
     handle_cache,
     save_to_cache,
     CacheData,
+    call_lane,
 )
 from .base import (
     BaseGraphStorage,
@@ -83,7 +84,8 @@ async def _handle_entity_relation_summary(
     )
     use_prompt = prompt_template.format(**context_base)
     logger.debug(f"Trigger summary: {entity_or_relation_name}")
-    summary = await use_llm_func(use_prompt, max_tokens=summary_max_tokens)
+    with call_lane("summary"):
+        summary = await use_llm_func(use_prompt, max_tokens=summary_max_tokens)
     return summary
 
 
@@ -135,18 +137,18 @@ async def _handle_single_relationship_extraction(
     )
 
 
-async def _merge_nodes_then_upsert(
+async def _merge_nodes(
     entity_name: str,
     nodes_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_node: Union[dict, None],
     global_config: dict,
 ):
+    """Merge freshly extracted node records with the stored node, if any."""
     already_entity_types = []
     already_source_ids = []
     already_description = []
     already_subgraphs = []
 
-    already_node = await knowledge_graph_inst.get_node(entity_name)
     if already_node is not None:
         already_entity_types.append(already_node["entity_type"])
         already_source_ids.extend(
@@ -182,29 +184,28 @@ async def _merge_nodes_then_upsert(
         source_id=source_id,
         subgraphs=subgraphs
     )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
-    )
-    node_data["entity_name"] = entity_name
-    return node_data
+    return entity_name, node_data
 
 
-async def _merge_edges_then_upsert(
+async def _merge_edges(
     src_id: str,
     tgt_id: str,
     edges_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_edge: Union[dict, None],
     global_config: dict,
 ):
+    """Merge freshly extracted edge records with the stored edge, if any.
+
+    Also returns the data used for a placeholder endpoint node when one of
+    the endpoints does not exist in the graph yet.
+    """
     already_weights = []
     already_source_ids = []
     already_description = []
     already_keywords = []
     already_subgraphs = []
 
-    if await knowledge_graph_inst.has_edge(src_id, tgt_id):
-        already_edge = await knowledge_graph_inst.get_edge(src_id, tgt_id)
+    if already_edge is not None:
         already_weights.append(already_edge["weight"])
         already_source_ids.extend(
             split_string_by_multi_markers(already_edge["source_id"], [GRAPH_FIELD_SEP])
@@ -230,41 +231,23 @@ async def _merge_edges_then_upsert(
     subgraphs = SUBGRAPH_SEP.join(
         set([sg for dp in edges_data for sg in dp["subgraphs"]] + already_subgraphs)
     )
-    for need_insert_id in [src_id, tgt_id]:
-        if not (await knowledge_graph_inst.has_node(need_insert_id)):
-            await knowledge_graph_inst.upsert_node(
-                need_insert_id,
-                node_data={
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                    "subgraphs": subgraphs,
-                },
-            )
+    placeholder_node = {
+        "source_id": source_id,
+        "description": description,
+        "entity_type": "UNKNOWN",
+        "subgraphs": subgraphs,
+    }
     description = await _handle_entity_relation_summary(
         f"({src_id}, {tgt_id})", description, global_config
     )
-    await knowledge_graph_inst.upsert_edge(
-        src_id,
-        tgt_id,
-        edge_data=dict(
-            weight=weight,
-            description=description,
-            keywords=keywords,
-            source_id=source_id,
-            subgraphs=subgraphs,
-        ),
-    )
-
     edge_data = dict(
-        src_id=src_id,
-        tgt_id=tgt_id,
+        weight=weight,
         description=description,
         keywords=keywords,
+        source_id=source_id,
         subgraphs=subgraphs,
     )
-
-    return edge_data
+    return src_id, tgt_id, edge_data, placeholder_node
 
 
 async def extract_entities(
@@ -274,6 +257,26 @@ async def extract_entities(
     relationships_vdb: BaseVectorStorage,
     global_config: dict,
 ) -> Union[BaseGraphStorage, None]:
+    maybe_nodes, maybe_edges = await extract_chunk_records(chunks, global_config)
+    return await merge_extracted_records(
+        maybe_nodes,
+        maybe_edges,
+        knowledge_graph_inst,
+        entity_vdb,
+        relationships_vdb,
+        global_config,
+    )
+
+
+async def extract_chunk_records(
+    chunks: dict[str, TextChunkSchema],
+    global_config: dict,
+) -> tuple[dict, dict]:
+    """Run LLM extraction (with gleaning) over chunks without touching storage.
+
+    Returns:
+        (maybe_nodes, maybe_edges) keyed by entity name and sorted (src, tgt).
+    """
     use_llm_func: callable = global_config["llm_model_func"]
     entity_extract_max_gleaning = global_config["entity_extract_max_gleaning"]
 
@@ -333,19 +336,24 @@ async def extract_entities(
             **context_base, input_text="{input_text}"
         ).format(**context_base, input_text=content)
 
-        final_result = await use_llm_func(hint_prompt)
+        with call_lane("extraction"):
+            final_result = await use_llm_func(hint_prompt)
         history = pack_user_ass_to_openai_messages(hint_prompt, final_result)
         for now_glean_index in range(entity_extract_max_gleaning):
-            glean_result = await use_llm_func(continue_prompt, history_messages=history)
+            with call_lane("gleaning"):
+                glean_result = await use_llm_func(
+                    continue_prompt, history_messages=history
+                )
 
             history += pack_user_ass_to_openai_messages(continue_prompt, glean_result)
             final_result += glean_result
             if now_glean_index == entity_extract_max_gleaning - 1:
                 break
 
-            if_loop_result: str = await use_llm_func(
-                if_loop_prompt, history_messages=history
-            )
+            with call_lane("gleaning"):
+                if_loop_result: str = await use_llm_func(
+                    if_loop_prompt, history_messages=history
+                )
             if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
             if if_loop_result != "yes":
                 break
@@ -412,37 +420,85 @@ async def extract_entities(
             maybe_nodes[k].extend(v)
         for k, v in m_edges.items():
             maybe_edges[tuple(sorted(k))].extend(v)
+    return dict(maybe_nodes), dict(maybe_edges)
+
+
+async def merge_extracted_records(
+    maybe_nodes: dict,
+    maybe_edges: dict,
+    knowledge_graph_inst: BaseGraphStorage,
+    entity_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    global_config: dict,
+) -> Union[BaseGraphStorage, None]:
+    """Merge extracted nodes/edges into the graph and upsert their vectors."""
     logger.info("Inserting entities into storage...")
-    all_entities_data = []
+    entity_names = list(maybe_nodes.keys())
+    already_nodes = await knowledge_graph_inst.get_nodes(entity_names)
+    merged_nodes = []
     for result in tqdm_async(
         asyncio.as_completed(
             [
-                _merge_nodes_then_upsert(k, v, knowledge_graph_inst, global_config)
-                for k, v in maybe_nodes.items()
+                _merge_nodes(k, maybe_nodes[k], already_node, global_config)
+                for k, already_node in zip(entity_names, already_nodes)
             ]
         ),
         total=len(maybe_nodes),
         desc="Inserting entities",
         unit="entity",
     ):
-        all_entities_data.append(await result)
+        merged_nodes.append(await result)
+    await knowledge_graph_inst.upsert_nodes(merged_nodes)
+    all_entities_data = [
+        {**node_data, "entity_name": entity_name}
+        for entity_name, node_data in merged_nodes
+    ]
 
     logger.info("Inserting relationships into storage...")
-    all_relationships_data = []
+    edge_pairs = list(maybe_edges.keys())
+    already_edges = await knowledge_graph_inst.get_edges(edge_pairs)
+    merged_edges = []
     for result in tqdm_async(
         asyncio.as_completed(
             [
-                _merge_edges_then_upsert(
-                    k[0], k[1], v, knowledge_graph_inst, global_config
-                )
-                for k, v in maybe_edges.items()
+                _merge_edges(k[0], k[1], maybe_edges[k], already_edge, global_config)
+                for k, already_edge in zip(edge_pairs, already_edges)
             ]
         ),
         total=len(maybe_edges),
         desc="Inserting relationships",
         unit="relationship",
     ):
-        all_relationships_data.append(await result)
+        merged_edges.append(await result)
+
+    # endpoints that were neither extracted nor stored get a placeholder node
+    placeholders = {}
+    for src_id, tgt_id, _, placeholder_node in merged_edges:
+        for node_id in (src_id, tgt_id):
+            if node_id not in maybe_nodes:
+                placeholders.setdefault(node_id, placeholder_node)
+    if placeholders:
+        stored = await knowledge_graph_inst.get_nodes(list(placeholders))
+        await knowledge_graph_inst.upsert_nodes(
+            [
+                (node_id, node_data)
+                for (node_id, node_data), node in zip(placeholders.items(), stored)
+                if node is None
+            ]
+        )
+    await knowledge_graph_inst.upsert_edges(
+        [(src_id, tgt_id, edge_data) for src_id, tgt_id, edge_data, _ in merged_edges]
+    )
+    all_relationships_data = [
+        dict(
+            src_id=src_id,
+            tgt_id=tgt_id,
+            description=edge_data["description"],
+            keywords=edge_data["keywords"],
+            subgraphs=edge_data["subgraphs"],
+        )
+        for src_id, tgt_id, edge_data, _ in merged_edges
+    ]
 
     if not len(all_entities_data) and not len(all_relationships_data):
         logger.warning(
@@ -524,7 +580,8 @@ async def kg_query(
     # LLM generate keywords
     kw_prompt_temp = PROMPTS["keywords_extraction"]
     kw_prompt = kw_prompt_temp.format(query=query, examples=examples, language=language)
-    result = await use_model_func(kw_prompt, keyword_extraction=True)
+    with call_lane("query_keywords"):
+        result = await use_model_func(kw_prompt, keyword_extraction=True)
     logger.info("kw_prompt result:")
     print(result)
     try:
@@ -740,37 +797,39 @@ async def _get_node_data(
     query_param: QueryParam,
 ):
     # get similar entities
-    results = await asyncio.gather(
-    *[entities_vdb.query(kw, top_k=query_param.top_k // len(keywords)) for kw in keywords]
+    results = await entities_vdb.query_batch(
+        keywords, top_k=query_param.top_k // len(keywords)
     )
     results = [r for res in results for r in res]
-    results = sorted(results, key=lambda x: x['distance'].item(), reverse=True)
+    results = sorted(results, key=lambda x: float(x["distance"]), reverse=True)
     # results = await entities_vdb.query(query, top_k=query_param.top_k)
     if not len(results):
         return "", "", ""
-    # get entity information
-    node_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(r["entity_name"]) for r in results]
+    # get entity information and degree
+    entity_names = [r["entity_name"] for r in results]
+    node_datas, node_degrees = await asyncio.gather(
+        knowledge_graph_inst.get_nodes(entity_names),
+        knowledge_graph_inst.node_degrees(entity_names),
     )
     if not all([n is not None for n in node_datas]):
         logger.warning("Some nodes are missing, maybe the storage is damaged")
 
-    # get entity degree
-    node_degrees = await asyncio.gather(
-        *[knowledge_graph_inst.node_degree(r["entity_name"]) for r in results]
-    )
     node_datas = [
         {**n, "entity_name": k["entity_name"], "rank": d}
         for k, n, d in zip(results, node_datas, node_degrees)
         if n is not None
     ]  # what is this text_chunks_db doing.  dont remember it in airvx.  check the diagram.
+    # expand the one-hop neighbourhood once for both text units and relations
+    neighbourhood = await knowledge_graph_inst.get_neighbourhood(
+        [dp["entity_name"] for dp in node_datas]
+    )
     # get entitytext chunk
     use_text_units = await _find_most_related_text_unit_from_entities(
-        node_datas, query_param, text_chunks_db, knowledge_graph_inst
+        node_datas, query_param, text_chunks_db, neighbourhood
     )
     # get relate edges
     use_relations = await _find_most_related_edges_from_entities(
-        node_datas, query_param, knowledge_graph_inst
+        node_datas, query_param, neighbourhood
     )
     references = {
         "entities": [chunk["full_doc_id"] for chunk in use_text_units]
@@ -836,30 +895,18 @@ async def _find_most_related_text_unit_from_entities(
     node_datas: list[dict],
     query_param: QueryParam,
     text_chunks_db: BaseKVStorage[TextChunkSchema],
-    knowledge_graph_inst: BaseGraphStorage,
+    neighbourhood: dict,
 ):
     text_units = [
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in node_datas
     ]
-    edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
-    )
-    all_one_hop_nodes = set()
-    for this_edges in edges:
-        if not this_edges:
-            continue
-        all_one_hop_nodes.update([e[1] for e in this_edges])
-
-    all_one_hop_nodes = list(all_one_hop_nodes)
-    all_one_hop_nodes_data = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(e) for e in all_one_hop_nodes]
-    )
+    edges = neighbourhood["edges"]
 
     # Add null check for node data
     all_one_hop_text_units_lookup = {
         k: set(split_string_by_multi_markers(v["source_id"], [GRAPH_FIELD_SEP]))
-        for k, v in zip(all_one_hop_nodes, all_one_hop_nodes_data)
+        for k, v in neighbourhood["nodes"].items()
         if v is not None and "source_id" in v  # Add source_id check
     }
 
@@ -911,31 +958,26 @@ async def _find_most_related_text_unit_from_entities(
 async def _find_most_related_edges_from_entities(
     node_datas: list[dict],
     query_param: QueryParam,
-    knowledge_graph_inst: BaseGraphStorage,
+    neighbourhood: dict,
 ):
-    all_related_edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
-    )
     all_edges = []
     seen = set()
 
-    for this_edges in all_related_edges:
-        for e in this_edges:
+    for this_edges in neighbourhood["edges"]:
+        for e in this_edges or []:
             sorted_edge = tuple(sorted(e))
             if sorted_edge not in seen:
                 seen.add(sorted_edge)
                 all_edges.append(sorted_edge)
 
-    all_edges_pack = await asyncio.gather(
-        *[knowledge_graph_inst.get_edge(e[0], e[1]) for e in all_edges]
-    )
-    all_edges_degree = await asyncio.gather(
-        *[knowledge_graph_inst.edge_degree(e[0], e[1]) for e in all_edges]
-    )
     all_edges_data = [
-        {"src_tgt": k, "rank": d, **v}
-        for k, v, d in zip(all_edges, all_edges_pack, all_edges_degree)
-        if v is not None
+        {
+            "src_tgt": k,
+            "rank": neighbourhood["edge_degree"].get(k, 0),
+            **neighbourhood["edge_data"][k],
+        }
+        for k in all_edges
+        if neighbourhood["edge_data"].get(k) is not None
     ]
     all_edges_data = sorted(
         all_edges_data, key=lambda x: (x["rank"], x["weight"]), reverse=True
@@ -956,25 +998,24 @@ async def _get_edge_data(
     query_param: QueryParam,
 ):
     
-    results = await asyncio.gather(
-    *[relationships_vdb.query(kw, top_k=query_param.top_k // len(keywords)) for kw in keywords]
+    results = await relationships_vdb.query_batch(
+        keywords, top_k=query_param.top_k // len(keywords)
     )
     results = [r for res in results for r in res]
-    results = sorted(results, key=lambda x: x['distance'].item(), reverse=True)
+    results = sorted(results, key=lambda x: float(x["distance"]), reverse=True)
     # results = await relationships_vdb.query(keywords, top_k=query_param.top_k)
 
     if not len(results):
         return "", "", "", {}
 
-    edge_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_edge(r["src_id"], r["tgt_id"]) for r in results]
+    edge_pairs = [(r["src_id"], r["tgt_id"]) for r in results]
+    edge_datas, edge_degree = await asyncio.gather(
+        knowledge_graph_inst.get_edges(edge_pairs),
+        knowledge_graph_inst.edge_degrees(edge_pairs),
     )
 
     if not all([n is not None for n in edge_datas]):
         logger.warning("Some edges are missing, maybe the storage is damaged")
-    edge_degree = await asyncio.gather(
-        *[knowledge_graph_inst.edge_degree(r["src_id"], r["tgt_id"]) for r in results]
-    )
     edge_datas = [
         {
             "src_id": k["src_id"],
@@ -1075,12 +1116,9 @@ async def _find_most_related_entities_from_relationships(
             entity_names.append(e["tgt_id"])
             seen.add(e["tgt_id"])
 
-    node_datas = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(entity_name) for entity_name in entity_names]
-    )
-
-    node_degrees = await asyncio.gather(
-        *[knowledge_graph_inst.node_degree(entity_name) for entity_name in entity_names]
+    node_datas, node_degrees = await asyncio.gather(
+        knowledge_graph_inst.get_nodes(entity_names),
+        knowledge_graph_inst.node_degrees(entity_names),
     )
     node_datas = [
         {**n, "entity_name": k, "rank": d}
@@ -1306,7 +1344,8 @@ async def mix_kg_vector_query(
             # LLM generate keywords
             kw_prompt_temp = PROMPTS["keywords_extraction"]
             kw_prompt = kw_prompt_temp.format(query=query, examples=examples, language=language)
-            result = await use_model_func(kw_prompt, keyword_extraction=True)
+            with call_lane("query_keywords"):
+                result = await use_model_func(kw_prompt, keyword_extraction=True)
             logger.info("kw_prompt result:")
             print(result)
             match = re.search(r"\{.*\}", result, re.DOTALL)
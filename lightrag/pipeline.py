@@ -0,0 +1,267 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from .base import DocStatus
+from .chunks import iter_chunks_bulk
+from .operate import extract_chunk_records, merge_extracted_records
+from .utils import logger
+
+_STOP = object()
+
+# Default worker count per stage. Extraction dominates wall time, so it gets
+# the most workers; merge runs single-writer to avoid read-modify-write races
+# on shared entities and edges.
+DEFAULT_STAGE_CONCURRENCY = {
+    "embed": 2,
+    "extract": 10,
+    "merge": 1,
+    "persist": 1,
+}
+
+
+class FlushScheduler:
+    """Group-commit policy for local storages.
+
+    Instead of rewriting every store after each document, finished documents
+    are counted and ``flush_fn`` runs once ``every_docs`` have completed, once
+    ``interval`` seconds have passed with unflushed work, or on ``close()``.
+    Storages track their own dirty state, so a flush only rewrites the
+    namespaces that actually changed.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[], Awaitable[None]],
+        every_docs: int = 10,
+        interval: float = 60.0,
+    ):
+        self.flush_fn = flush_fn
+        self.every_docs = max(1, every_docs)
+        self.interval = interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval and self.interval > 0 and self._timer is None:
+            self._timer = asyncio.create_task(self._run_timer())
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._pending and time.monotonic() - self._last_flush >= self.interval:
+                await self.flush()
+
+    async def doc_done(self):
+        self._pending += 1
+        if self._pending >= self.every_docs:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            pending = self._pending
+            self._pending = 0
+            await self.flush_fn()
+            self._last_flush = time.monotonic()
+            if pending:
+                logger.info(f"Flushed storages after {pending} documents")
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.flush()
+
+
+@dataclass
+class DocJob:
+    doc_id: Any
+    status: dict
+    chunks: dict = field(default_factory=dict)
+    maybe_nodes: dict = field(default_factory=dict)
+    maybe_edges: dict = field(default_factory=dict)
+
+
+class IngestionPipeline:
+    """Staged document ingestion: fetch -> embed -> extract -> merge -> persist.
+
+    Stages are joined by bounded queues, so a slow document only occupies one
+    extract worker while the others keep the LLM and embedding limits busy,
+    and a full queue applies backpressure to the stage in front of it.
+
+    Tuned via ``addon_params``:
+        insert_batch_size: source_ids fetched per streamed chunk query.
+        pipeline_queue_size: capacity of each inter-stage queue.
+        pipeline_concurrency: per-stage worker counts, e.g. {"extract": 16}.
+        flush_every_docs / flush_interval_seconds: group-commit policy.
+    """
+
+    def __init__(self, rag):
+        self.rag = rag
+        addon_params = rag.addon_params
+        self.fetch_batch_size = addon_params.get("insert_batch_size", 10)
+        self.concurrency = {
+            **DEFAULT_STAGE_CONCURRENCY,
+            "extract": self.fetch_batch_size,
+            **addon_params.get("pipeline_concurrency", {}),
+        }
+        self.queue_size = addon_params.get(
+            "pipeline_queue_size", 2 * self.fetch_batch_size
+        )
+        self.global_config = asdict(rag)
+        self.flusher = FlushScheduler(
+            rag._insert_done,
+            every_docs=addon_params.get("flush_every_docs", 10),
+            interval=addon_params.get("flush_interval_seconds", 60),
+        )
+
+    async def run(self, new_docs: dict[Any, dict]):
+        stages = ["embed", "extract", "merge", "persist"]
+        queues = {name: asyncio.Queue(maxsize=self.queue_size) for name in stages}
+        handlers = {
+            "embed": self._embed,
+            "extract": self._extract,
+            "merge": self._merge,
+            "persist": self._persist,
+        }
+
+        tasks = [asyncio.create_task(self._fetch(new_docs, queues["embed"]))]
+        for i, name in enumerate(stages):
+            next_name = stages[i + 1] if i + 1 < len(stages) else None
+            tasks.append(
+                asyncio.create_task(
+                    self._run_stage(
+                        name,
+                        handlers[name],
+                        queues[name],
+                        queues[next_name] if next_name else None,
+                        self.concurrency[next_name] if next_name else 0,
+                    )
+                )
+            )
+        self.flusher.start()
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            # final checkpoint also covers cancellation/shutdown
+            await self.flusher.close()
+
+    async def _run_stage(
+        self,
+        name: str,
+        handler: Callable[[DocJob], Awaitable[Optional[DocJob]]],
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue],
+        downstream_workers: int,
+    ):
+        async def worker():
+            while True:
+                job = await in_queue.get()
+                if job is _STOP:
+                    return
+                try:
+                    job = await handler(job)
+                except Exception as e:
+                    await self._fail(job, name, e)
+                    continue
+                if job is not None and out_queue is not None:
+                    await out_queue.put(job)
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency[name])])
+        if out_queue is not None:
+            for _ in range(downstream_workers):
+                await out_queue.put(_STOP)
+
+    async def _fetch(self, new_docs: dict[Any, dict], out_queue: asyncio.Queue):
+        addon_params = self.rag.addon_params
+        doc_ids = list(new_docs.keys())
+        try:
+            for i in range(0, len(doc_ids), self.fetch_batch_size):
+                batch = doc_ids[i : i + self.fetch_batch_size]
+                async for doc_id, chunks in iter_chunks_bulk(
+                    batch,
+                    addon_params.get("min_chunk_tokens", 1200),
+                    addon_params.get("company_id"),
+                    addon_params.get("env"),
+                ):
+                    job = DocJob(
+                        doc_id=doc_id,
+                        status={
+                            "status": DocStatus.PROCESSING,
+                            "created_at": new_docs[doc_id]["created_at"],
+                            "updated_at": datetime.now().isoformat(),
+                            "chunks_count": len(chunks),
+                        },
+                        chunks=chunks,
+                    )
+                    logger.info(f"Fetched {len(chunks)} chunks for doc {doc_id}")
+                    await self.rag.doc_status.upsert({doc_id: job.status})
+                    await out_queue.put(job)
+        finally:
+            for _ in range(self.concurrency["embed"]):
+                await out_queue.put(_STOP)
+
+    async def _embed(self, job: DocJob) -> DocJob:
+        if not job.chunks:
+            raise ValueError("No chunks found for document")
+        await self.rag.chunks_vdb.upsert(job.chunks)
+        return job
+
+    async def _extract(self, job: DocJob) -> DocJob:
+        job.maybe_nodes, job.maybe_edges = await extract_chunk_records(
+            job.chunks, self.global_config
+        )
+        return job
+
+    async def _merge(self, job: DocJob) -> DocJob:
+        maybe_new_kg = await merge_extracted_records(
+            job.maybe_nodes,
+            job.maybe_edges,
+            knowledge_graph_inst=self.rag.chunk_entity_relation_graph,
+            entity_vdb=self.rag.entities_vdb,
+            relationships_vdb=self.rag.relationships_vdb,
+            global_config=self.global_config,
+        )
+        if maybe_new_kg is None:
+            raise Exception("Failed to extract entities and relationships")
+        self.rag.chunk_entity_relation_graph = maybe_new_kg
+        return job
+
+    async def _persist(self, job: DocJob) -> None:
+        await self.rag.text_chunks.upsert(job.chunks)
+        job.status.update(
+            {
+                "status": DocStatus.PROCESSED,
+                "updated_at": datetime.now().isoformat(),
+            }
+        )
+        await self.rag.doc_status.upsert({job.doc_id: job.status})
+        await self.flusher.doc_done()
+        logger.info(f"Processed doc {job.doc_id}")
+
+    async def _fail(self, job: DocJob, stage: str, error: Exception):
+        logger.error(f"Failed to process document {job.doc_id} at {stage}: {error}")
+        job.status.update(
+            {
+                "status": DocStatus.FAILED,
+                "error": str(error),
+                "updated_at": datetime.now().isoformat(),
+            }
+        )
+        try:
+            await self.rag.doc_status.upsert({job.doc_id: job.status})
+            await self.flusher.doc_done()
+        except Exception as e:
+            logger.error(f"Failed to record failure for document {job.doc_id}: {e}")
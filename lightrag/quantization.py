@@ -0,0 +1,183 @@
+"""Vector quantisation for the vector storages.
+
+``quantization`` in ``vector_db_storage_cls_kwargs`` picks how a namespace
+stores its vectors. It is either one setting for every namespace or a dict of
+settings keyed by namespace::
+
+    vector_db_storage_cls_kwargs={
+        "quantization": {
+            "entities": "int8",
+            "relationships": "float16",
+            "chunks": {"type": "pq", "m": 96, "rerank": 32},
+        }
+    }
+
+A setting is a type name or a dict with ``type`` and per-type options.
+Types: "float32" (no quantisation), "float16", "int8" (scalar, one scale per
+vector), "pq" (product quantisation, exact re-ranking of a shortlist) and
+"binary" (Qdrant only).
+"""
+
+from typing import Optional
+
+import numpy as np
+
+QUANTIZATION_TYPES = ("float32", "float16", "int8", "pq", "binary")
+
+
+def quantization_config(storage_kwargs: dict, namespace: str) -> dict:
+    """Normalised ``{"type": ..., **options}`` for ``namespace``."""
+    setting = storage_kwargs.get("quantization")
+    if isinstance(setting, dict) and "type" not in setting:
+        setting = setting.get(namespace)
+    if setting is None:
+        # ``dtype`` predates per-namespace settings
+        setting = storage_kwargs.get("dtype", "float32")
+    if isinstance(setting, str):
+        setting = {"type": setting}
+    if setting.get("type") not in QUANTIZATION_TYPES:
+        raise ValueError(
+            f"Unknown quantization {setting.get('type')!r} for {namespace}, "
+            f"expected one of {QUANTIZATION_TYPES}"
+        )
+    return dict(setting)
+
+
+class ScalarQuantizer:
+    """Symmetric int8 codes with one float32 scale per vector."""
+
+    @staticmethod
+    def encode(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127
+        safe = np.where(scales > 0, scales, 1)
+        codes = np.rint(vectors / safe[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @staticmethod
+    def decode(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * scales[:, None]
+
+    @staticmethod
+    def scores(
+        codes: np.ndarray, scales: np.ndarray, queries: np.ndarray
+    ) -> np.ndarray:
+        """Inner products (rows x queries) of the encoded rows with ``queries``."""
+        return (codes.astype(np.float32) @ queries.T) * scales[:, None]
+
+
+class ProductQuantizer:
+    """Product quantiser with 256 centroids (one byte) per subspace.
+
+    Vectors are split into ``m`` subvectors of ``dim / m`` dimensions, each
+    replaced by the id of its nearest centroid. Inner products against a
+    query are summed from per-subspace lookup tables (asymmetric distance
+    computation), so scoring never decodes the codes.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        m: Optional[int] = None,
+        train_iterations: int = 10,
+        max_train_samples: int = 16384,
+        seed: int = 0,
+    ):
+        self.dim = dim
+        self.m = m or default_subspaces(dim)
+        if dim % self.m:
+            raise ValueError(f"pq m={self.m} does not divide dimension {dim}")
+        self.dsub = dim // self.m
+        self.train_iterations = train_iterations
+        self.max_train_samples = max_train_samples
+        self._rng = np.random.default_rng(seed)
+        # (m, 256, dsub)
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def train(self, matrix: np.ndarray, num_rows: int):
+        """Learn the codebooks from a sample of ``matrix[:num_rows]``."""
+        sample_size = min(num_rows, self.max_train_samples)
+        sample_rows = np.sort(
+            self._rng.choice(num_rows, size=sample_size, replace=False)
+        )
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        sample = sample.reshape(sample_size, self.m, self.dsub)
+        self.codebooks = np.stack(
+            [
+                self._kmeans(np.ascontiguousarray(sample[:, j]), 256)
+                for j in range(self.m)
+            ]
+        )
+
+    def _kmeans(self, points: np.ndarray, k: int) -> np.ndarray:
+        centroids = points[
+            self._rng.choice(len(points), size=k, replace=len(points) < k)
+        ]
+        for _ in range(self.train_iterations):
+            labels = self._nearest(points, centroids)
+            order = np.argsort(labels, kind="stable")
+            starts = np.searchsorted(labels[order], np.arange(k))
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centroids)
+            sums[counts > 0] = np.add.reduceat(
+                points[order], starts[counts > 0], axis=0
+            )
+            empty = counts == 0
+            if empty.any():
+                # re-seed empty centroids from random points
+                sums[empty] = points[self._rng.choice(len(points), size=empty.sum())]
+                counts[empty] = 1
+            centroids = sums / counts[:, None]
+        return centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin |x - c|^2 == argmax (x.c - |c|^2 / 2)
+        half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+        return np.argmax(points @ centroids.T - half_norms, axis=1)
+
+    def encode(self, vectors: np.ndarray, block: int = 65536) -> np.ndarray:
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for i in range(0, len(vectors), block):
+            chunk = np.asarray(vectors[i : i + block], dtype=np.float32)
+            chunk = chunk.reshape(len(chunk), self.m, self.dsub)
+            for j in range(self.m):
+                codes[i : i + block, j] = self._nearest(chunk[:, j], self.codebooks[j])
+        return codes
+
+    def lookup_tables(self, queries: np.ndarray) -> np.ndarray:
+        """(queries, m, 256) inner products of each query subvector with each centroid."""
+        queries = np.asarray(queries, dtype=np.float32)
+        return np.einsum(
+            "qmd,mkd->qmk",
+            queries.reshape(len(queries), self.m, self.dsub),
+            self.codebooks,
+        )
+
+    def scores(self, codes: np.ndarray, tables: np.ndarray) -> np.ndarray:
+        """Approximate inner products (rows x queries) from ``lookup_tables``."""
+        index = codes.astype(np.intp) + np.arange(self.m) * 256
+        flat = tables.reshape(len(tables), self.m * 256)
+        scores = np.empty((len(codes), len(tables)), dtype=np.float32)
+        for q in range(len(tables)):
+            scores[:, q] = flat[q][index].sum(axis=1)
+        return scores
+
+    def state(self) -> dict:
+        return {"codebooks": self.codebooks}
+
+    def load_state(self, state):
+        self.codebooks = state["codebooks"]
+
+
+def default_subspaces(dim: int) -> int:
+    """About 32 dimensions (one byte) per subspace, dividing ``dim`` evenly."""
+    target = max(1, dim // 32)
+    for m in range(target, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
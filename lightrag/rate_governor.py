@@ -0,0 +1,368 @@
+"""Client-side request/token rate governor for hosted LLM APIs.
+
+One ``RateGovernor`` exists per (endpoint, model, api key). Before a call it
+reserves the estimated tokens and one request from two token buckets
+(TPM and RPM); after the call it refunds the difference to the real usage and
+re-syncs the buckets from the provider's ``x-ratelimit-*`` headers, so
+sustained traffic settles just under quota instead of bursting into 429s.
+
+Failures are retried with full-jitter exponential backoff. A 429 pauses every
+caller of the same governor until ``retry-after`` has passed (rather than
+letting each coroutine retry on its own schedule). Connection errors and
+timeouts feed a circuit breaker that fails fast after repeated consecutive
+failures until a cooldown expires, then lets a single probe through.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Mapping, Optional
+
+import tiktoken
+
+from .utils import logger
+
+# fraction of the advertised quota the governor aims to use
+DEFAULT_HEADROOM = 0.95
+# completion tokens assumed when a request does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+@lru_cache(maxsize=None)
+def _token_encoder(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(model: str, texts: list[str], completion_tokens: int = 0) -> int:
+    """Prompt tokens of ``texts`` (plus per-message overhead) and completion budget."""
+    encoder = _token_encoder(model)
+    prompt_tokens = sum(len(encoder.encode(text or "")) + 4 for text in texts)
+    return prompt_tokens + completion_tokens
+
+
+def estimate_chat_tokens(model: str, messages: list[dict], max_tokens=None) -> int:
+    return estimate_tokens(
+        model,
+        [
+            m.get("content") if isinstance(m.get("content"), str) else ""
+            for m in messages
+        ],
+        max_tokens or DEFAULT_COMPLETION_TOKENS,
+    )
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset values like ``"6m0s"``, ``"1.5s"`` or ``"20ms"``."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; ``capacity=None`` means unlimited."""
+
+    def __init__(self, capacity: Optional[float] = None, period: float = 60.0):
+        self.period = period
+        self.capacity = capacity
+        self.level = capacity or 0.0
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period if self.capacity else 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity:
+            self.level = min(
+                self.capacity, self.level + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def try_take(self, amount: float) -> float:
+        """Take ``amount`` and return 0, or return the seconds to wait."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        # a request larger than the whole bucket may go once it is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def give_back(self, amount: float):
+        if self.capacity:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit: float, remaining: Optional[float], headroom: float):
+        """Adopt the provider's limit and never assume more than it has left."""
+        self._refill()
+        capacity = limit * headroom
+        if self.capacity is None:
+            self.level = capacity
+        self.capacity = capacity
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+        self.level = min(self.level, self.capacity)
+
+
+class RateGovernor:
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        headroom: float = DEFAULT_HEADROOM,
+        max_attempts: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30.0,
+    ):
+        self.name = name
+        self.headroom = headroom
+        self.requests = TokenBucket(rpm * headroom if rpm else None)
+        self.tokens = TokenBucket(tpm * headroom if tpm else None)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    # -- admission -------------------------------------------------------
+
+    def _check_breaker(self) -> bool:
+        """Raise while the circuit is open; return True if this call is the probe."""
+        now = time.monotonic()
+        if self._consecutive_failures < self.breaker_threshold:
+            return False
+        if now < self._open_until or self._probing:
+            raise CircuitOpenError(
+                f"{self.name}: circuit open after {self._consecutive_failures} "
+                f"consecutive failures"
+            )
+        # half-open: let one probe request through
+        self._probing = True
+        return True
+
+    async def _reserve(self, tokens: int) -> bool:
+        # the lock keeps reservations FIFO so large requests are not starved
+        async with self._lock:
+            probe = self._check_breaker()
+            try:
+                while True:
+                    wait = self._paused_until - time.monotonic()
+                    if wait <= 0:
+                        wait = self.requests.try_take(1)
+                        if wait <= 0:
+                            wait = self.tokens.try_take(tokens)
+                            if wait <= 0:
+                                return probe
+                            self.requests.give_back(1)
+                    self.throttled_seconds += wait
+                    await asyncio.sleep(wait)
+            except BaseException:
+                # cancelled while waiting: let the next caller probe instead
+                if probe:
+                    self._probing = False
+                raise
+
+    # -- feedback --------------------------------------------------------
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]]):
+        if not headers:
+            return
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            if not limit:
+                continue
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            try:
+                bucket.sync(
+                    float(limit),
+                    float(remaining) if remaining is not None else None,
+                    self.headroom,
+                )
+            except ValueError:
+                continue
+
+    def _retry_after(self, headers: Optional[Mapping[str, str]]) -> Optional[float]:
+        if not headers:
+            return None
+        candidates = [
+            parse_reset_duration(headers.get("retry-after-ms")),
+            parse_reset_duration(headers.get("retry-after")),
+        ]
+        if candidates[0] is not None:
+            candidates[0] /= 1000
+        for kind in ("requests", "tokens"):
+            if headers.get(f"x-ratelimit-remaining-{kind}") in ("0", "0.0"):
+                candidates.append(
+                    parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                )
+        candidates = [c for c in candidates if c is not None]
+        return max(candidates) if candidates else None
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter spreads retries instead of synchronising them
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _record_success(self):
+        self._consecutive_failures = 0
+        self._probing = False
+
+    def _record_failure(self):
+        self._consecutive_failures += 1
+        self._probing = False
+        if self._consecutive_failures >= self.breaker_threshold:
+            self._open_until = time.monotonic() + self.breaker_cooldown
+            logger.warning(
+                f"{self.name}: opening circuit for {self.breaker_cooldown}s "
+                f"after {self._consecutive_failures} consecutive failures"
+            )
+
+    async def call(
+        self,
+        make_call: Callable[[], Awaitable],
+        estimated_tokens: int,
+        rate_limit_errors: tuple = (),
+        transient_errors: tuple = (),
+        headers_of: Callable = lambda result: None,
+        usage_of: Callable = lambda result: None,
+    ):
+        """Run ``make_call`` under the governor.
+
+        ``headers_of``/``usage_of`` extract response headers and the real
+        token usage from a result (or an exception, for headers).
+        """
+        for attempt in range(self.max_attempts):
+            probe = await self._reserve(estimated_tokens)
+            self.calls += 1
+            try:
+                result = await make_call()
+            except rate_limit_errors as e:
+                # the request was refused, so its tokens were never spent
+                self.tokens.give_back(estimated_tokens)
+                headers = headers_of(e)
+                self.observe_headers(headers)
+                delay = self._retry_after(headers) or self._backoff(attempt)
+                # pause everyone sharing this quota, not just this caller
+                self._paused_until = max(
+                    self._paused_until,
+                    time.monotonic() + delay + random.uniform(0, 0.1 * delay),
+                )
+                self.rate_limited += 1
+                if attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                logger.info(f"{self.name}: rate limited, retrying in {delay:.2f}s")
+                continue
+            except transient_errors as e:
+                self.tokens.give_back(estimated_tokens)
+                self._record_failure()
+                if attempt == self.max_attempts - 1:
+                    raise
+                self.retries += 1
+                delay = self._backoff(attempt)
+                logger.info(
+                    f"{self.name}: {type(e).__name__}, retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                # any outcome of the probe (including a non-transient error or
+                # cancellation) ends the half-open state
+                if probe:
+                    self._probing = False
+            self._record_success()
+            used = usage_of(result)
+            if used is not None and used < estimated_tokens:
+                self.tokens.give_back(estimated_tokens - used)
+            self.observe_headers(headers_of(result))
+            return result
+
+    def quota_left(self) -> float:
+        """Fraction of the token quota available now; -1 while paused by a 429."""
+        if self._paused_until > time.monotonic():
+            return -1.0
+        if not self.tokens.capacity:
+            return 1.0
+        self.tokens._refill()
+        return self.tokens.level / self.tokens.capacity
+
+    @staticmethod
+    def openai_headers(result_or_error) -> Optional[Mapping[str, str]]:
+        """Headers of a ``(headers, response)`` result or an openai APIStatusError."""
+        if isinstance(result_or_error, tuple):
+            return result_or_error[0]
+        return getattr(getattr(result_or_error, "response", None), "headers", None)
+
+    @staticmethod
+    def openai_usage(result) -> Optional[int]:
+        usage = getattr(result[1], "usage", None)
+        return getattr(usage, "total_tokens", None)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "throttled_seconds": self.throttled_seconds,
+            "rpm_limit": self.requests.capacity,
+            "tpm_limit": self.tokens.capacity,
+            "circuit_open": self._consecutive_failures >= self.breaker_threshold,
+        }
+
+
+_governors: dict[tuple, RateGovernor] = {}
+
+
+def get_rate_governor(
+    model: str, api_key: Optional[str] = None, base_url: Optional[str] = None, **kwargs
+) -> RateGovernor:
+    """Shared governor of one (endpoint, model, key); ``kwargs`` apply on creation."""
+    key_id = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+    key = (base_url or "default", model, key_id)
+    governor = _governors.get(key)
+    if governor is None:
+        governor = RateGovernor(f"{key[0]}/{model}/{key_id}", **kwargs)
+        _governors[key] = governor
+    return governor
+
+
+def rate_governor_stats() -> dict:
+    return {g.name: g.stats() for g in _governors.values()}
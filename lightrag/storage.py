@@ -1,5 +1,6 @@
 import asyncio
 import html
+import json
 import os
 from tqdm.asyncio import tqdm as tqdm_async
 from dataclasses import dataclass
@@ -26,21 +27,79 @@ from .base import (
     DocStatusStorage,
 )
 from .prompt import SUBGRAPH_SEP
+from .graph_snapshot import read_graph_snapshot, write_graph_snapshot
 
 @dataclass
 class JsonKVStorage(BaseKVStorage):
+    """Dict persisted as ``kv_store_<namespace>.json``.
+
+    Flushes append the keys changed since the last flush to
+    ``kv_store_<namespace>.journal`` (one ``[key, value]`` line each, value
+    null for a delete) instead of rewriting the whole file; the JSON file is
+    rewritten and the journal cleared once the journal outgrows the data.
+    """
+
+    # the journal is compacted once it has more lines than this or the data
+    compact_min_ops = 1000
+
     def __post_init__(self):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
+        self._journal_file = os.path.join(
+            working_dir, f"kv_store_{self.namespace}.journal"
+        )
         self._data = load_json(self._file_name) or {}
         self._lock = asyncio.Lock()
+        # keys changed since the last flush; None = rewrite the whole file
+        self._changed: Union[set, None] = set()
+        self._journal_ops = 0
+        self._replay_journal()
         logger.info(f"Load KV {self.namespace} with {len(self._data)} data")
 
+    def _replay_journal(self):
+        if not os.path.exists(self._journal_file):
+            return
+        good_offset = 0
+        with open(self._journal_file, "rb") as f:
+            for line in f:
+                try:
+                    key, value = json.loads(line.decode("utf-8"))
+                except (json.JSONDecodeError, UnicodeDecodeError, ValueError):
+                    # torn final write from a crash; everything before it is intact
+                    logger.warning(f"Dropping truncated journal tail in {self._journal_file}")
+                    break
+                if value is None:
+                    self._data.pop(key, None)
+                else:
+                    self._data[key] = value
+                good_offset += len(line)
+                self._journal_ops += 1
+        if good_offset != os.path.getsize(self._journal_file):
+            with open(self._journal_file, "r+b") as f:
+                f.truncate(good_offset)
+
     async def all_keys(self) -> list[str]:
         return list(self._data.keys())
 
     async def index_done_callback(self):
-        write_json(self._data, self._file_name)
+        if self._changed is not None and not self._changed:
+            return
+        if self._changed is not None and self._journal_ops + len(
+            self._changed
+        ) <= max(self.compact_min_ops, len(self._data)):
+            with open(self._journal_file, "a", encoding="utf-8") as f:
+                for key in self._changed:
+                    f.write(
+                        json.dumps([key, self._data.get(key)], ensure_ascii=False)
+                        + "\n"
+                    )
+            self._journal_ops += len(self._changed)
+        else:
+            write_json(self._data, self._file_name)
+            if os.path.exists(self._journal_file):
+                os.remove(self._journal_file)
+            self._journal_ops = 0
+        self._changed = set()
 
     async def get_by_id(self, id):
         return self._data.get(id, None)
@@ -63,10 +122,14 @@ class JsonKVStorage(BaseKVStorage):
     async def upsert(self, data: dict[str, dict]):
         left_data = {k: v for k, v in data.items() if k not in self._data}
         self._data.update(left_data)
+        # existing values may have been mutated in place (e.g. the llm cache)
+        if self._changed is not None:
+            self._changed.update(data)
         return left_data
 
     async def drop(self):
         self._data = {}
+        self._changed = None
 
     async def filter(self, filter_func):
         """Filter key-value pairs based on a filter function
@@ -94,7 +157,8 @@ class JsonKVStorage(BaseKVStorage):
             for id in ids:
                 if id in self._data:
                     del self._data[id]
-            await self.index_done_callback()
+            if self._changed is not None:
+                self._changed.update(ids)
             logger.info(f"Successfully deleted {len(ids)} items from {self.namespace}")
 
 
@@ -113,6 +177,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
         self.cosine_better_than_threshold = self.global_config.get(
             "cosine_better_than_threshold", self.cosine_better_than_threshold
         )
+        self._dirty = False
 
     async def upsert(self, data: dict[str, dict]):
         logger.info(f"Inserting {len(data)} vectors to {self.namespace}")
@@ -151,6 +216,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
             for i, d in enumerate(list_data):
                 d["__vector__"] = embeddings[i]
             results = self._client.upsert(datas=list_data)
+            self._dirty = True
             return results
         else:
             # sometimes the embedding is not returned correctly. just log it.
@@ -159,23 +225,38 @@ class NanoVectorDBStorage(BaseVectorStorage):
             )
 
     async def query(self, query: str, top_k=5):
-        embedding = await self.embedding_func([query])
-        embedding = embedding[0]
-        results = self._client.query(
-            query=embedding,
-            top_k=top_k,
-            better_than_threshold=self.cosine_better_than_threshold,
-        )
-        results = [
-            {
-                **dp,
-                "id": dp["__id__"],
-                "distance": dp["__metrics__"],
-                "created_at": dp.get("__created_at__"),
-            }
-            for dp in results
-        ]
-        return results
+        return (await self.query_batch([query], top_k))[0]
+
+    async def query_batch(self, queries: list[str], top_k=5) -> list[list[dict]]:
+        embeddings = await self.embedding_func(queries)
+        storage = self.client_storage
+        if not len(storage["data"]):
+            return [[] for _ in queries]
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # one (rows x queries) product instead of a scan per query
+        scores = storage["matrix"] @ embeddings.T
+        top_k = min(top_k, len(storage["data"]))
+        all_results = []
+        for column in scores.T:
+            best = np.argpartition(-column, top_k - 1)[:top_k]
+            results = []
+            for i in best[np.argsort(-column[best])]:
+                if column[i] < self.cosine_better_than_threshold:
+                    break
+                dp = {**storage["data"][i], "__metrics__": column[i]}
+                results.append(
+                    {
+                        **dp,
+                        "id": dp["__id__"],
+                        "distance": dp["__metrics__"],
+                        "created_at": dp.get("__created_at__"),
+                    }
+                )
+            all_results.append(results)
+        return all_results
+
+    def get(self, ids: list[str]) -> list[dict]:
+        return self._client.get(ids)
 
     @property
     def client_storage(self):
@@ -189,6 +270,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
         """
         try:
             self._client.delete(ids)
+            self._dirty = True
             logger.info(
                 f"Successfully deleted {len(ids)} vectors from {self.namespace}"
             )
@@ -231,7 +313,10 @@ class NanoVectorDBStorage(BaseVectorStorage):
             logger.error(f"Error deleting relations for {entity_name}: {e}")
 
     async def index_done_callback(self):
+        if not self._dirty:
+            return
         self._client.save()
+        self._dirty = False
 
 
 @dataclass
@@ -298,25 +383,154 @@ class NetworkXStorage(BaseGraphStorage):
         return fixed_graph
 
     def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
         self._graphml_xml_file = os.path.join(
-            self.global_config["working_dir"], f"graph_{self.namespace}.graphml"
+            working_dir, f"graph_{self.namespace}.graphml"
         )
         self._graphml_xml_sg_file = os.path.join(
-            self.global_config["working_dir"], f"subgraph_{self.namespace}.graphml"
+            working_dir, f"subgraph_{self.namespace}.graphml"
         )
-        preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
+        self._snapshot_file = os.path.join(working_dir, f"graph_{self.namespace}.snapshot")
+        self._journal_file = os.path.join(working_dir, f"graph_{self.namespace}.journal")
+
+        config = self.global_config.get("graph_storage_cls_kwargs", {})
+        # "graphml": rewrite the whole graph on every flush (default)
+        # "journal": append changes to a write-ahead journal, snapshot periodically.
+        #   graph_<ns>.graphml and subgraph_<ns>.graphml are exports refreshed
+        #   only at compaction (every snapshot_every_ops changes, or snapshot());
+        #   external readers of those files see the graph as of the last one.
+        self._persistence = config.get("persistence", "graphml")
+        # in graphml mode, also keep a binary snapshot for fast startup loads
+        self._binary_snapshot = config.get("binary_snapshot", True)
+        self._snapshot_every_ops = config.get("snapshot_every_ops", 50000)
+        self._journal_buffer: list[str] = []
+        self._journal_ops = 0
+
+        preloaded_graph = self._load_snapshot_and_journal()
         if preloaded_graph is not None:
             logger.info(
-                f"Loaded graph from {self._graphml_xml_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
+                f"Loaded graph {self.namespace} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
             )
         self._graph = preloaded_graph or nx.Graph()
         self._node_embed_algorithms = {
             "node2vec": self._node2vec_embed,
         }
+        self._dirty = False
+
+    def _load_graphml_or_snapshot(self) -> Union[nx.Graph, None]:
+        """Prefer the binary snapshot unless the GraphML file is newer."""
+        if (
+            (self._binary_snapshot or self._persistence == "journal")
+            and os.path.exists(self._snapshot_file)
+            and (
+                not os.path.exists(self._graphml_xml_file)
+                or os.path.getmtime(self._snapshot_file)
+                >= os.path.getmtime(self._graphml_xml_file)
+            )
+        ):
+            return read_graph_snapshot(self._snapshot_file)
+        return NetworkXStorage.load_nx_graph(self._graphml_xml_file)
 
-    async def index_done_callback(self):
+    def _load_snapshot_and_journal(self) -> Union[nx.Graph, None]:
+        """Load the latest snapshot or GraphML and replay the journal tail.
+
+        The journal is replayed in either persistence mode, so switching from
+        journal back to graphml does not drop un-compacted changes; in graphml
+        mode the replayed graph is written out and the journal cleared.
+        """
+        graph = self._load_graphml_or_snapshot()
+        if not os.path.exists(self._journal_file) or not os.path.getsize(
+            self._journal_file
+        ):
+            return graph
+        graph = graph if graph is not None else nx.Graph()
+        replayed = 0
+        good_offset = 0
+        with open(self._journal_file, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # torn final write from a crash; everything before it is intact
+                    logger.warning(f"Dropping truncated journal tail in {self._journal_file}")
+                    break
+                NetworkXStorage._apply_journal_entry(graph, entry)
+                good_offset += len(line)
+                replayed += 1
+        # cut the torn tail so later appends are not hidden behind it
+        if good_offset != os.path.getsize(self._journal_file):
+            with open(self._journal_file, "r+b") as f:
+                f.truncate(good_offset)
+        self._journal_ops = replayed
+        logger.info(f"Replayed {replayed} journal entries for graph {self.namespace}")
+        if self._persistence != "journal":
+            self._graph = graph
+            self._write_graphml()
+            open(self._journal_file, "w").close()
+            self._journal_ops = 0
+        return graph
+
+    @staticmethod
+    def _apply_journal_entry(graph: nx.Graph, entry: dict):
+        op = entry["op"]
+        if op == "upsert_node":
+            graph.add_node(entry["id"], **entry["data"])
+        elif op == "upsert_edge":
+            graph.add_edge(entry["src"], entry["tgt"], **entry["data"])
+        elif op == "delete_node":
+            if graph.has_node(entry["id"]):
+                graph.remove_node(entry["id"])
+        elif op == "delete_edge":
+            if graph.has_edge(entry["src"], entry["tgt"]):
+                graph.remove_edge(entry["src"], entry["tgt"])
+
+    def _journal(self, op: str, **kwargs):
+        self._dirty = True
+        if self._persistence == "journal":
+            self._journal_buffer.append(
+                json.dumps({"op": op, **kwargs}, ensure_ascii=False)
+            )
+
+    def _write_graphml(self):
         NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
         NetworkXStorage.write_nx_graph(NetworkXStorage.get_subgraph(self._graph, subgraph='PK'), self._graphml_xml_sg_file)
+        if self._binary_snapshot or self._persistence == "journal":
+            # written after the GraphML so its mtime marks it as current
+            write_graph_snapshot(self._graph, self._snapshot_file)
+
+    def _write_snapshot(self):
+        # refresh the GraphML exports too; journal mode only writes them here
+        self._write_graphml()
+        # entries up to here are now covered by the snapshot
+        open(self._journal_file, "w").close()
+        self._journal_ops = 0
+
+    async def index_done_callback(self):
+        if not self._dirty:
+            return
+        if self._persistence == "journal":
+            if self._journal_buffer:
+                with open(self._journal_file, "a", encoding="utf-8") as f:
+                    f.write("\n".join(self._journal_buffer) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_ops += len(self._journal_buffer)
+                self._journal_buffer = []
+            if self._journal_ops >= self._snapshot_every_ops:
+                logger.info(f"Compacting graph {self.namespace} journal into snapshot")
+                self._write_snapshot()
+        else:
+            self._write_graphml()
+        self._dirty = False
+
+    async def snapshot(self):
+        """Force a compacted snapshot (journal mode) or full GraphML write."""
+        self._dirty = True
+        if self._persistence == "journal":
+            await self.index_done_callback()
+            self._write_snapshot()
+        else:
+            await self.index_done_callback()
 
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
@@ -343,13 +557,34 @@ class NetworkXStorage(BaseGraphStorage):
             return list(self._graph.edges(source_node_id))
         return None
 
+    async def get_nodes(self, node_ids: list[str]) -> list[Union[dict, None]]:
+        return [self._graph.nodes.get(n) for n in node_ids]
+
+    async def node_degrees(self, node_ids: list[str]) -> list[int]:
+        return [
+            self._graph.degree(n) if self._graph.has_node(n) else 0 for n in node_ids
+        ]
+
+    async def get_edges(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> list[Union[dict, None]]:
+        return [self._graph.edges.get(pair) for pair in edge_pairs]
+
+    async def get_nodes_edges(self, node_ids: list[str]):
+        return [
+            list(self._graph.edges(n)) if self._graph.has_node(n) else None
+            for n in node_ids
+        ]
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]):
         self._graph.add_node(node_id, **node_data)
+        self._journal("upsert_node", id=node_id, data=node_data)
 
     async def upsert_edge(
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ):
         self._graph.add_edge(source_node_id, target_node_id, **edge_data)
+        self._journal("upsert_edge", src=source_node_id, tgt=target_node_id, data=edge_data)
 
     async def delete_node(self, node_id: str):
         """
@@ -359,6 +594,7 @@ class NetworkXStorage(BaseGraphStorage):
         """
         if self._graph.has_node(node_id):
             self._graph.remove_node(node_id)
+            self._journal("delete_node", id=node_id)
             logger.info(f"Node {node_id} deleted from the graph.")
         else:
             logger.warning(f"Node {node_id} not found in the graph for deletion.")
@@ -380,6 +616,12 @@ class NetworkXStorage(BaseGraphStorage):
         nodes_ids = [self._graph.nodes[node_id]["id"] for node_id in nodes]
         return embeddings, nodes_ids
 
+    async def get_all_nodes(self) -> list[tuple[str, dict]]:
+        return list(self._graph.nodes(data=True))
+
+    async def get_all_edges(self) -> list[tuple[str, str, dict]]:
+        return list(self._graph.edges(data=True))
+
     def remove_nodes(self, nodes: list[str]):
         """Delete multiple nodes
 
@@ -389,6 +631,7 @@ class NetworkXStorage(BaseGraphStorage):
         for node in nodes:
             if self._graph.has_node(node):
                 self._graph.remove_node(node)
+                self._journal("delete_node", id=node)
 
     def remove_edges(self, edges: list[tuple[str, str]]):
         """Delete multiple edges
@@ -399,6 +642,7 @@ class NetworkXStorage(BaseGraphStorage):
         for source, target in edges:
             if self._graph.has_edge(source, target):
                 self._graph.remove_edge(source, target)
+                self._journal("delete_edge", src=source, tgt=target)
 
 
     def get_subgraph(graph, subgraph: str) -> nx.Graph:
@@ -423,6 +667,7 @@ class JsonDocStatusStorage(DocStatusStorage):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
         self._data = load_json(self._file_name) or {}
+        self._dirty = False
         logger.info(f"Loaded document status storage with {len(self._data)} records")
 
     async def filter_keys(self, data: list[str]) -> set[str]:
@@ -452,7 +697,10 @@ class JsonDocStatusStorage(DocStatusStorage):
 
     async def index_done_callback(self):
         """Save data to file after indexing"""
+        if not self._dirty:
+            return
         write_json(self._data, self._file_name)
+        self._dirty = False
 
     async def upsert(self, data: dict[str, dict]):
         """Update or insert document status
@@ -461,7 +709,8 @@ class JsonDocStatusStorage(DocStatusStorage):
             data: Dictionary of document IDs and their status data
         """
         self._data.update(data)
-        await self.index_done_callback()
+        # persisted by the next index_done_callback (see FlushScheduler)
+        self._dirty = True
         return data
 
     async def get(self, doc_id: str) -> Union[DocProcessingStatus, None]:
@@ -472,4 +721,4 @@ class JsonDocStatusStorage(DocStatusStorage):
         """Delete document status by IDs"""
         for doc_id in doc_ids:
             self._data.pop(doc_id, None)
-        await self.index_done_callback()
+        self._dirty = True
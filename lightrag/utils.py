@@ -1,4 +1,5 @@
 import asyncio
+import contextvars
 import html
 import io
 import csv
@@ -6,6 +7,9 @@ import json
 import logging
 import os
 import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
@@ -48,23 +52,133 @@ def set_logger(log_file: str):
         logger.addHandler(file_handler)
 
 
+class EmbeddingMicroBatcher:
+    """Coalesce concurrent embedding calls into batched requests.
+
+    Calls arriving within ``window_ms`` of the first pending one are sent as
+    a single request of at most ``max_batch_size`` texts and the rows of the
+    result are scattered back to each caller. Calls that are already full
+    batches, or pass extra arguments, go straight through.
+
+    Each call lane collects its own batch, and the request runs in that
+    lane, so a query embedding never waits behind ingestion's lane.
+    """
+
+    def __init__(self, func: callable, window_ms: float, max_batch_size: int):
+        self.func = func
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        # lane -> pending (texts, future) pairs, their text count and timer
+        self._pending: dict[Optional[str], list[tuple[list[str], asyncio.Future]]] = {}
+        self._pending_texts: dict[Optional[str], int] = {}
+        self._timers: dict[Optional[str], asyncio.TimerHandle] = {}
+        self.calls = 0
+        self.requests = 0
+
+    async def __call__(self, texts: list[str]) -> np.ndarray:
+        self.calls += 1
+        if len(texts) >= self.max_batch_size:
+            self.requests += 1
+            return await self.func(texts)
+        loop = asyncio.get_running_loop()
+        lane = _current_call_lane.get()
+        if self._pending_texts.get(lane, 0) + len(texts) > self.max_batch_size:
+            self._flush(lane)
+        future = loop.create_future()
+        self._pending.setdefault(lane, []).append((texts, future))
+        self._pending_texts[lane] = self._pending_texts.get(lane, 0) + len(texts)
+        if self._pending_texts[lane] >= self.max_batch_size:
+            self._flush(lane)
+        elif lane not in self._timers:
+            self._timers[lane] = loop.call_later(self.window, self._flush, lane)
+        return await future
+
+    def _flush(self, lane: Optional[str]):
+        timer = self._timers.pop(lane, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(lane, [])
+        self._pending_texts.pop(lane, None)
+        if batch:
+            self.requests += 1
+            asyncio.ensure_future(self._run(batch, lane))
+
+    async def _run(
+        self, batch: list[tuple[list[str], asyncio.Future]], lane: Optional[str]
+    ):
+        # the task inherits the context of whoever flushed; use the batch's lane
+        _current_call_lane.set(lane)
+        try:
+            embeddings = await self.func([text for texts, _ in batch for text in texts])
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        offset = 0
+        for texts, future in batch:
+            if not future.done():
+                future.set_result(embeddings[offset : offset + len(texts)])
+            offset += len(texts)
+
+
 @dataclass
 class EmbeddingFunc:
     embedding_dim: int
     max_token_size: int
     func: callable
     concurrent_limit: int = 16
+    # > 0 enables cross-request micro-batching with this collection window
+    batch_window_ms: float = 0.0
+    max_batch_size: int = 32
 
     def __post_init__(self):
         if self.concurrent_limit != 0:
             self._semaphore = asyncio.Semaphore(self.concurrent_limit)
         else:
             self._semaphore = UnlimitedSemaphore()
+        self._batcher = (
+            EmbeddingMicroBatcher(self._call, self.batch_window_ms, self.max_batch_size)
+            if self.batch_window_ms > 0
+            else None
+        )
+        self._cache = None
 
-    async def __call__(self, *args, **kwargs) -> np.ndarray:
+    def attach_cache(self, cache):
+        """Serve repeated texts from ``cache`` (an EmbeddingCache); only misses
+        reach the provider. Kept off the dataclass fields so asdict() does not
+        try to copy it."""
+        self._cache = cache
+
+    async def _call(self, *args, **kwargs) -> np.ndarray:
         async with self._semaphore:
             return await self.func(*args, **kwargs)
 
+    async def _embed(self, *args, **kwargs) -> np.ndarray:
+        if self._batcher is not None and len(args) == 1 and not kwargs:
+            return await self._batcher(list(args[0]))
+        return await self._call(*args, **kwargs)
+
+    async def _embed_cached(self, texts: list[str]) -> np.ndarray:
+        # SQLite work runs off the event loop
+        vectors = await asyncio.to_thread(self._cache.get_many, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            miss_texts = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = np.asarray(await self._embed(miss_texts), dtype=np.float32)
+            await asyncio.to_thread(self._cache.put_many, miss_texts, fresh)
+            by_text = dict(zip(miss_texts, fresh))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return np.stack(vectors) if vectors else np.empty((0, self.embedding_dim))
+
+    async def __call__(self, *args, **kwargs) -> np.ndarray:
+        if self._cache is not None and len(args) == 1 and not kwargs:
+            return await self._embed_cached(list(args[0]))
+        return await self._embed(*args, **kwargs)
+
 
 def locate_json_string_body_from_string(content: str) -> Union[str, None]:
     """Locate the JSON string body from a string"""
@@ -111,28 +225,283 @@ def compute_mdhash_id(content, prefix: str = ""):
     return prefix + md5(content.encode()).hexdigest()
 
 
-def limit_async_func_call(max_size: int, waitting_time: float = 0.0001):
-    """Add restriction of maximum async calling times for a async func"""
+# Upper bounds (seconds) of the limiter wait-time histogram buckets
+WAIT_TIME_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0, 60.0, float("inf"))
+
+DEFAULT_LANE = "default"
+
+# Priority lanes of LLM / embedding calls. ``weight`` is the lane's share of
+# the unreserved slots when several lanes are queued; ``reserved`` slots can
+# only be used by that lane, so interactive traffic never waits behind a full
+# ingestion backlog for more than one call.
+DEFAULT_CALL_LANES = {
+    "query_keywords": {"weight": 8, "reserved": 1},
+    "query": {"weight": 8, "reserved": 1},
+    "extraction": {"weight": 2, "reserved": 0},
+    "gleaning": {"weight": 1, "reserved": 0},
+    "summary": {"weight": 1, "reserved": 0},
+    DEFAULT_LANE: {"weight": 1, "reserved": 0},
+}
+
+_current_call_lane: contextvars.ContextVar = contextvars.ContextVar(
+    "current_call_lane", default=None
+)
+
+
+@contextmanager
+def call_lane(lane: str):
+    """Run LLM / embedding calls made inside the block (and tasks spawned
+    from it) in the given priority lane."""
+    token = _current_call_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_call_lane.reset(token)
+
+
+class _Lane:
+    def __init__(self, name: str, weight: float, reserved: int):
+        self.name = name
+        self.weight = weight
+        self.reserved = reserved
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        # virtual finish time for weighted fair sharing of unreserved slots
+        self.vtime = 0.0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.wait_histogram = [0] * len(WAIT_TIME_BUCKETS)
+
+    def record_wait(self, seconds: float):
+        self.acquired += 1
+        self.total_wait += seconds
+        for i, bound in enumerate(WAIT_TIME_BUCKETS):
+            if seconds <= bound:
+                self.wait_histogram[i] += 1
+                break
+
+    def metrics(self) -> dict:
+        return {
+            "weight": self.weight,
+            "reserved": self.reserved,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "acquired": self.acquired,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "wait_histogram": dict(
+                zip([str(b) for b in WAIT_TIME_BUCKETS], self.wait_histogram)
+            ),
+        }
+
+
+class AsyncLimiter:
+    """Concurrency limiter with FIFO-fair, weighted priority lanes.
+
+    Waiters queue on futures and a freed slot is handed directly to the next
+    waiter, so nothing polls and late arrivals cannot overtake within a lane.
+    Each lane first uses its reserved slots; the remaining shared slots go to
+    the queued lane with the smallest weighted service time. Slots are
+    released even if the guarded call raises or is cancelled.
+
+    Without ``lanes`` all calls share one FIFO queue. Calls name their lane
+    via ``call_lane``; unknown or unset lanes fall back to ``default``.
+    """
+
+    def __init__(self, max_size: int, lanes: Optional[dict] = None):
+        self.max_size = max_size
+        lanes = dict(lanes or {})
+        lanes.setdefault(DEFAULT_LANE, {"weight": 1, "reserved": 0})
+        if sum(cfg.get("reserved", 0) for cfg in lanes.values()) >= max_size:
+            # keep at least one shared slot so unreserved lanes can progress
+            logger.warning(
+                f"Lane reservations exceed limiter capacity {max_size}; ignoring them"
+            )
+            lanes = {name: {**cfg, "reserved": 0} for name, cfg in lanes.items()}
+        self._lanes = {
+            name: _Lane(name, cfg.get("weight", 1), cfg.get("reserved", 0))
+            for name, cfg in lanes.items()
+        }
+        self._shared_capacity = max_size - sum(
+            lane.reserved for lane in self._lanes.values()
+        )
+        self._shared_in_use = 0
+        self._vclock = 0.0
+
+    def _lane(self, name: Optional[str]) -> _Lane:
+        if name is None:
+            name = _current_call_lane.get()
+        return self._lanes.get(name) or self._lanes[DEFAULT_LANE]
+
+    def _take(self, lane: _Lane) -> bool:
+        if lane.in_flight < lane.reserved:
+            lane.in_flight += 1
+            return True
+        if self._shared_in_use < self._shared_capacity:
+            self._shared_in_use += 1
+            lane.in_flight += 1
+            start = max(lane.vtime, self._vclock)
+            lane.vtime = start + 1 / lane.weight
+            self._vclock = start
+            return True
+        return False
+
+    @staticmethod
+    def _next_waiter(lane: _Lane) -> Optional[asyncio.Future]:
+        while lane.waiters and lane.waiters[0].done():
+            lane.waiters.popleft()
+        return lane.waiters[0] if lane.waiters else None
+
+    def _dispatch(self):
+        # reserved slots first, then shared slots by weighted fair order
+        for lane in self._lanes.values():
+            while lane.in_flight < lane.reserved and self._next_waiter(lane):
+                self._take(lane)
+                lane.waiters.popleft().set_result(None)
+        while self._shared_in_use < self._shared_capacity:
+            queued = [lane for lane in self._lanes.values() if self._next_waiter(lane)]
+            if not queued:
+                return
+            lane = min(
+                queued, key=lambda ln: max(ln.vtime, self._vclock) + 1 / ln.weight
+            )
+            self._take(lane)
+            lane.waiters.popleft().set_result(None)
+
+    async def acquire(self, lane: Optional[str] = None) -> str:
+        """Wait for a slot; returns the lane name to pass to ``release``."""
+        lane = self._lane(lane)
+        if not self._next_waiter(lane) and self._take(lane):
+            lane.record_wait(0.0)
+            return lane.name
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just before cancellation; pass it on
+                self.release(lane.name)
+            else:
+                lane.waiters.remove(waiter)
+            raise
+        lane.record_wait(time.monotonic() - start)
+        return lane.name
+
+    def release(self, lane: Optional[str] = None):
+        lane = self._lanes.get(lane) or self._lanes[DEFAULT_LANE]
+        if lane.in_flight > lane.reserved:
+            self._shared_in_use -= 1
+        lane.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[str] = None):
+        name = await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def metrics(self) -> dict:
+        lanes = {name: lane.metrics() for name, lane in self._lanes.items()}
+        return {
+            "max_size": self.max_size,
+            "in_flight": sum(m["in_flight"] for m in lanes.values()),
+            "queued": sum(m["queued"] for m in lanes.values()),
+            "acquired": sum(m["acquired"] for m in lanes.values()),
+            "lanes": lanes,
+        }
+
+
+def limit_async_func_call(
+    max_size: int, waitting_time: float = 0.0001, lanes: Optional[dict] = None
+):
+    """Add restriction of maximum async calling times for a async func
+
+    ``waitting_time`` is unused and kept for backwards compatibility; the
+    wrapper exposes its AsyncLimiter as ``.limiter``. With ``lanes`` the
+    calls are scheduled by the lane set through ``call_lane``.
+    """
 
     def final_decro(func):
-        """Not using async.Semaphore to aovid use nest-asyncio"""
-        __current_size = 0
+        limiter = AsyncLimiter(max_size, lanes)
 
         @wraps(func)
         async def wait_func(*args, **kwargs):
-            nonlocal __current_size
-            while __current_size >= max_size:
-                await asyncio.sleep(waitting_time)
-            __current_size += 1
-            result = await func(*args, **kwargs)
-            __current_size -= 1
-            return result
+            async with limiter.slot():
+                return await func(*args, **kwargs)
 
+        wait_func.limiter = limiter
         return wait_func
 
     return final_decro
 
 
+class LLMCacheMissError(Exception):
+    """Raised in replay-only mode when an LLM call has no cached result."""
+
+
+def wrap_llm_func_with_cache(
+    func,
+    cache_kv,
+    mode: str = "read_write",
+    key_params: dict = None,
+    lanes: Optional[tuple] = None,
+):
+    """Content-addressed cache around an LLM function.
+
+    The key covers ``key_params`` (model name, bound model kwargs, ...), the
+    prompt, system prompt, history and call kwargs. Streaming calls bypass
+    the cache, and so do calls outside ``lanes`` (the ``call_lane`` they run
+    in) when it is given. Modes:
+        "off": call straight through.
+        "read_write": serve hits, call and store on a miss.
+        "replay_only": serve hits, raise LLMCacheMissError on a miss.
+    """
+    if mode == "off" or cache_kv is None:
+        return func
+    if mode not in ("read_write", "replay_only"):
+        raise ValueError(f"Unknown LLM call cache mode: {mode}")
+
+    @wraps(func)
+    async def cached_func(prompt, system_prompt=None, history_messages=[], **kwargs):
+        if kwargs.get("stream") or (
+            lanes is not None and _current_call_lane.get() not in lanes
+        ):
+            return await func(
+                prompt,
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+                **kwargs,
+            )
+        key = compute_mdhash_id(
+            json.dumps(
+                [key_params, prompt, system_prompt, history_messages, kwargs],
+                sort_keys=True,
+                default=str,
+            ),
+            prefix="llm-",
+        )
+        cached = await cache_kv.get_by_id(key)
+        if cached is not None:
+            return cached["return"]
+        if mode == "replay_only":
+            raise LLMCacheMissError(f"No cached LLM result for {key}")
+
+        result = await func(
+            prompt,
+            system_prompt=system_prompt,
+            history_messages=history_messages,
+            **kwargs,
+        )
+        if isinstance(result, str):
+            await cache_kv.upsert({key: {"return": result}})
+        return result
+
+    return cached_func
+
+
 def wrap_embedding_func_with_attrs(**kwargs):
     """Wrap a function with attributes"""
 
@@ -342,37 +711,14 @@ async def get_best_cached_response(
     llm_func=None,
     original_prompt=None,
 ) -> Union[str, None]:
-    # Get mode-specific cache
-    mode_cache = await hashing_kv.get_by_id(mode)
-    if not mode_cache:
+    # Top-1 match from the mode's vectorised semantic index
+    best_cache_id, best_similarity, best_data = await hashing_kv.best_match(
+        mode, current_embedding
+    )
+    if best_data is None:
         return None
-
-    best_similarity = -1
-    best_response = None
-    best_prompt = None
-    best_cache_id = None
-
-    # Only iterate through cache entries for this mode
-    for cache_id, cache_data in mode_cache.items():
-        if cache_data["embedding"] is None:
-            continue
-
-        # Convert cached embedding list to ndarray
-        cached_quantized = np.frombuffer(
-            bytes.fromhex(cache_data["embedding"]), dtype=np.uint8
-        ).reshape(cache_data["embedding_shape"])
-        cached_embedding = dequantize_embedding(
-            cached_quantized,
-            cache_data["embedding_min"],
-            cache_data["embedding_max"],
-        )
-
-        similarity = cosine_similarity(current_embedding, cached_embedding)
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_response = cache_data["return"]
-            best_prompt = cache_data["original_prompt"]
-            best_cache_id = cache_id
+    best_response = best_data["return"]
+    best_prompt = best_data["original_prompt"]
 
     if best_similarity > similarity_threshold:
         # If LLM check is enabled and all required parameters are provided
@@ -457,9 +803,9 @@ async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
 
     # For naive mode, only use simple cache matching
     if mode == "naive":
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-        if args_hash in mode_cache:
-            return mode_cache[args_hash]["return"], None, None, None
+        cached = await hashing_kv.get(mode, args_hash)
+        if cached is not None:
+            return cached["return"], None, None, None
         return None, None, None, None
 
     # Get embedding cache configuration
@@ -487,13 +833,14 @@ async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
             llm_func=llm_model_func if use_llm_check else None,
             original_prompt=prompt if use_llm_check else None,
         )
+        hashing_kv.note_lookup(best_cached_response is not None)
         if best_cached_response is not None:
             return best_cached_response, None, None, None
     else:
         # Use regular cache
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-        if args_hash in mode_cache:
-            return mode_cache[args_hash]["return"], None, None, None
+        cached = await hashing_kv.get(mode, args_hash)
+        if cached is not None:
+            return cached["return"], None, None, None
 
     return None, quantized, min_val, max_val
 
@@ -513,9 +860,7 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
     if hashing_kv is None or hasattr(cache_data.content, "__aiter__"):
         return
 
-    mode_cache = await hashing_kv.get_by_id(cache_data.mode) or {}
-
-    mode_cache[cache_data.args_hash] = {
+    record = {
         "return": cache_data.content,
         "embedding": cache_data.quantized.tobytes().hex()
         if cache_data.quantized is not None
@@ -528,7 +873,7 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
         "original_prompt": cache_data.prompt,
     }
 
-    await hashing_kv.upsert({cache_data.mode: mode_cache})
+    await hashing_kv.put(cache_data.mode, cache_data.args_hash, record)
 
 
 def safe_unicode_decode(content):